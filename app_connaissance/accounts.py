@@ -0,0 +1,271 @@
+"""Création de comptes : email de définition du mot de passe et import en masse (CSV / XLSX).
+
+L'import valide tout le fichier en une passe (une requête par table de
+référence, quel que soit le nombre de lignes), hache les mots de passe
+aléatoires (dans un pool de processus pour la commande de gestion), puis crée utilisateurs, profils et
+emails de bienvenue par ``bulk_create`` dans une seule transaction.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import secrets
+import string
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import NamedTuple
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from .models import Department, Poste, UserProfile
+from .outbox import enqueue_emails
+
+try:  # XLSX : dépendance optionnelle
+    import openpyxl
+except ImportError:  # pragma: no cover - dépend de l'environnement
+    openpyxl = None
+
+COLUMNS = (
+    "username", "first_name", "last_name", "email", "department", "poste",
+    "role", "type_contrat", "date_embauche", "display_name",
+)
+REQUIRED = ("username", "first_name", "last_name", "email", "department", "poste", "role")
+DISPLAY_NAME_MAX_LENGTH = UserProfile._meta.get_field("display_name").max_length
+
+# En-têtes français acceptés (normalisés en minuscules)
+_ALIASES = {
+    "identifiant": "username",
+    "prénom": "first_name",
+    "prenom": "first_name",
+    "nom": "last_name",
+    "département": "department",
+    "departement": "department",
+    "rôle": "role",
+    "contrat": "type_contrat",
+    "type de contrat": "type_contrat",
+    "date d'embauche": "date_embauche",
+    "nom affiché": "display_name",
+}
+
+# Au-delà, le démarrage des processus coûte plus que le hachage
+_POOL_MIN_ROWS = 8
+
+
+def random_password(length: int = 16) -> str:
+    """Mot de passe aléatoire alphanumérique (valide pour les validateurs Django)."""
+    chars = string.ascii_letters + string.digits
+    return "".join(secrets.choice(chars) for _ in range(length))
+
+
+def set_password_email(user: User, protocol: str, domain: str) -> tuple[str, str]:
+    """Sujet et corps de l'email d'accueil avec le lien pour définir le mot de passe."""
+    context = {
+        "user": user,
+        "protocol": protocol,
+        "domain": domain,
+        "uid": urlsafe_base64_encode(force_bytes(user.pk)),
+        "token": default_token_generator.make_token(user),
+    }
+    subject = render_to_string("auth/welcome_set_password_subject.txt", context).strip()
+    body = render_to_string("auth/welcome_set_password_email.html", context)
+    return subject, body
+
+
+class RowError(NamedTuple):
+    line: int
+    message: str
+
+
+class ImportRow(NamedTuple):
+    line: int
+    username: str
+    first_name: str
+    last_name: str
+    email: str
+    department: Department
+    poste: Poste
+    role: str
+    type_contrat: str
+    date_embauche: date | None
+    display_name: str
+
+
+@dataclass
+class ImportReport:
+    rows: list[ImportRow] = field(default_factory=list)
+    errors: list[RowError] = field(default_factory=list)
+    created: int = 0
+
+
+def read_rows(data: bytes, filename: str) -> list[dict[str, str]]:
+    """Lit un fichier CSV (``,`` ou ``;``) ou XLSX ; la première ligne donne les colonnes."""
+    if filename.lower().endswith(".xlsx"):
+        if openpyxl is None:
+            raise ValueError("L'import XLSX nécessite le paquet openpyxl (pip install openpyxl), ou exportez en CSV.")
+        sheet = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True).active
+        records = [["" if v is None else v for v in row] for row in sheet.iter_rows(values_only=True)]
+    else:
+        text = data.decode("utf-8-sig")
+        try:
+            dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;")
+        except csv.Error:
+            dialect = csv.excel
+        records = list(csv.reader(io.StringIO(text), dialect))
+    if not records:
+        return []
+    header = [_ALIASES.get(str(h).strip().lower(), str(h).strip().lower()) for h in records[0]]
+    missing = [c for c in REQUIRED if c not in header]
+    if missing:
+        raise ValueError(f"Colonnes manquantes : {', '.join(missing)}")
+    return [
+        {name: value for name, value in zip(header, record) if name in COLUMNS}
+        for record in records[1:]
+        if any(str(v).strip() for v in record)
+    ]
+
+
+def _choice(value: str, choices) -> str | None:
+    value = value.strip().lower()
+    for key, label in choices:
+        if value in (key, str(label).lower()):
+            return key
+    return None
+
+
+def _parse_date(value) -> date | None:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    value = str(value).strip()
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError
+
+
+def _display_names(r: dict[str, str]) -> tuple[str, str]:
+    name = r.get("display_name") or f"{r.get('first_name', '')} {r.get('last_name', '')}".strip() or r.get("username", "")
+    return name, f"{name} ({r.get('username', '')})"
+
+
+def validate_rows(records: list[dict[str, str]]) -> ImportReport:
+    """Valide toutes les lignes ; les lignes sans erreur sont prêtes pour ``import_users``."""
+    report = ImportReport()
+    records = [{k: str(v).strip() for k, v in r.items()} for r in records]
+    usernames = {r.get("username", "") for r in records}
+    taken_usernames = set(User.objects.filter(username__in=usernames).values_list("username", flat=True))
+    departments = {}
+    for dept in Department.objects.all():
+        departments[dept.name.lower()] = dept
+        departments[dept.slug.lower()] = dept
+    postes = {(p.department_id, p.intitule.lower()): p for p in Poste.objects.all()}
+    # Noms affichés candidats (nom, puis « Nom (identifiant) » pour un homonyme) vérifiés en une requête
+    wanted_names = {name for r in records for name in _display_names(r)}
+    taken_names = set(UserProfile.objects.filter(display_name__in=wanted_names).values_list("display_name", flat=True))
+    seen_usernames: set[str] = set()
+
+    for line, r in enumerate(records, start=2):
+        errors = [f"{c} obligatoire" for c in REQUIRED if not r.get(c)]
+        username = r.get("username", "")
+        if username in taken_usernames:
+            errors.append(f"identifiant « {username} » déjà utilisé")
+        elif username and username in seen_usernames:
+            errors.append(f"identifiant « {username} » en double dans le fichier")
+        if r.get("email"):
+            try:
+                validate_email(r["email"])
+            except ValidationError:
+                errors.append(f"email invalide « {r['email']} »")
+        dept = departments.get(r.get("department", "").lower())
+        if r.get("department") and dept is None:
+            errors.append(f"département inconnu « {r['department']} »")
+        poste = postes.get((dept.id, r.get("poste", "").lower())) if dept else None
+        if dept and r.get("poste") and poste is None:
+            errors.append(f"poste « {r['poste']} » inconnu dans le département {dept.name}")
+        role = _choice(r.get("role", ""), UserProfile.Role.choices)
+        if r.get("role") and role is None:
+            errors.append(f"rôle inconnu « {r['role']} »")
+        contrat = _choice(r["type_contrat"], UserProfile.TypeContrat.choices) if r.get("type_contrat") else ""
+        if contrat is None:
+            errors.append(f"type de contrat inconnu « {r['type_contrat']} »")
+        hired = None
+        if r.get("date_embauche"):
+            try:
+                hired = _parse_date(r["date_embauche"])
+            except ValueError:
+                errors.append(f"date d'embauche invalide « {r['date_embauche']} » (AAAA-MM-JJ ou JJ/MM/AAAA)")
+        # Même règle que la création unitaire : homonyme → « Nom (identifiant) »
+        display_name = next((name for name in _display_names(r) if name not in taken_names), None)
+        if display_name is None:
+            errors.append(f"nom affiché « {_display_names(r)[0]} » déjà utilisé")
+        elif len(display_name) > DISPLAY_NAME_MAX_LENGTH:
+            errors.append(f"nom affiché trop long (plus de {DISPLAY_NAME_MAX_LENGTH} caractères)")
+        if errors:
+            report.errors.append(RowError(line, " ; ".join(errors)))
+            continue
+
+        seen_usernames.add(username)
+        taken_names.add(display_name)
+        report.rows.append(ImportRow(
+            line, username, r["first_name"], r["last_name"], r["email"], dept, poste, role, contrat, hired,
+            display_name,
+        ))
+    return report
+
+
+def _init_worker() -> None:
+    import django
+
+    django.setup()
+
+
+def hash_passwords(passwords: list[str], workers: int | None = 1) -> list[str]:
+    """
+    Hache les mots de passe (PBKDF2, volontairement lent). Avec ``workers`` > 1 ou None (un par CPU),
+    en parallèle au-delà de quelques lignes : réservé à la commande de gestion, jamais dans une requête HTTP.
+    """
+    if workers == 1 or len(passwords) < _POOL_MIN_ROWS:
+        return [make_password(p) for p in passwords]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        return list(pool.map(make_password, passwords, chunksize=16))
+
+
+def import_users(report: ImportReport, protocol: str, domain: str, workers: int | None = 1) -> list[User]:
+    """Crée les comptes valides de ``report`` et met en file leurs emails d'accueil."""
+    rows = report.rows
+    if not rows:
+        return []
+    hashed = hash_passwords([random_password() for _ in rows], workers)
+    with transaction.atomic():
+        users = User.objects.bulk_create([
+            User(username=r.username, email=r.email, first_name=r.first_name, last_name=r.last_name, password=h)
+            for r, h in zip(rows, hashed)
+        ])
+        UserProfile.objects.bulk_create([
+            UserProfile(
+                user=user,
+                display_name=r.display_name,
+                role=r.role,
+                department=r.department,
+                poste=r.poste,
+                type_contrat=r.type_contrat,
+                date_embauche=r.date_embauche,
+                must_change_password=True,
+            )
+            for user, r in zip(users, rows)
+        ])
+        enqueue_emails([(*set_password_email(user, protocol, domain), [user.email]) for user in users])
+    report.created = len(users)
+    return users
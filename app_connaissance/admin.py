@@ -1,14 +1,20 @@
 from __future__ import annotations
 
 import secrets
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.forms import UserCreationForm as BaseUserCreationForm
 from django.contrib.auth.models import User
-from django.core.mail import send_mail
-from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db.models import Prefetch
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html
 from django.utils.text import capfirst
 
+from . import item_analysis, search
+from .outbox import enqueue_email
 from .models import (
     Department,
     Entreprise,
@@ -17,15 +23,20 @@ from .models import (
     Module,
     ModuleStep,
     OnboardingStep,
+    OutboundEmail,
     PlanIntegration,
     Poste,
     Quiz,
+    QuizAnalysis,
+    QuizAttempt,
+    QuizAttemptAnswer,
     QuizChoice,
     QuizQuestion,
     Tag,
     UserProfile,
     UserQuizAttempt,
 )
+from .stats import invalidate_pending_validation_count
 
 
 # ---------------------------------------------------------------------------
@@ -161,16 +172,7 @@ class CustomUserAdmin(BaseUserAdmin):
             "Lors de votre première connexion, vous devrez modifier ce mot de passe.\n\n"
             "Cordialement,\nL'équipe"
         )
-        try:
-            send_mail(
-                subject,
-                body,
-                settings.DEFAULT_FROM_EMAIL,
-                to,
-                fail_silently=False,
-            )
-        except Exception:
-            pass
+        enqueue_email(subject, body, to)
 
 
 # ---------------------------------------------------------------------------
@@ -232,11 +234,76 @@ class QuizQuestionInline(admin.TabularInline):
 
 @admin.register(Quiz)
 class QuizAdmin(admin.ModelAdmin):
-    list_display = ("titre", "module", "seuil_reussite_pct")
+    list_display = ("titre", "module", "seuil_reussite_pct", "analysis_link")
     list_filter = ("module__plan",)
     search_fields = ("titre",)
     inlines = (QuizQuestionInline,)
 
+    def get_urls(self):
+        urls = [
+            path(
+                "<path:object_id>/analyse/",
+                self.admin_site.admin_view(self.item_analysis_view),
+                name="app_connaissance_quiz_item_analysis",
+            ),
+        ]
+        return urls + super().get_urls()
+
+    @admin.display(description="Analyse")
+    def analysis_link(self, obj):
+        return format_html(
+            '<a href="{}">Analyse des questions</a>',
+            reverse("admin:app_connaissance_quiz_item_analysis", args=[obj.pk]),
+        )
+
+    def item_analysis_view(self, request, object_id):
+        """Difficulté et discrimination par question, taux de sélection par choix (tables de synthèse)."""
+        quiz = self.get_object(request, object_id)
+        if quiz is None or not self.has_view_permission(request, quiz):
+            raise PermissionDenied
+        questions = list(
+            quiz.questions.select_related("stats").prefetch_related(
+                Prefetch("choices", queryset=QuizChoice.objects.select_related("stats").order_by("id"))
+            )
+        )
+        rows = []
+        for question in questions:
+            stats = getattr(question, "stats", None)
+            responses = stats.responses if stats else 0
+            flagged = responses >= item_analysis.MIN_RESPONSES
+            warnings = []
+            if flagged and stats.difficulty is not None:
+                if stats.difficulty < item_analysis.TOO_HARD:
+                    warnings.append("Trop difficile")
+                elif stats.difficulty > item_analysis.TOO_EASY:
+                    warnings.append("Trop facile")
+            if flagged and (stats.discrimination is None or stats.discrimination < item_analysis.LOW_DISCRIMINATION):
+                warnings.append("Discrimine peu")
+            choices = []
+            for choice in question.choices.all():
+                selections = choice.stats.selections if hasattr(choice, "stats") else 0
+                unused = flagged and not choice.is_correct and selections == 0
+                if unused:
+                    warnings.append(f"Distracteur jamais choisi : « {choice.texte} »")
+                choices.append({
+                    "choice": choice,
+                    "selections": selections,
+                    "rate": selections / responses if responses else None,
+                    "unused": unused,
+                })
+            rows.append({"question": question, "stats": stats, "choices": choices, "warnings": warnings})
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "original": quiz,
+            "title": f"Analyse des questions — {quiz.titre}",
+            "analysis": QuizAnalysis.objects.filter(quiz=quiz).first(),
+            "rows": rows,
+            "min_responses": item_analysis.MIN_RESPONSES,
+        }
+        return TemplateResponse(request, "admin/app_connaissance/quiz/item_analysis.html", context)
+
 
 class QuizChoiceInline(admin.TabularInline):
     model = QuizChoice
@@ -254,10 +321,34 @@ class QuizQuestionAdmin(admin.ModelAdmin):
 
 @admin.register(UserQuizAttempt)
 class UserQuizAttemptAdmin(admin.ModelAdmin):
-    list_display = ("user", "quiz", "score_pct", "passed", "completed_at")
+    list_display = ("user", "quiz", "score_pct", "passed", "attempt_count", "completed_at")
     list_filter = ("passed", "quiz")
     search_fields = ("user__username",)
-    readonly_fields = ("completed_at",)
+    readonly_fields = ("completed_at", "best_attempt", "attempt_count")
+
+
+class QuizAttemptAnswerInline(admin.TabularInline):
+    model = QuizAttemptAnswer
+    extra = 0
+    can_delete = False
+    readonly_fields = ("question", "choice", "is_correct")
+
+
+@admin.register(QuizAttempt)
+class QuizAttemptAdmin(admin.ModelAdmin):
+    """Historique en lecture seule : une tentative n'est jamais modifiée."""
+    list_display = ("user", "quiz", "score_pct", "passed", "created_at")
+    list_filter = ("passed", "quiz")
+    search_fields = ("user__username",)
+    list_select_related = ("user", "quiz")
+    readonly_fields = ("user", "quiz", "score_pct", "passed", "created_at")
+    inlines = (QuizAttemptAnswerInline,)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(Poste)
@@ -288,6 +379,25 @@ class KnowledgeItemAdmin(admin.ModelAdmin):
     search_fields = ("title", "author", "content")
     autocomplete_fields = ("department", "tags")
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        search.index_knowledge_item(form.instance)
+        if "status" in form.changed_data:
+            invalidate_pending_validation_count()
+
+    def delete_model(self, request, obj):
+        item_id = obj.pk
+        super().delete_model(request, obj)
+        search.remove_knowledge_item(item_id)
+        invalidate_pending_validation_count()
+
+    def delete_queryset(self, request, queryset):
+        item_ids = list(queryset.values_list("pk", flat=True))
+        super().delete_queryset(request, queryset)
+        for item_id in item_ids:
+            search.remove_knowledge_item(item_id)
+        invalidate_pending_validation_count()
+
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
@@ -302,3 +412,31 @@ class OnboardingStepAdmin(admin.ModelAdmin):
     list_display = ("order", "title", "is_required")
     list_filter = ("is_required",)
     search_fields = ("title", "description")
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ("subject", "status", "attempts", "next_attempt_at", "created_at", "sent_at")
+    list_filter = ("status",)
+    search_fields = ("subject", "last_error")
+    readonly_fields = ("subject", "from_email", "to", "attempts", "last_error", "created_at", "sent_at")
+    exclude = ("body",)
+    actions = ["retry_now"]
+
+    @admin.action(description="Renvoyer au prochain passage")
+    def retry_now(self, request, queryset):
+        pending = queryset.exclude(status=OutboundEmail.Status.SENT)
+        # Corps vidé à l'abandon (mot de passe, lien) : renvoyer enverrait un email vide
+        redacted = list(pending.filter(body="").values_list("subject", "to"))
+        retried = pending.exclude(body="").update(
+            status=OutboundEmail.Status.PENDING, attempts=0, next_attempt_at=timezone.now(),
+        )
+        if retried:
+            self.message_user(request, f"{retried} email(s) remis en file.", messages.SUCCESS)
+        if redacted:
+            self.message_user(
+                request,
+                "Non renvoyé(s), contenu effacé à l'abandon (l'utilisateur peut passer par « mot de passe oublié ») : "
+                + " ; ".join(f"{subject} → {', '.join(to)}" for subject, to in redacted),
+                messages.WARNING,
+            )
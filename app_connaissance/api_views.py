@@ -9,6 +9,7 @@ from django.http import HttpRequest, JsonResponse
 from django.template.defaultfilters import slugify
 from django.views.decorators.http import require_http_methods
 
+from .frontend_auth import get_principal
 from .models import (
     Department,
     Entreprise,
@@ -25,8 +26,7 @@ def _user_has_admin_rights(request: HttpRequest) -> bool:
         return False
     if request.user.is_staff:
         return True
-    profile = getattr(request.user, "profile", None)
-    return profile is not None and getattr(profile, "role", None) == "admin"
+    return get_principal(request).role == "admin"
 
 
 # Registry des modèles autorisés pour création à la volée
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class AppConnaissanceConfig(AppConfig):
     name = 'app_connaissance'
+
+    def ready(self):
+        from . import signals  # noqa: F401
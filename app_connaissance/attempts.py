@@ -0,0 +1,99 @@
+"""Historique des tentatives de quiz (ajout seul) et meilleure tentative dénormalisée.
+
+Chaque passage insère une ligne ``QuizAttempt`` puis toutes ses réponses en
+une insertion groupée ; rien n'est jamais modifié dans l'historique.
+``UserQuizAttempt`` (une ligne par utilisateur et quiz) garde la meilleure
+tentative et le nombre de passages : c'est elle que lit la progression. Elle
+est tenue à jour par des ``UPDATE`` conditionnels, sans lecture préalable.
+"""
+from __future__ import annotations
+
+from typing import NamedTuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import QuizAttempt, QuizAttemptAnswer, UserQuizAttempt
+from .plan_structure import QuizNode
+
+
+class RecordedAttempt(NamedTuple):
+    attempt: QuizAttempt
+    # Nouvelle meilleure tentative (ou première) : la progression est à recalculer
+    improved: bool
+
+
+def grade(quiz: QuizNode, selected: dict[int, int]) -> tuple[int, bool]:
+    """Score en pourcentage et réussite pour les réponses ``selected`` (question_id -> choice_id)."""
+    if not quiz.questions:
+        return 0, False
+    score_pct = round(quiz.score(selected) * 100 / len(quiz.questions))
+    return score_pct, score_pct >= quiz.seuil_reussite_pct
+
+
+def record_attempt(user, quiz: QuizNode, selected: dict[int, int], now=None) -> RecordedAttempt:
+    """Enregistre un passage (tentative + réponses) et met à jour la meilleure tentative."""
+    now = now or timezone.now()
+    score_pct, passed = grade(quiz, selected)
+    key = quiz.answer_key
+    answers = []
+    for q in quiz.questions:
+        choice_id = selected.get(q.id)
+        if choice_id is not None and all(c.id != choice_id for c in q.choices):
+            choice_id = None  # Choix étranger à la question (formulaire modifié)
+        answers.append((q.id, choice_id, choice_id is not None and key[q.id] == choice_id))
+
+    with transaction.atomic():
+        attempt = QuizAttempt.objects.create(
+            user=user,
+            quiz_id=quiz.id,
+            score_pct=score_pct,
+            correct_count=sum(is_correct for _, _, is_correct in answers),
+            passed=passed,
+            created_at=now,
+        )
+        QuizAttemptAnswer.objects.bulk_create([
+            QuizAttemptAnswer(attempt=attempt, question_id=question_id, choice_id=choice_id, is_correct=is_correct)
+            for question_id, choice_id, is_correct in answers
+        ])
+        improved = _update_best(user, quiz.id, attempt)
+    return RecordedAttempt(attempt, improved)
+
+
+def _update_best(user, quiz_id: int, attempt: QuizAttempt) -> bool:
+    best = UserQuizAttempt.objects.filter(user=user, quiz_id=quiz_id)
+    improved = best.filter(score_pct__lt=attempt.score_pct).update(
+        score_pct=attempt.score_pct,
+        passed=attempt.passed,
+        best_attempt=attempt,
+        completed_at=attempt.created_at,
+        attempt_count=F("attempt_count") + 1,
+    )
+    if improved:
+        return True
+    if best.update(attempt_count=F("attempt_count") + 1):
+        return False
+    try:
+        with transaction.atomic():
+            UserQuizAttempt.objects.create(
+                user=user,
+                quiz_id=quiz_id,
+                score_pct=attempt.score_pct,
+                passed=attempt.passed,
+                best_attempt=attempt,
+            )
+        return True
+    except IntegrityError:
+        # Premier passage concurrent : la ligne existe désormais
+        return _update_best(user, quiz_id, attempt)
+
+
+def latest_attempts(user, quiz_id: int, limit: int = 5) -> list[QuizAttempt]:
+    """Dernières tentatives d'un utilisateur à un quiz (index ``quiz_attempt_latest_idx``)."""
+    return list(QuizAttempt.objects.filter(user=user, quiz_id=quiz_id).order_by("-created_at")[:limit])
+
+
+def best_attempts(user, quiz_ids) -> dict[int, UserQuizAttempt]:
+    """Meilleure tentative par quiz (contrainte unique utilisateur/quiz)."""
+    return {best.quiz_id: best for best in UserQuizAttempt.objects.filter(user=user, quiz_id__in=quiz_ids)}
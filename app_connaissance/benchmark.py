@@ -0,0 +1,214 @@
+"""Mesure de toutes les vues de ``app_connaissance.urls`` (commande ``benchmark_views``).
+
+Pour chaque URL : nombre de requêtes SQL (premier appel, cache vidé), latence
+p50/p95 sur les appels suivants et pic mémoire Python (tracemalloc). Chaque
+appel s'exécute dans une transaction annulée : les vues qui écrivent (POST)
+sont mesurées sur des données identiques d'un appel à l'autre.
+
+Seuls le code HTTP et le nombre de requêtes SQL font échouer la comparaison :
+ils ne dépendent pas de la machine. La latence (médiane) n'est qu'indicative.
+"""
+from __future__ import annotations
+
+import json
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, reset_queries, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Department, KnowledgeItem, Module, OnboardingStep, UserModuleStepCompletion, UserProfile
+
+Fixtures = dict[str, object]
+
+
+@dataclass(frozen=True)
+class Scenario:
+    role: str | None = "employee"  # None : visiteur anonyme
+    method: str = "get"
+    kwargs: Callable[[Fixtures], dict] | None = None
+    data: dict | Callable[[Fixtures], dict] | None = None
+    json: bool = False
+
+
+def _published(f: Fixtures) -> dict:
+    return {"knowledge_id": f["published_id"]}
+
+
+def _in_review(f: Fixtures) -> dict:
+    return {"knowledge_id": f["in_review_id"]}
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "api_reference_create": Scenario("admin", "post", data={"model": "tag", "name": "bench-tag"}, json=True),
+    "api_postes_by_department": Scenario("admin", kwargs=lambda f: {"department_id": f["department_id"]}),
+    "index": Scenario(),
+    "login": Scenario(None),
+    "logout_view": Scenario(),
+    "password_change_required": Scenario(),
+    "dashboard": Scenario("manager"),
+    "forbidden": Scenario(),
+    "password_reset": Scenario(None),
+    "password_reset_done": Scenario(None),
+    "password_reset_confirm": Scenario(None, kwargs=lambda f: {"uidb64": "MQ", "token": "jeton-invalide"}),
+    "password_reset_complete": Scenario(None),
+    "knowledge_list": Scenario(),
+    "knowledge_create": Scenario(),
+    "knowledge_detail": Scenario("admin", kwargs=_published),
+    "knowledge_edit": Scenario("admin", kwargs=_published),
+    "knowledge_duplicate": Scenario("admin", "post", kwargs=_published),
+    "knowledge_generate_quiz": Scenario("admin", "post", kwargs=_published),
+    "validation_queue": Scenario("manager"),
+    "validation_approve": Scenario("manager", "post", kwargs=_in_review),
+    "validation_reject": Scenario("manager", "post", kwargs=_in_review, data={"rejection_comment": "À revoir"}),
+    "departments": Scenario("admin"),
+    "department_create": Scenario("admin"),
+    "department_edit": Scenario("admin", kwargs=lambda f: {"pk": f["department_id"]}),
+    "users_admin": Scenario("admin"),
+    "user_create": Scenario("admin"),
+    "user_import": Scenario("admin"),
+    "onboarding_steps_admin": Scenario("admin"),
+    "onboarding_step_create": Scenario("admin"),
+    "onboarding_step_edit": Scenario("admin", kwargs=lambda f: {"pk": f["onboarding_step_id"]}),
+    "onboarding_home": Scenario("new_employee"),
+    "plan_integration_personnel": Scenario("new_employee"),
+    "module_step_toggle": Scenario("new_employee", "post", kwargs=lambda f: {"step_id": f["step_id"]}),
+    "module_steps_update": Scenario(
+        "new_employee", "post", data=lambda f: {"steps": [{"id": i, "done": False} for i in f["step_ids"]]}, json=True,
+    ),
+    "quiz_take": Scenario("new_employee", kwargs=lambda f: {"quiz_id": f["quiz_id"]}),
+    "cohort_report": Scenario("manager"),
+    "trainings": Scenario(),
+    "profile": Scenario(),
+}
+
+
+def url_names() -> list[str]:
+    from . import urls
+
+    return [p.name for p in urls.urlpatterns if p.name]
+
+
+def load_fixtures() -> Fixtures:
+    """Objets de référence pris dans le jeu de données (un utilisateur par rôle, etc.)."""
+    fixtures: Fixtures = {}
+    for role in ("admin", "manager", "employee"):
+        fixtures[role] = User.objects.filter(profile__role=role).order_by("id").first()
+    newcomer = (
+        UserProfile.objects.filter(role=UserProfile.Role.NEW_EMPLOYEE, poste__plan_integration__isnull=False)
+        .select_related("user", "poste")
+        .order_by("id")
+        .first()
+    )
+    fixtures["new_employee"] = newcomer.user if newcomer else None
+    first_module = (
+        Module.objects.filter(plan_id=newcomer.poste.plan_integration_id).order_by("ordre").first()
+        if newcomer else None
+    )
+    step_ids = list(first_module.steps.values_list("id", flat=True)) if first_module else []
+    fixtures["step_id"] = step_ids[0] if step_ids else 0
+    fixtures["step_ids"] = step_ids
+    # Sous-étapes cochées : quiz_take affiche le quiz au lieu de rediriger
+    UserModuleStepCompletion.objects.bulk_create(
+        [UserModuleStepCompletion(user=newcomer.user, module_step_id=i) for i in step_ids],
+        ignore_conflicts=True,
+    )
+    fixtures["quiz_id"] = getattr(getattr(first_module, "quiz", None), "id", 0)
+    published = KnowledgeItem.objects.filter(status=KnowledgeItem.Status.PUBLISHED)
+    fixtures["published_id"] = published.values_list("id", flat=True).first() or 0
+    fixtures["in_review_id"] = (
+        KnowledgeItem.objects.filter(status=KnowledgeItem.Status.IN_REVIEW).values_list("id", flat=True).first() or 0
+    )
+    fixtures["department_id"] = Department.objects.values_list("id", flat=True).first() or 0
+    step = OnboardingStep.objects.first() or OnboardingStep.objects.create(title="Accueil")
+    fixtures["onboarding_step_id"] = step.id
+    return fixtures
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[round(q * (len(ordered) - 1))]
+
+
+def measure(name: str, scenario: Scenario, fixtures: Fixtures, repeat: int = 50) -> dict:
+    client = Client(raise_request_exception=False)
+    if scenario.role:
+        client.force_login(fixtures[scenario.role])
+    url = reverse(name, kwargs=scenario.kwargs(fixtures) if scenario.kwargs else None)
+    data = scenario.data(fixtures) if callable(scenario.data) else scenario.data
+
+    def call() -> int:
+        with transaction.atomic():
+            if scenario.json:
+                response = client.post(url, json.dumps(data), content_type="application/json")
+            else:
+                response = getattr(client, scenario.method)(url, data or {})
+            if response.streaming:
+                b"".join(response.streaming_content)
+            transaction.set_rollback(True)
+        return response.status_code
+
+    cache.clear()
+    reset_queries()
+    with CaptureQueriesContext(connection) as ctx:
+        status = call()
+    queries = len(ctx.captured_queries)
+    tracemalloc.start()
+    call()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "status": status,
+        "queries": queries,
+        "p50_ms": round(_percentile(timings, 0.50), 2),
+        "p95_ms": round(_percentile(timings, 0.95), 2),
+        "peak_kib": round(peak / 1024),
+    }
+
+
+def run_benchmark(repeat: int = 50, only: list[str] | None = None) -> dict[str, dict]:
+    """Mesure chaque URL nommée ; lève ValueError si une URL n'a pas de scénario."""
+    names = url_names()
+    missing = [n for n in names if n not in SCENARIOS]
+    if missing:
+        raise ValueError(f"URL sans scénario de benchmark : {', '.join(missing)}")
+    fixtures = load_fixtures()
+    return {name: measure(name, SCENARIOS[name], fixtures, repeat) for name in names if not only or name in only}
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict]) -> list[str]:
+    """Régressions par rapport à la référence : code HTTP différent ou plus de requêtes SQL."""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        if result["status"] != reference["status"]:
+            regressions.append(f"{name} : code {result['status']} (référence {reference['status']})")
+        if result["queries"] > reference["queries"]:
+            regressions.append(f"{name} : {result['queries']} requêtes SQL (référence {reference['queries']})")
+    return regressions
+
+
+def latency_warnings(results: dict[str, dict], baseline: dict[str, dict], tolerance: float) -> list[str]:
+    """Vues dont la médiane dépasse nettement la référence (indicatif : dépend de la machine)."""
+    warnings = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        # Marge absolue de 5 ms : les vues très rapides varient surtout avec la machine
+        if result["p50_ms"] > reference["p50_ms"] * (1 + tolerance) + 5:
+            warnings.append(f"{name} : p50 {result['p50_ms']} ms (référence {reference['p50_ms']} ms)")
+    return warnings
@@ -0,0 +1,76 @@
+"""Requêtes conditionnelles (ETag) pour les pages de connaissances.
+
+L'ETag combine les données affichées (date de modification, version choisie,
+version de la liste) et tout ce qui, dans la page, dépend du visiteur :
+identité et rôle, badge de validation, jeton CSRF. Un 304 est renvoyé sans
+rendre de gabarit.
+"""
+from __future__ import annotations
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+from .frontend_auth import get_principal
+from .stats import pending_validation_count
+
+LIST_VERSION_KEY = "knowledge_list:version"
+
+
+def list_version() -> int:
+    """Version de la liste des connaissances, incrémentée à chaque modification."""
+    version = cache.get(LIST_VERSION_KEY)
+    if version is None:
+        cache.add(LIST_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(LIST_VERSION_KEY)
+    return version
+
+
+def bump_list_version() -> None:
+    try:
+        cache.incr(LIST_VERSION_KEY)
+    except ValueError:
+        cache.add(LIST_VERSION_KEY, time.time_ns(), None)
+
+
+def page_etag(request: HttpRequest, *parts) -> str:
+    principal = get_principal(request)
+    viewer = (
+        principal.user_id, principal.role, principal.display_name, principal.department_id,
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ""),
+    )
+    if principal.role in ("admin", "manager"):
+        viewer += (pending_validation_count(),)
+    digest = hashlib.md5(repr((parts, viewer)).encode("utf-8"), usedforsecurity=False).hexdigest()
+    return f'"{digest}"'
+
+
+def not_modified(request: HttpRequest, etag: str, shared: bool = False) -> HttpResponse | None:
+    """Réponse 304 si le client a déjà cette version de la page, sinon None (la vue rend la page)."""
+    # Des messages en attente doivent être affichés : la page en cache ne les contient pas
+    if len(messages.get_messages(request)):
+        return None
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        set_cache_headers(response, etag, shared)
+    return response
+
+
+def set_cache_headers(response: HttpResponse, etag: str, shared: bool = False) -> HttpResponse:
+    """
+    ETag + revalidation systématique. ``shared`` (connaissance publiée et
+    globale) autorise un proxy à stocker la page ; ``Vary: Cookie`` la garde
+    propre à chaque session, les pages portant le nom et le jeton CSRF du visiteur.
+    """
+    response["ETag"] = etag
+    if shared:
+        patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ["Cookie"])
+    return response
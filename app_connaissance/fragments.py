@@ -0,0 +1,81 @@
+"""Cache des fragments HTML des connaissances (corps d'article, étiquettes, cartes de la liste).
+
+Les fragments vivent dans le cache ``fragments`` (``settings.CACHES``, LRU
+par défaut). Une entrée par connaissance et par sorte de fragment, qui
+mémorise la version affichée : ``(version, html)``. Une lecture pour une
+autre version est un défaut de cache ; une modification de la connaissance
+supprime ses entrées. Les renommages (département, type) rendent tout le
+cache obsolète via une génération commune.
+"""
+from __future__ import annotations
+
+import time
+from typing import Callable
+
+from django.core.cache import caches
+from django.utils.safestring import SafeString, mark_safe
+
+FRAGMENT_CACHE = "fragments"
+
+KINDS = ("body", "labels", "card")
+
+_GENERATION_KEY = "fragment:generation"
+
+
+def _cache():
+    return caches[FRAGMENT_CACHE]
+
+
+def _generation() -> int:
+    cache = _cache()
+    generation = cache.get(_GENERATION_KEY)
+    if generation is None:
+        cache.add(_GENERATION_KEY, time.time_ns(), None)
+        generation = cache.get(_GENERATION_KEY)
+    return generation
+
+
+def _key(kind: str, item_id: int) -> str:
+    return f"fragment:{kind}:{item_id}"
+
+
+def get_fragments(
+    kind: str, versions: dict[int, object], render_many: Callable[[list[int]], dict[int, str]],
+) -> dict[int, SafeString]:
+    """
+    Fragments ``kind`` des connaissances ``{id: version}`` ; ceux absents ou
+    d'une autre version sont rendus ensemble par ``render_many(ids)`` puis
+    stockés. Une lecture et au plus une écriture groupées par appel.
+    """
+    cache = _cache()
+    generation = _generation()
+    keys = {item_id: _key(kind, item_id) for item_id in versions}
+    cached = cache.get_many(list(keys.values()), version=generation)
+    html: dict[int, SafeString] = {}
+    for item_id, version in versions.items():
+        entry = cached.get(keys[item_id])
+        if entry is not None and entry[0] == version:
+            html[item_id] = mark_safe(entry[1])
+    missing = [item_id for item_id in versions if item_id not in html]
+    if missing:
+        rendered = render_many(missing)
+        cache.set_many({keys[i]: (versions[i], rendered[i]) for i in missing}, version=generation)
+        html.update((i, mark_safe(rendered[i])) for i in missing)
+    return html
+
+
+def get_fragment(kind: str, item_id: int, version, render: Callable[[], str]) -> SafeString:
+    return get_fragments(kind, {item_id: version}, lambda ids: {item_id: render()})[item_id]
+
+
+def invalidate_knowledge_fragments(*item_ids: int) -> None:
+    if item_ids:
+        _cache().delete_many([_key(kind, i) for i in item_ids for kind in KINDS], version=_generation())
+
+
+def invalidate_all_fragments() -> None:
+    cache = _cache()
+    try:
+        cache.incr(_GENERATION_KEY)
+    except ValueError:
+        cache.add(_GENERATION_KEY, time.time_ns(), None)
@@ -1,12 +1,119 @@
 from __future__ import annotations
 
+from dataclasses import asdict, dataclass
 from functools import wraps
 from typing import Callable
 
+from django.conf import settings
+from django.core.cache import cache
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import redirect
 from django.urls import reverse
 
+PRINCIPAL_SESSION_KEY = "frontend_principal"
+_GLOBAL_VERSION_KEY = "frontend_principal:version"
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Identité et rôle de l'utilisateur courant, calculés une fois par requête."""
+    is_authenticated: bool
+    user_id: int | None = None
+    profile_id: int | None = None
+    role: str | None = None
+    display_name: str = "Invité"
+    department_id: int | None = None
+    poste_id: int | None = None
+    plan_id: int | None = None
+    must_change_password: bool = False
+
+    @property
+    def sees_all_departments(self) -> bool:
+        """Admins et managers (profil réel, pas le mode démo) voient tous les départements."""
+        return self.profile_id is not None and self.role in ("admin", "manager")
+
+
+def _user_version_key(user_id: int) -> str:
+    return f"frontend_principal:version:{user_id}"
+
+
+def invalidate_principal(user_id: int | None = None) -> None:
+    """Invalide les identités mises en session (d'un utilisateur, ou de tous si ``user_id`` est None)."""
+    key = _user_version_key(user_id) if user_id else _GLOBAL_VERSION_KEY
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, None)
+
+
+def _principal_version(user_id: int) -> list[int]:
+    versions = cache.get_many([_GLOBAL_VERSION_KEY, _user_version_key(user_id)])
+    return [versions.get(_GLOBAL_VERSION_KEY, 1), versions.get(_user_version_key(user_id), 1)]
+
+
+def _load_principal(user) -> Principal:
+    from .models import UserProfile
+
+    row = (
+        UserProfile.objects.filter(user_id=user.pk)
+        .values(
+            "id", "role", "display_name", "department_id", "poste_id",
+            "poste__plan_integration_id", "must_change_password",
+        )
+        .first()
+    )
+    if not row:
+        return Principal(
+            is_authenticated=True,
+            user_id=user.pk,
+            display_name=user.get_full_name() or user.username,
+        )
+    return Principal(
+        is_authenticated=True,
+        user_id=user.pk,
+        profile_id=row["id"],
+        role=row["role"],
+        display_name=row["display_name"],
+        department_id=row["department_id"],
+        poste_id=row["poste_id"],
+        plan_id=row["poste__plan_integration_id"],
+        must_change_password=row["must_change_password"],
+    )
+
+
+def get_principal(request: HttpRequest) -> Principal:
+    """Identité de la requête (profil lu en une requête SQL, puis réutilisé).
+
+    Si ``FRONTEND_PRINCIPAL_SESSION_CACHE`` est activé, l'identité est aussi conservée
+    en session et rechargée seulement quand sa version (cache partagé) change.
+    """
+    principal = getattr(request, "_frontend_principal", None)
+    if principal is not None:
+        return principal
+
+    user = request.user
+    if not user.is_authenticated:
+        # Mode démo : rôle en session
+        role = request.session.get("frontend_demo_role")
+        principal = Principal(
+            is_authenticated=False,
+            role=role,
+            display_name=request.session.get("frontend_demo_name") or (role or "Invité"),
+        )
+    elif getattr(settings, "FRONTEND_PRINCIPAL_SESSION_CACHE", False):
+        version = _principal_version(user.pk)
+        stored = request.session.get(PRINCIPAL_SESSION_KEY)
+        if stored and stored.get("version") == version and stored["data"].get("user_id") == user.pk:
+            principal = Principal(**stored["data"])
+        else:
+            principal = _load_principal(user)
+            request.session[PRINCIPAL_SESSION_KEY] = {"version": version, "data": asdict(principal)}
+    else:
+        principal = _load_principal(user)
+
+    request._frontend_principal = principal
+    return principal
+
 
 def frontend_login_required(view_func: Callable[..., HttpResponse]) -> Callable[..., HttpResponse]:
     """Redirige vers login si non connecté et pas de session démo."""
@@ -26,10 +133,7 @@ def frontend_roles_required(*allowed_roles: str) -> Callable[[Callable[..., Http
     def _decorator(view_func: Callable[..., HttpResponse]) -> Callable[..., HttpResponse]:
         @wraps(view_func)
         def _wrapped(request: HttpRequest, *args, **kwargs) -> HttpResponse:
-            role = None
-            if request.user.is_authenticated:
-                profile = getattr(request.user, "profile", None)
-                role = profile.role if profile else None
+            role = get_principal(request).role
             if role is None:
                 role = request.session.get("frontend_demo_role")
             if role in allowed_roles:
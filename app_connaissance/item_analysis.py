@@ -0,0 +1,151 @@
+"""Analyse des items des quiz : difficulté, discrimination et choix des distracteurs.
+
+Les réponses enregistrées (``QuizAttemptAnswer``, une ligne par question et
+par tentative) sont agrégées par ``GROUP BY`` en base, uniquement pour les
+tentatives postérieures au dernier passage (``QuizAnalysis.last_attempt_id``,
+propre à chaque quiz). Les résultats s'ajoutent aux tables de synthèse ; la
+page d'analyse ne lit que celles-ci.
+
+La discrimination est la corrélation entre la réussite à la question et le
+score obtenu au reste du quiz (corrélation item-reste). Elle se recalcule
+exactement à partir de cinq sommes, cumulées d'un passage à l'autre.
+"""
+from __future__ import annotations
+
+import math
+from datetime import timedelta
+
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    QuizAnalysis,
+    QuizAnalysisRun,
+    QuizAttempt,
+    QuizAttemptAnswer,
+    QuizChoiceStats,
+    QuizQuestionStats,
+)
+
+# Tentatives plus récentes laissées au passage suivant : une transaction encore
+# ouverte pourrait valider une tentative d'identifiant inférieur.
+SETTLE_DELAY = timedelta(seconds=30)
+
+# En dessous, les indicateurs ne sont pas signalés sur la page d'analyse
+MIN_RESPONSES = 20
+TOO_HARD = 0.3
+TOO_EASY = 0.9
+LOW_DISCRIMINATION = 0.2
+
+
+def discrimination(n: int, correct: int, sum_total: int, sum_total_sq: int, sum_total_correct: int) -> float | None:
+    """Corrélation item-reste à partir des sommes ; None si l'une des variances est nulle."""
+    # Reste = total - réussite à la question (réussite binaire : x² = x)
+    sum_rest = sum_total - correct
+    sum_rest_sq = sum_total_sq - 2 * sum_total_correct + correct
+    sum_item_rest = sum_total_correct - correct
+    var_item = n * correct - correct * correct
+    var_rest = n * sum_rest_sq - sum_rest * sum_rest
+    if var_item <= 0 or var_rest <= 0:
+        return None
+    return (n * sum_item_rest - correct * sum_rest) / math.sqrt(var_item * var_rest)
+
+
+def analyze_new_attempts(now=None, rebuild: bool = False) -> int | None:
+    """
+    Ajoute aux tables de synthèse les tentatives non encore analysées.
+    Retourne le nombre de tentatives traitées, ou None si un autre passage est en cours.
+
+    Le passage commence par écrire la ligne ``QuizAnalysisRun`` : la transaction prend
+    le verrou d'écriture de la base (SQLite) ou de la ligne avant de lire les filigranes.
+    Deux passages qui se chevauchent (cron) ne peuvent donc pas ajouter deux fois les
+    mêmes tentatives : le second attend puis lit les filigranes avancés, ou abandonne.
+    ``rebuild`` vide d'abord les tables de synthèse, sous le même verrou.
+    """
+    now = now or timezone.now()
+    try:
+        with transaction.atomic():
+            if not QuizAnalysisRun.objects.filter(pk=1).update(started_at=now):
+                QuizAnalysisRun.objects.create(pk=1, started_at=now)
+            if rebuild:
+                _reset()
+            return _analyze(now)
+    except (OperationalError, IntegrityError):
+        # Base verrouillée par un passage concurrent (ou première ligne créée en même temps)
+        return None
+
+
+def _analyze(now) -> int:
+    upper = QuizAttempt.objects.filter(created_at__lte=now - SETTLE_DELAY).aggregate(m=Max("id"))["m"]
+    if upper is None:
+        return 0
+    done = QuizAnalysis.objects.filter(quiz_id=OuterRef("quiz_id")).values("last_attempt_id")
+    pending = (
+        QuizAttempt.objects.filter(id__lte=upper)
+        .annotate(done=Coalesce(Subquery(done), 0))
+        .filter(id__gt=F("done"))
+    )
+    answers = QuizAttemptAnswer.objects.filter(attempt__in=pending.values("id")).order_by()
+
+    per_quiz = dict(pending.order_by().values_list("quiz_id").annotate(n=Count("id")))
+    if not per_quiz:
+        return 0
+    correct = Q(is_correct=True)
+    per_question = {
+        row.pop("question_id"): row
+        for row in answers.values("question_id").annotate(
+            responses=Count("id"),
+            correct=Count("id", filter=correct),
+            sum_total=Sum("attempt__correct_count"),
+            sum_total_sq=Sum(F("attempt__correct_count") * F("attempt__correct_count")),
+            sum_total_correct=Coalesce(Sum("attempt__correct_count", filter=correct), 0),
+        )
+    }
+    per_choice = {
+        row.pop("choice_id"): row
+        for row in answers.filter(choice__isnull=False).values("choice_id").annotate(selections=Count("id"))
+    }
+
+    _accumulate(QuizAnalysis, {quiz_id: {"attempts": n} for quiz_id, n in per_quiz.items()},
+                extra={"last_attempt_id": upper, "updated_at": now})
+    questions = _accumulate(QuizQuestionStats, per_question)
+    for stats in questions:
+        stats.difficulty = stats.correct / stats.responses if stats.responses else None
+        stats.discrimination = discrimination(
+            stats.responses, stats.correct, stats.sum_total, stats.sum_total_sq, stats.sum_total_correct,
+        )
+    QuizQuestionStats.objects.bulk_update(questions, ["difficulty", "discrimination"])
+    _accumulate(QuizChoiceStats, per_choice)
+    return sum(per_quiz.values())
+
+
+def _accumulate(model, increments: dict[int, dict[str, int]], extra: dict | None = None) -> list:
+    """Ajoute ``increments`` (clé primaire -> compteurs) aux lignes de ``model``, créées au besoin."""
+    if not increments:
+        return []
+    existing = model.objects.in_bulk(list(increments))
+    fields = list(next(iter(increments.values())))
+    created, updated = [], []
+    for pk, counts in increments.items():
+        row = existing.get(pk)
+        if row is None:
+            row = model(pk=pk)
+            created.append(row)
+        else:
+            updated.append(row)
+        for name, value in counts.items():
+            setattr(row, name, getattr(row, name) + value)
+        for name, value in (extra or {}).items():
+            setattr(row, name, value)
+    model.objects.bulk_create(created)
+    model.objects.bulk_update(updated, fields + list(extra or {}))
+    return created + updated
+
+
+def _reset() -> None:
+    """Vide les tables de synthèse : le passage repart de la première tentative."""
+    QuizChoiceStats.objects.all().delete()
+    QuizQuestionStats.objects.all().delete()
+    QuizAnalysis.objects.all().delete()
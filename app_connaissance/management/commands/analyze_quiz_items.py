@@ -0,0 +1,23 @@
+"""
+Commande de gestion : met à jour l'analyse des items des quiz (difficulté, discrimination,
+choix des distracteurs) avec les tentatives enregistrées depuis le dernier passage.
+À lancer périodiquement (cron) ; ``--rebuild`` recalcule tout depuis la première tentative.
+Usage : python manage.py analyze_quiz_items [--rebuild]
+"""
+from django.core.management.base import BaseCommand
+
+from app_connaissance.item_analysis import analyze_new_attempts
+
+
+class Command(BaseCommand):
+    help = "Agrège les nouvelles tentatives de quiz dans les tables d'analyse des questions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rebuild", action="store_true", help="Vide les tables d'analyse avant le passage.")
+
+    def handle(self, *args, **options):
+        count = analyze_new_attempts(rebuild=options["rebuild"])
+        if count is None:
+            self.stdout.write(self.style.WARNING("Un autre passage est en cours : rien à faire."))
+            return
+        self.stdout.write(self.style.SUCCESS(f"{count} tentative(s) analysée(s)."))
@@ -0,0 +1,77 @@
+"""
+Commande de gestion : micro-benchmark de l'analyse de texte des quiz générés.
+Compare l'ancien algorithme (re-découpage du texte pour chaque question) à
+l'index construit une seule fois (``quiz_text.DocumentIndex``) sur des articles
+synthétiques.
+Usage : python manage.py benchmark_quiz_text [--sentences 2000] [--articles 20] [--seed 42]
+"""
+import random
+import re
+import time
+
+from django.core.management.base import BaseCommand
+
+from app_connaissance.quiz_text import draft_quiz_questions
+
+_LEXICON = [
+    "procédure", "validation", "déploiement", "sauvegarde", "serveur", "intégration",
+    "documentation", "responsable", "environnement", "configuration", "sécurité", "utilisateur",
+    "application", "référentiel", "incident", "supervision", "formation", "processus",
+    "planning", "livraison", "maintenance", "contrôle", "qualité", "archivage",
+]
+
+
+def _synthetic_article(rng: random.Random, sentences: int) -> str:
+    parts = []
+    for _ in range(sentences):
+        words = [rng.choice(_LEXICON) + str(rng.randrange(500)) for _ in range(rng.randrange(8, 16))]
+        parts.append("<p>La " + " ".join(words) + ".</p>")
+    return "".join(parts)
+
+
+def _legacy_draft(content: str) -> int:
+    """Ancien algorithme (référence) : tout le texte est re-découpé pour chaque question."""
+    text = re.sub(r'<[^>]+>', '', content)
+    sentences = [s.strip() for s in re.split(r'[.!?]', text) if len(s.strip()) > 20]
+    if len(sentences) < 2:
+        return 0
+    count = 0
+    for sent in random.sample(sentences, min(5, len(sentences))):
+        words = [w for w in sent.split() if len(w) > 4]
+        if not words:
+            continue
+        target_word = max(words, key=len)
+        all_words = [w for w in text.split() if len(w) > 4 and w != target_word]
+        all_words = [re.sub(r'[^\w]', '', w) for w in all_words]
+        all_words = [w for w in all_words if len(w) > 3]
+        if len(all_words) >= 3:
+            random.sample(list(set(all_words)), min(3, len(set(all_words))))
+        count += 1
+    return count
+
+
+class Command(BaseCommand):
+    help = "Mesure le temps de génération des questions (ancien algorithme vs index en une passe)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sentences", type=int, default=2000, help="Phrases par article synthétique.")
+        parser.add_argument("--articles", type=int, default=20, help="Nombre d'articles.")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        articles = [_synthetic_article(rng, options["sentences"]) for _ in range(options["articles"])]
+        size = sum(len(a) for a in articles) / len(articles) / 1024
+        self.stdout.write(f"{len(articles)} articles de {options['sentences']} phrases (~{size:.0f} Ko).")
+
+        timings = {}
+        for label, func in (("ancien", _legacy_draft), ("index", draft_quiz_questions)):
+            random.seed(options["seed"])
+            started = time.perf_counter()
+            for article in articles:
+                func(article)
+            timings[label] = (time.perf_counter() - started) / len(articles)
+            self.stdout.write(f"  {label:<7} {timings[label] * 1000:8.1f} ms / article")
+
+        speedup = timings["ancien"] / timings["index"] if timings["index"] else 0
+        self.stdout.write(self.style.SUCCESS(f"Accélération : x{speedup:.1f}"))
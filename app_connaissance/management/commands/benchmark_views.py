@@ -0,0 +1,90 @@
+"""
+Commande de gestion : benchmark de toutes les vues sur un jeu de données synthétique.
+La base de test est créée puis détruite ; la base de développement n'est pas touchée.
+Usage : python manage.py benchmark_views [--knowledge-items 5000] [--users 500] [--plans 20]
+                                         [--repeat 50] [--update-baseline]
+"""
+import json
+from dataclasses import asdict
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from app_connaissance import search
+from app_connaissance.benchmark import compare, latency_warnings, run_benchmark
+from app_connaissance.models import KnowledgeItem
+from app_connaissance.synthetic import Scale, seed_dataset
+
+DEFAULT_BASELINE = Path(__file__).resolve().parents[2] / "benchmark_baseline.json"
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure requêtes SQL, latence p50/p95 et pic mémoire de chaque vue, et compare à la référence "
+        "(échec sur le code HTTP ou le nombre de requêtes ; latence indicative)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--knowledge-items", type=int, default=5000)
+        parser.add_argument("--users", type=int, default=500)
+        parser.add_argument("--plans", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--repeat", type=int, default=50, help="Appels mesurés par vue.")
+        parser.add_argument("--only", action="append", help="Nom d'URL à mesurer (répétable).")
+        parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Fichier de référence JSON.")
+        parser.add_argument("--update-baseline", action="store_true", help="Écrit les résultats comme nouvelle référence.")
+        parser.add_argument(
+            "--latency-tolerance", type=float, default=1.0,
+            help="Dégradation de la médiane signalée au-delà (1.0 = 2x la référence) ; avertissement seulement.",
+        )
+
+    def handle(self, *args, **options):
+        scale = Scale(knowledge_items=options["knowledge_items"], users=options["users"], plans=options["plans"])
+        dataset = {**asdict(scale), "seed": options["seed"]}
+
+        setup_test_environment(debug=False)
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write(f"Jeu de données : {seed_dataset(scale, seed=options['seed'])}")
+            if search.is_available():
+                search.rebuild_index(KnowledgeItem.objects.prefetch_related("tags").iterator(chunk_size=2000))
+            results = run_benchmark(repeat=options["repeat"], only=options["only"])
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f"{'vue':<28} {'code':>4} {'SQL':>5} {'p50 ms':>8} {'p95 ms':>8} {'pic Kio':>8}")
+        for name, r in results.items():
+            self.stdout.write(
+                f"{name:<28} {r['status']:>4} {r['queries']:>5} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['peak_kib']:>8}"
+            )
+
+        baseline_path = Path(options["baseline"])
+        if options["update_baseline"]:
+            baseline_path.write_text(
+                json.dumps({"dataset": dataset, "views": results}, indent=2, ensure_ascii=False) + "\n",
+                encoding="utf-8",
+            )
+            self.stdout.write(self.style.SUCCESS(f"Référence écrite : {baseline_path}"))
+            return
+        if not baseline_path.exists():
+            self.stdout.write(self.style.WARNING("Pas de fichier de référence (--update-baseline pour le créer)."))
+            return
+
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+        if baseline.get("dataset") != dataset:
+            self.stdout.write(self.style.WARNING(
+                "Jeu de données différent de la référence : comparaison ignorée."
+            ))
+            return
+        for warning in latency_warnings(results, baseline["views"], options["latency_tolerance"]):
+            self.stdout.write(self.style.WARNING(f"Latence (indicatif) : {warning}"))
+        regressions = compare(results, baseline["views"])
+        if regressions:
+            raise CommandError("Régressions détectées :\n  " + "\n  ".join(regressions))
+        self.stdout.write(self.style.SUCCESS("Aucune régression par rapport à la référence."))
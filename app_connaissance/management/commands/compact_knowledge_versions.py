@@ -0,0 +1,54 @@
+"""
+Commande de gestion : convertit l'historique des versions en instantanés + deltas.
+Usage : python manage.py compact_knowledge_versions [--dry-run]
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app_connaissance.models import KnowledgeVersion
+from app_connaissance.versioning import compact_item_history
+
+
+def _human(size: float) -> str:
+    if size < 1024:
+        return f"{size:.0f} o"
+    for unit in ("Ko", "Mo", "Go"):
+        size /= 1024
+        if size < 1024 or unit == "Go":
+            break
+    return f"{size:.1f} {unit}"
+
+
+class Command(BaseCommand):
+    help = "Réencode l'historique des connaissances (instantanés périodiques + deltas) et affiche l'espace gagné."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Calcule le gain sans modifier la base.",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        item_ids = list(
+            KnowledgeVersion.objects.order_by().values_list("knowledge_item_id", flat=True).distinct()
+        )
+        self.stdout.write(f"{len(item_ids)} connaissances avec historique.")
+
+        total_before = total_after = 0
+        for item_id in item_ids:
+            with transaction.atomic():
+                before, after = compact_item_history(item_id)
+                if dry_run:
+                    transaction.set_rollback(True)
+            total_before += before
+            total_after += after
+
+        saved = total_before - total_after
+        ratio = (saved / total_before * 100) if total_before else 0
+        prefix = "[simulation] " if dry_run else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Historique : {_human(total_before)} -> {_human(total_after)} "
+            f"({_human(saved)} économisés, {ratio:.0f} %)."
+        ))
@@ -1,33 +1,133 @@
-from django.core.management.base import BaseCommand
-from app_connaissance.models import KnowledgeItem
-from app_connaissance.services import generate_quiz_for_knowledge
+"""
+Commande de gestion : génère les quiz des connaissances qui n'en ont pas, par lots.
+Usage : python manage.py generate_quizzes [--batch-size N] [--workers N] [--since AAAA-MM-JJ]
+                                          [--checkpoint FICHIER [--reset]]
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time as dt_time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from app_connaissance.models import KnowledgeItem, Quiz
+from app_connaissance.quiz_text import analyse_item, set_vocabulary
+from app_connaissance.services import save_quiz_drafts
+from app_connaissance.vocabulary import get_vocabulary, update_vocabulary_index
+
+
+def _parse_since(value: str) -> datetime:
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Date invalide pour --since : {value!r} (attendu AAAA-MM-JJ).")
+        moment = datetime.combine(day, dt_time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _read_checkpoint(path: str) -> int:
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return int(json.load(fh)["last_id"])
+    except FileNotFoundError:
+        return 0
+    except (ValueError, KeyError, TypeError) as exc:
+        raise CommandError(f"Point de reprise illisible : {path}") from exc
+
+
+def _write_checkpoint(path: str, last_id: int) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump({"last_id": last_id}, fh)
+    os.replace(tmp, path)
+
 
 class Command(BaseCommand):
     help = 'Génère automatiquement des quiz pour toutes les connaissances qui n\'en ont pas.'
 
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Connaissances par lot (une transaction par lot).")
+        parser.add_argument("--workers", type=int, default=1, help="Processus d'analyse du texte (1 = dans ce processus).")
+        parser.add_argument("--since", help="Seulement les connaissances modifiées depuis cette date (AAAA-MM-JJ).")
+        parser.add_argument("--checkpoint", help="Fichier de reprise (dernier identifiant traité).")
+        parser.add_argument("--reset", action="store_true", help="Ignore le point de reprise existant.")
+
     def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        workers = options["workers"]
+        if batch_size < 1 or workers < 1:
+            raise CommandError("--batch-size et --workers doivent être positifs.")
+        checkpoint = options["checkpoint"]
+        last_id = _read_checkpoint(checkpoint) if checkpoint and not options["reset"] else 0
+
         self.stdout.write("Démarrage de la génération des quiz...")
-        
-        # On sélectionne les items qui n'ont pas de quiz associé
-        # Note: knowledgeitem.quiz est un OneToOneField, donc on peut vérifier s'il est null
-        # Mais le reverse relation OneToOneField est un peu particulier en Django ORM filter
-        # On va iterer et checker hasattr pour être sûr ou filter(quiz__isnull=True)
-        
+        indexed, removed = update_vocabulary_index()
+        vocabulary = get_vocabulary()
+        self.stdout.write(
+            f"Vocabulaire du corpus : {len(vocabulary)} mots ({indexed} connaissances indexées, {removed} retirées)."
+        )
         items = KnowledgeItem.objects.filter(quiz__isnull=True)
-        count = items.count()
-        self.stdout.write(f"{count} connaissances trouvées sans quiz.")
-        
+        if options["since"]:
+            items = items.filter(updated_at__gte=_parse_since(options["since"]))
+        if last_id:
+            self.stdout.write(f"Reprise après la connaissance #{last_id}.")
+        total = items.filter(id__gt=last_id).count()
+        self.stdout.write(f"{total} connaissances trouvées sans quiz.")
+
         generated = 0
         skipped = 0
-        
-        for item in items:
-            self.stdout.write(f"Traitement de : {item.title}...")
-            quiz = generate_quiz_for_knowledge(item)
-            if quiz:
-                generated += 1
-                self.stdout.write(self.style.SUCCESS(f"  -> Quiz créé avec {quiz.questions.count()} questions."))
-            else:
-                skipped += 1
-                self.stdout.write(self.style.WARNING("  -> Impossible de générer (contenu insuffisant ?)."))
-                
+        started = time.monotonic()
+        if workers > 1:
+            # Le vocabulaire est transmis une seule fois à chaque processus
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=set_vocabulary, initargs=(vocabulary,))
+        else:
+            executor = None
+            set_vocabulary(vocabulary)
+        try:
+            while True:
+                batch = list(
+                    items.filter(id__gt=last_id).order_by("id").values_list("id", "title", "content")[:batch_size]
+                )
+                if not batch:
+                    break
+                jobs = [(item_id, content) for item_id, _, content in batch]
+                if executor is not None:
+                    analysed = executor.map(analyse_item, jobs, chunksize=max(1, len(jobs) // (workers * 4)))
+                else:
+                    analysed = map(analyse_item, jobs)
+                titles = {item_id: title for item_id, title, _ in batch}
+                drafts = [(item_id, titles[item_id], questions) for item_id, questions in analysed if questions]
+
+                with transaction.atomic():
+                    # Un quiz a pu être créé entre-temps (bouton « Générer » de la fiche)
+                    existing = set(
+                        Quiz.objects.filter(knowledge_item_id__in=titles).values_list("knowledge_item_id", flat=True)
+                    )
+                    drafts = [d for d in drafts if d[0] not in existing]
+                    save_quiz_drafts(drafts)
+
+                generated += len(drafts)
+                skipped += len(batch) - len(drafts)
+                last_id = batch[-1][0]
+                if checkpoint:
+                    _write_checkpoint(checkpoint, last_id)
+
+                done = generated + skipped
+                elapsed = time.monotonic() - started
+                rate = done / elapsed if elapsed else 0
+                remaining = max(total - done, 0) / rate if rate else 0
+                self.stdout.write(
+                    f"  {done}/{total} traitées — {rate:.0f} connaissances/s, reste ~{remaining:.0f} s"
+                )
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
         self.stdout.write(self.style.SUCCESS(f"Terminé. {generated} quiz générés, {skipped} ignorés."))
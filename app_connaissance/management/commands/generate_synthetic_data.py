@@ -0,0 +1,59 @@
+"""
+Commande de gestion : génère un jeu de données synthétique volumineux et reproductible
+(tests de charge, benchmarks). Écriture par lots, contenu déterminé par la graine : même graine, mêmes données.
+Usage : python manage.py generate_synthetic_data [--scale knowledge_items=200000] [--scale users=20000]
+                                                 [--seed 42] [--batch-size 5000] [--search-index]
+Les volumes non précisés reprennent les valeurs de ``synthetic.Scale``.
+"""
+import time
+from dataclasses import asdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app_connaissance import search
+from app_connaissance.models import KnowledgeItem
+from app_connaissance.synthetic import PASSWORD, PREFIX, Scale, seed_dataset
+
+
+class Command(BaseCommand):
+    help = "Génère un graphe de données synthétiques (organisation, plans, connaissances, utilisateurs, progression)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale", action="append", default=[], metavar="NOM=N",
+            help="Volume d'un modèle, répétable (ex. knowledge_items=200000, users=20000).",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--search-index", action="store_true",
+            help="Reconstruit l'index plein texte après la génération (long sur de gros volumes).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            scale = Scale.parse(options["scale"])
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+        if KnowledgeItem.objects.filter(author=f"{PREFIX} auteur").exists():
+            raise CommandError(
+                f"Des données « {PREFIX} » existent déjà : utilisez une base vide (les noms entreraient en conflit)."
+            )
+
+        self.stdout.write(f"Échelle : {asdict(scale)}")
+        started = time.perf_counter()
+        counts = seed_dataset(scale, seed=options["seed"], batch_size=options["batch_size"])
+        elapsed = time.perf_counter() - started
+
+        total = sum(counts.values())
+        for table, rows in counts.items():
+            self.stdout.write(f"  {table:<32} {rows:>10}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} lignes en {elapsed:.1f} s ({total / max(elapsed, 1e-9):.0f} lignes/s). "
+            f"Mot de passe des comptes {PREFIX}N : {PASSWORD}"
+        ))
+
+        if options["search_index"] and search.is_available():
+            started = time.perf_counter()
+            indexed = search.rebuild_index(KnowledgeItem.objects.prefetch_related("tags").iterator(chunk_size=2000))
+            self.stdout.write(f"Index de recherche reconstruit ({indexed} fiches, {time.perf_counter() - started:.1f} s).")
@@ -0,0 +1,43 @@
+"""
+Commande de gestion : import en masse d'utilisateurs depuis un fichier CSV ou XLSX.
+Les lignes valides sont créées par lots ; les emails d'accueil passent par la boîte d'envoi
+(``send_outbound_emails``). Les erreurs sont listées par numéro de ligne.
+Usage : python manage.py import_users cohorte.csv --domain savoirs.example.com [--dry-run] [--workers 4]
+"""
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from app_connaissance.accounts import import_users, read_rows, validate_rows
+
+
+class Command(BaseCommand):
+    help = "Importe des utilisateurs (CSV/XLSX) : validation de tout le fichier, création par lots, emails en file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Fichier .csv ou .xlsx (première ligne : noms des colonnes).")
+        parser.add_argument("--domain", default="localhost:8000", help="Domaine des liens envoyés par email.")
+        parser.add_argument("--protocol", default="https", choices=["http", "https"])
+        parser.add_argument("--workers", type=int, default=None, help="Processus de hachage des mots de passe.")
+        parser.add_argument("--dry-run", action="store_true", help="Valide le fichier sans rien créer.")
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        try:
+            report = validate_rows(read_rows(path.read_bytes(), path.name))
+        except (OSError, ValueError, UnicodeDecodeError) as exc:
+            raise CommandError(f"Fichier illisible : {exc}") from exc
+
+        for error in report.errors:
+            self.stdout.write(self.style.ERROR(f"Ligne {error.line} : {error.message}"))
+        self.stdout.write(f"{len(report.rows)} ligne(s) valide(s), {len(report.errors)} en erreur.")
+        if options["dry_run"]:
+            return
+        try:
+            import_users(report, options["protocol"], options["domain"], options["workers"])
+        except IntegrityError as exc:
+            raise CommandError(f"Conflit à l'insertion, aucun compte créé : {exc}") from exc
+        self.stdout.write(self.style.SUCCESS(
+            f"{report.created} utilisateur(s) créé(s) ; emails en file (python manage.py send_outbound_emails)."
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from app_connaissance import search
+from app_connaissance.models import KnowledgeItem
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche plein texte des connaissances."
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            self.stdout.write(self.style.WARNING("Index plein texte indisponible sur ce moteur de base de données."))
+            return
+        items = KnowledgeItem.objects.prefetch_related("tags").iterator(chunk_size=2000)
+        count = search.rebuild_index(items)
+        self.stdout.write(self.style.SUCCESS(f"{count} connaissances indexées."))
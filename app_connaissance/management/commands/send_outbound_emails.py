@@ -0,0 +1,44 @@
+"""
+Commande de gestion : envoie les emails de la boîte d'envoi (création de comptes, etc.).
+Un passage par défaut (cron) ; ``--loop N`` relance toutes les N secondes.
+Les emails envoyés ou abandonnés depuis plus de ``--retention-days`` jours sont supprimés.
+Usage : python manage.py send_outbound_emails [--batch-size 100] [--loop 10] [--retention-days 30]
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from app_connaissance.outbox import RETENTION, purge_old, send_pending
+
+
+class Command(BaseCommand):
+    help = "Envoie les emails en attente (une connexion SMTP par lot, nouvelles tentatives espacées)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--loop", type=float, default=0, metavar="SECONDES",
+            help="Tourne en continu avec cette pause entre deux passages (0 : un seul passage).",
+        )
+        parser.add_argument(
+            "--retention-days", type=int, default=RETENTION.days,
+            help="Conservation des emails envoyés ou abandonnés (0 : pas de purge).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            while True:
+                sent, failed = send_pending(options["batch_size"])
+                if sent or failed:
+                    self.stdout.write(f"{sent} envoyé(s), {failed} en échec.")
+                # Lot complet et serveur joignable : il reste sans doute des emails dus
+                if sent + failed < options["batch_size"] or not sent:
+                    break
+            if options["retention_days"]:
+                purged = purge_old(timedelta(days=options["retention_days"]))
+                if purged:
+                    self.stdout.write(f"{purged} email(s) ancien(s) supprimé(s).")
+            if not options["loop"]:
+                return
+            time.sleep(options["loop"])
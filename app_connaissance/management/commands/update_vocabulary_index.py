@@ -0,0 +1,32 @@
+"""
+Commande de gestion : met à jour l'index du vocabulaire des connaissances publiées.
+Usage : python manage.py update_vocabulary_index [--full]
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app_connaissance.models import KnowledgeVocabulary, VocabularyWord
+from app_connaissance.vocabulary import invalidate_vocabulary, update_vocabulary_index
+
+
+class Command(BaseCommand):
+    help = "Indexe le vocabulaire des connaissances publiées nouvelles ou modifiées (distracteurs des quiz)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Vide l'index puis le reconstruit entièrement.",
+        )
+
+    def handle(self, *args, **options):
+        if options["full"]:
+            with transaction.atomic():
+                KnowledgeVocabulary.objects.all().delete()
+                VocabularyWord.objects.all().delete()
+            invalidate_vocabulary()
+        indexed, removed = update_vocabulary_index()
+        words = VocabularyWord.objects.count()
+        self.stdout.write(self.style.SUCCESS(
+            f"{indexed} connaissances indexées, {removed} retirées ; {words} mots dans le vocabulaire."
+        ))
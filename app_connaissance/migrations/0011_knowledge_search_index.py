@@ -0,0 +1,35 @@
+from django.db import migrations
+from django.utils.html import strip_tags
+
+# Schéma figé ici : la migration ne dépend pas du module ``search`` (qui peut évoluer)
+CREATE_FTS = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS app_connaissance_knowledge_fts USING fts5("
+    "title, description, body, tags, "
+    "tokenize = 'unicode61 remove_diacritics 2')"
+)
+DROP_FTS = "DROP TABLE IF EXISTS app_connaissance_knowledge_fts"
+
+
+def fill_search_index(apps, schema_editor):
+    KnowledgeItem = apps.get_model("app_connaissance", "KnowledgeItem")
+    rows = [
+        (i.pk, i.title or "", i.description or "", strip_tags(i.content or ""), " ".join(t.name for t in i.tags.all()))
+        for i in KnowledgeItem.objects.prefetch_related("tags").iterator(chunk_size=2000)
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO app_connaissance_knowledge_fts (rowid, title, description, body, tags) VALUES (%s, %s, %s, %s, %s)",
+            rows,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app_connaissance", "0010_quiz_knowledge_item"),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_FTS, DROP_FTS),
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
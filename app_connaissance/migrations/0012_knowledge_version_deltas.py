@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-17 01:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_connaissance', '0011_knowledge_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='knowledgeversion',
+            name='base',
+            field=models.ForeignKey(blank=True, help_text='Version de référence du delta (vide = instantané complet)', null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='deltas', to='app_connaissance.knowledgeversion'),
+        ),
+        migrations.AddField(
+            model_name='knowledgeversion',
+            name='delta',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='knowledgeversion',
+            name='delta_depth',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-17 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_connaissance', '0012_knowledge_version_deltas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KnowledgeVocabulary',
+            fields=[
+                ('knowledge_item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='vocabulary_entry', serialize=False, to='app_connaissance.knowledgeitem')),
+                ('words', models.JSONField(default=list)),
+                ('indexed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VocabularyWord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('word', models.CharField(max_length=100, unique=True)),
+                ('word_class', models.CharField(max_length=20)),
+                ('length', models.PositiveSmallIntegerField()),
+                ('document_count', models.PositiveIntegerField(default=0, help_text='Nombre de connaissances publiées contenant le mot')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['word_class', 'length', 'document_count'], name='app_connais_word_cl_04205c_idx')],
+            },
+        ),
+    ]
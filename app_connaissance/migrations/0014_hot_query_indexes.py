@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-17 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_connaissance', '0013_vocabulary_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='knowledgeitem',
+            index=models.Index(fields=['status', '-updated_at', 'id'], name='knowledge_status_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='knowledgeitem',
+            index=models.Index(fields=['status', 'department', '-updated_at'], name='knowledge_status_dept_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='knowledgeversion',
+            index=models.Index(fields=['knowledge_item', '-est_actuelle', '-date_creation', '-id'], name='knowledge_version_current_idx'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 6.0.1 on 2026-10-17 11:20
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_attempt_log(apps, schema_editor):
+    # Seule la dernière tentative était conservée : elle devient la première entrée de l'historique
+    UserQuizAttempt = apps.get_model("app_connaissance", "UserQuizAttempt")
+    QuizAttempt = apps.get_model("app_connaissance", "QuizAttempt")
+    for best in UserQuizAttempt.objects.filter(best_attempt__isnull=True).iterator(chunk_size=2000):
+        best.best_attempt = QuizAttempt.objects.create(
+            user_id=best.user_id,
+            quiz_id=best.quiz_id,
+            score_pct=best.score_pct,
+            passed=best.passed,
+            created_at=best.completed_at,
+        )
+        best.save(update_fields=["best_attempt"])
+
+
+def noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_connaissance', '0015_outbound_email'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userquizattempt',
+            name='attempt_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.CreateModel(
+            name='QuizAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score_pct', models.PositiveSmallIntegerField(default=0)),
+                ('passed', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempt_log', to='app_connaissance.quiz')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_attempt_log', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='userquizattempt',
+            name='best_attempt',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app_connaissance.quizattempt'),
+        ),
+        migrations.CreateModel(
+            name='QuizAttemptAnswer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_correct', models.BooleanField(default=False)),
+                ('attempt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='app_connaissance.quizattempt')),
+                ('choice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attempt_answers', to='app_connaissance.quizchoice')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempt_answers', to='app_connaissance.quizquestion')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['user', 'quiz', '-created_at'], name='quiz_attempt_latest_idx'),
+        ),
+        migrations.RunPython(backfill_attempt_log, noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 6.0.1 on 2026-10-17 12:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_correct_count(apps, schema_editor):
+    QuizAttempt = apps.get_model("app_connaissance", "QuizAttempt")
+    QuizAttemptAnswer = apps.get_model("app_connaissance", "QuizAttemptAnswer")
+    correct = (
+        QuizAttemptAnswer.objects.filter(attempt_id=OuterRef("pk"), is_correct=True)
+        .order_by()
+        .values("attempt_id")
+        .annotate(n=Count("id"))
+        .values("n")
+    )
+    QuizAttempt.objects.update(correct_count=Coalesce(Subquery(correct), 0))
+
+
+def noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_connaissance', '0016_quiz_attempt_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizAnalysis',
+            fields=[
+                ('quiz', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='analysis', serialize=False, to='app_connaissance.quiz')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_attempt_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='QuizChoiceStats',
+            fields=[
+                ('choice', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='app_connaissance.quizchoice')),
+                ('selections', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='QuizQuestionStats',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='app_connaissance.quizquestion')),
+                ('responses', models.PositiveIntegerField(default=0)),
+                ('correct', models.PositiveIntegerField(default=0)),
+                ('sum_total', models.BigIntegerField(default=0)),
+                ('sum_total_sq', models.BigIntegerField(default=0)),
+                ('sum_total_correct', models.BigIntegerField(default=0)),
+                ('difficulty', models.FloatField(blank=True, null=True)),
+                ('discrimination', models.FloatField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='quizattempt',
+            name='correct_count',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_correct_count, noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-17 14:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app_connaissance", "0017_quiz_item_analysis"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="quizattemptanswer",
+            name="choice",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="attempt_answers",
+                to="app_connaissance.quizchoice",
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0.1 on 2026-10-17 14:40
+
+from django.db import migrations, models
+
+
+def redact_failed(apps, schema_editor):
+    OutboundEmail = apps.get_model("app_connaissance", "OutboundEmail")
+    OutboundEmail.objects.filter(status="failed").exclude(body="").update(body="")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app_connaissance", "0018_quiz_attempt_answer_choice_set_null"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="outboundemail",
+            name="body",
+            field=models.TextField(help_text="Vidé après envoi ou abandon (peut contenir un mot de passe temporaire)"),
+        ),
+        migrations.RunPython(redact_failed, migrations.RunPython.noop),
+    ]
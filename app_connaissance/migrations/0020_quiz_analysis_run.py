@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-17 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_connaissance', '0019_outbound_email_redact_failed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizAnalysisRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+            ],
+        ),
+    ]
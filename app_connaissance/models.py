@@ -4,6 +4,7 @@ from django.conf import settings
 from django.contrib.auth.models import User
 from django.db import models
 from django.template.defaultfilters import slugify
+from django.utils import timezone
 
 
 class Entreprise(models.Model):
@@ -188,8 +189,92 @@ class QuizChoice(models.Model):
         return self.texte[:50] + ("…" if len(self.texte) > 50 else "")
 
 
+class QuizAttempt(models.Model):
+    """Passage d'un quiz, jamais modifié : l'historique complet des tentatives."""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="quiz_attempt_log"
+    )
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name="attempt_log")
+    score_pct = models.PositiveSmallIntegerField(default=0)
+    correct_count = models.PositiveSmallIntegerField(default=0)
+    passed = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            # Dernières tentatives d'un utilisateur à un quiz
+            models.Index(fields=["user", "quiz", "-created_at"], name="quiz_attempt_latest_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.user} — {self.quiz} ({self.score_pct}%, {self.created_at:%d/%m/%Y %H:%M})"
+
+
+class QuizAttemptAnswer(models.Model):
+    """Réponse donnée à une question lors d'une tentative (choix vide si sans réponse)."""
+    attempt = models.ForeignKey(QuizAttempt, on_delete=models.CASCADE, related_name="answers")
+    question = models.ForeignKey(QuizQuestion, on_delete=models.CASCADE, related_name="attempt_answers")
+    # Supprimer un choix ne retire pas la réponse de l'historique (is_correct reste fiable)
+    choice = models.ForeignKey(
+        QuizChoice, on_delete=models.SET_NULL, null=True, blank=True, related_name="attempt_answers"
+    )
+    is_correct = models.BooleanField(default=False)
+
+    def __str__(self) -> str:
+        return f"Tentative {self.attempt_id} — question {self.question_id}"
+
+
+class QuizAnalysis(models.Model):
+    """Analyse des items d'un quiz : tentatives déjà agrégées (calcul incrémental, voir ``item_analysis.py``)."""
+    quiz = models.OneToOneField(Quiz, on_delete=models.CASCADE, primary_key=True, related_name="analysis")
+    attempts = models.PositiveIntegerField(default=0)
+    last_attempt_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"Analyse — {self.quiz} ({self.attempts} tentatives)"
+
+
+class QuizAnalysisRun(models.Model):
+    """Ligne unique mise à jour en tête de chaque passage d'analyse : sert de verrou entre passages."""
+    started_at = models.DateTimeField()
+
+    def __str__(self) -> str:
+        return f"Passage d'analyse du {self.started_at:%d/%m/%Y %H:%M}"
+
+
+class QuizQuestionStats(models.Model):
+    """
+    Statistiques d'une question. Les sommes sur le nombre de bonnes réponses
+    de la tentative (``total``) suffisent à recalculer la discrimination
+    quand de nouvelles tentatives s'ajoutent.
+    """
+    question = models.OneToOneField(QuizQuestion, on_delete=models.CASCADE, primary_key=True, related_name="stats")
+    responses = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+    sum_total = models.BigIntegerField(default=0)
+    sum_total_sq = models.BigIntegerField(default=0)
+    sum_total_correct = models.BigIntegerField(default=0)
+    # Taux de bonnes réponses (0 à 1) et corrélation item-reste (-1 à 1)
+    difficulty = models.FloatField(null=True, blank=True)
+    discrimination = models.FloatField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"Statistiques — question {self.question_id}"
+
+
+class QuizChoiceStats(models.Model):
+    """Nombre de fois qu'un choix a été sélectionné."""
+    choice = models.OneToOneField(QuizChoice, on_delete=models.CASCADE, primary_key=True, related_name="stats")
+    selections = models.PositiveIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"Statistiques — choix {self.choice_id}"
+
+
 class UserQuizAttempt(models.Model):
-    """Tentative d'un utilisateur à un quiz (score et statut)."""
+    """Meilleure tentative d'un utilisateur à un quiz, tenue à jour à chaque passage (voir ``attempts.py``)."""
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="quiz_attempts"
     )
@@ -197,6 +282,10 @@ class UserQuizAttempt(models.Model):
     score_pct = models.PositiveSmallIntegerField(default=0)
     passed = models.BooleanField(default=False)
     completed_at = models.DateTimeField(auto_now_add=True)
+    best_attempt = models.ForeignKey(
+        QuizAttempt, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    attempt_count = models.PositiveIntegerField(default=1)
 
     class Meta:
         ordering = ["-completed_at"]
@@ -269,16 +358,28 @@ class KnowledgeItem(models.Model):
 
     class Meta:
         ordering = ["-updated_at", "-created_at"]
+        indexes = [
+            # Liste publiée, file de validation, tableau de bord : statut (+ département), triés par mise à jour
+            models.Index(fields=["status", "-updated_at", "id"], name="knowledge_status_updated_idx"),
+            models.Index(fields=["status", "department", "-updated_at"], name="knowledge_status_dept_idx"),
+        ]
 
     def __str__(self) -> str:
         return self.title
 
     def get_current_version(self):
         """Retourne la version marquée comme actuelle, ou la plus récente."""
-        current = self.versions.filter(est_actuelle=True).first()
-        if current:
-            return current
-        return self.versions.order_by("-date_creation").first()
+        return self.versions.order_by("-est_actuelle", "-date_creation", "-id").first()
+
+    def version_list(self):
+        """Versions sans leur contenu (numéro, date, statut), de la plus récente à la plus ancienne.
+
+        Ni contenu ni delta : le texte d'une version s'obtient ensuite avec ``get_content()``,
+        qui charge sa propre chaîne.
+        """
+        return self.versions.only(
+            "id", "knowledge_item_id", "numero_version", "author_name", "date_creation", "est_actuelle",
+        ).order_by("-date_creation", "-id")
 
     def get_display_author(self):
         """Auteur affiché : profil/user ou champ author."""
@@ -291,12 +392,22 @@ class KnowledgeItem(models.Model):
 
 
 class KnowledgeVersion(models.Model):
-    """Version d'une connaissance (historique, numéro, contenu, auteur)."""
+    """Version d'une connaissance (historique, numéro, contenu, auteur).
+
+    Le contenu est stocké soit en entier (instantané), soit sous forme de delta
+    par rapport à ``base`` : utiliser ``get_content()`` plutôt que ``content``.
+    """
     knowledge_item = models.ForeignKey(
         KnowledgeItem, on_delete=models.CASCADE, related_name="versions"
     )
     numero_version = models.CharField(max_length=40)
     content = models.TextField(blank=True, default="")
+    base = models.ForeignKey(
+        "self", on_delete=models.RESTRICT, null=True, blank=True, related_name="deltas",
+        help_text="Version de référence du delta (vide = instantané complet)",
+    )
+    delta = models.TextField(blank=True, default="")
+    delta_depth = models.PositiveSmallIntegerField(default=0)
     author_name = models.CharField(max_length=120, blank=True, default="")
     date_creation = models.DateTimeField(auto_now_add=True)
     est_actuelle = models.BooleanField(default=False)
@@ -305,10 +416,45 @@ class KnowledgeVersion(models.Model):
     class Meta:
         ordering = ["-date_creation"]
         unique_together = [["knowledge_item", "numero_version"]]
+        indexes = [
+            # get_current_version / version_list
+            models.Index(
+                fields=["knowledge_item", "-est_actuelle", "-date_creation", "-id"],
+                name="knowledge_version_current_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.knowledge_item.title} — v{self.numero_version}"
 
+    def get_content(self) -> str:
+        from .versioning import get_version_content
+
+        return get_version_content(self)
+
+
+class VocabularyWord(models.Model):
+    """Mot du vocabulaire des connaissances publiées (choix des distracteurs de quiz)."""
+    word = models.CharField(max_length=100, unique=True)
+    word_class = models.CharField(max_length=20)
+    length = models.PositiveSmallIntegerField()
+    document_count = models.PositiveIntegerField(default=0, help_text="Nombre de connaissances publiées contenant le mot")
+
+    class Meta:
+        indexes = [models.Index(fields=["word_class", "length", "document_count"])]
+
+    def __str__(self) -> str:
+        return self.word
+
+
+class KnowledgeVocabulary(models.Model):
+    """Mots d'une connaissance déjà comptés dans ``VocabularyWord`` (mise à jour incrémentale)."""
+    knowledge_item = models.OneToOneField(
+        KnowledgeItem, on_delete=models.CASCADE, primary_key=True, related_name="vocabulary_entry"
+    )
+    words = models.JSONField(default=list)
+    indexed_at = models.DateTimeField()
+
 
 class ModuleKnowledgeItem(models.Model):
     """Lien module <-> connaissance avec ordre."""
@@ -407,3 +553,29 @@ class Tag(models.Model):
 
     def __str__(self) -> str:
         return self.name
+
+
+class OutboundEmail(models.Model):
+    """Email en attente d'envoi (boîte d'envoi traitée par ``send_outbound_emails``)."""
+    class Status(models.TextChoices):
+        PENDING = "pending", "En attente"
+        SENT = "sent", "Envoyé"
+        FAILED = "failed", "Abandonné"
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField(help_text="Vidé après envoi ou abandon (peut contenir un mot de passe temporaire)")
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["status", "next_attempt_at"], name="outbound_email_due_idx")]
+
+    def __str__(self) -> str:
+        return f"{self.subject} → {', '.join(self.to)}"
@@ -0,0 +1,119 @@
+"""Boîte d'envoi des emails : les vues enregistrent, la commande ``send_outbound_emails`` envoie.
+
+Un seul processus d'envoi à la fois est prévu (cron ou ``--loop``). Chaque lot
+réutilise une seule connexion SMTP ; un échec repousse l'email avec un délai
+exponentiel, et l'email est abandonné après ``MAX_ATTEMPTS`` tentatives.
+Le corps (mot de passe temporaire, lien de définition) est vidé dès que l'email
+est envoyé ou abandonné ; ``purge_old`` supprime ensuite les lignes anciennes.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 6
+
+# 1 min, 2, 4, 8, 16 : une panne SMTP de quelques dizaines de minutes ne fait rien perdre
+RETRY_BASE = timedelta(minutes=1)
+
+# Emails envoyés ou abandonnés conservés (suivi) avant suppression
+RETENTION = timedelta(days=30)
+
+
+def enqueue_email(subject: str, body: str, to: list[str], from_email: str | None = None) -> OutboundEmail:
+    """Enregistre un email à envoyer (aucun accès réseau)."""
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+    )
+
+
+def enqueue_emails(messages: list[tuple[str, str, list[str]]], from_email: str | None = None) -> list[OutboundEmail]:
+    """Enregistre un lot d'emails ``(sujet, corps, destinataires)`` en une seule insertion."""
+    from_email = from_email or settings.DEFAULT_FROM_EMAIL
+    return OutboundEmail.objects.bulk_create([
+        OutboundEmail(subject=subject, body=body, from_email=from_email, to=list(to))
+        for subject, body, to in messages
+    ])
+
+
+def retry_delay(attempts: int) -> timedelta:
+    return RETRY_BASE * (2 ** max(0, attempts - 1))
+
+
+def send_pending(batch_size: int = 100, now=None) -> tuple[int, int]:
+    """
+    Envoie les emails dus, par lots d'au plus ``batch_size`` sur une même connexion.
+    Retourne ``(envoyés, en échec)``.
+    """
+    now = now or timezone.now()
+    due = list(
+        OutboundEmail.objects.filter(status=OutboundEmail.Status.PENDING, next_attempt_at__lte=now)
+        .order_by("next_attempt_at", "id")[:batch_size]
+    )
+    if not due:
+        return 0, 0
+
+    sent = failed = 0
+    try:
+        connection = get_connection(fail_silently=False)
+        connection.open()
+    except Exception as exc:
+        # Serveur injoignable : tout le lot est repoussé
+        for email in due:
+            _record_failure(email, exc, now)
+        return 0, len(due)
+
+    try:
+        for email in due:
+            message = EmailMessage(email.subject, email.body, email.from_email, email.to, connection=connection)
+            try:
+                message.send()
+            except Exception as exc:
+                _record_failure(email, exc, now)
+                failed += 1
+                continue
+            email.status = OutboundEmail.Status.SENT
+            email.sent_at = timezone.now()
+            email.attempts += 1
+            email.body = ""
+            email.last_error = ""
+            email.save(update_fields=["status", "sent_at", "attempts", "body", "last_error"])
+            sent += 1
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+    return sent, failed
+
+
+def _record_failure(email: OutboundEmail, exc: Exception, now) -> None:
+    email.attempts += 1
+    email.last_error = f"{type(exc).__name__}: {exc}"[:1000]
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = OutboundEmail.Status.FAILED
+        email.body = ""
+        logger.error("Email %s abandonné après %s tentatives : %s", email.pk, email.attempts, email.last_error)
+    else:
+        email.next_attempt_at = now + retry_delay(email.attempts)
+    email.save(update_fields=["attempts", "last_error", "status", "next_attempt_at", "body"])
+
+
+def purge_old(retention: timedelta = RETENTION, now=None) -> int:
+    """Supprime les emails envoyés ou abandonnés depuis plus de ``retention``. Retourne le nombre supprimé."""
+    now = now or timezone.now()
+    deleted, _ = OutboundEmail.objects.filter(
+        status__in=[OutboundEmail.Status.SENT, OutboundEmail.Status.FAILED], created_at__lt=now - retention,
+    ).delete()
+    return deleted
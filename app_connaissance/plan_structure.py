@@ -0,0 +1,215 @@
+"""Instantanés immuables de la structure des plans d'intégration.
+
+La structure d'un plan (modules, sous-étapes, quiz, questions, choix, liens vers
+les connaissances) ne change que lorsqu'un administrateur l'édite. Elle est
+compilée en tuples nommés, conservée en mémoire du processus et dans le cache
+partagé sous une version propre au plan ; toute sauvegarde ou suppression d'un
+élément du plan incrémente cette version (voir ``signals.py``).
+"""
+from __future__ import annotations
+
+import time
+from typing import NamedTuple
+
+from django.core.cache import cache
+from django.db.models import Prefetch, prefetch_related_objects
+
+from .models import Module, ModuleKnowledgeItem, Quiz
+
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class ChoiceNode(NamedTuple):
+    id: int
+    texte: str
+    is_correct: bool
+
+
+class QuestionNode(NamedTuple):
+    id: int
+    enonce: str
+    choices: tuple[ChoiceNode, ...]
+
+
+class QuizNode(NamedTuple):
+    id: int
+    titre: str
+    seuil_reussite_pct: int
+    questions: tuple[QuestionNode, ...]
+    # Corrigé : question_id -> id du bon choix (None si aucun choix n'est marqué correct)
+    answer_key: dict[int, int | None]
+
+    def score(self, selected: dict[int, int]) -> int:
+        """Nombre de bonnes réponses parmi ``selected`` (question_id -> choice_id)."""
+        key = self.answer_key
+        return sum(1 for question_id, choice_id in selected.items() if key.get(question_id) == choice_id)
+
+
+class StepNode(NamedTuple):
+    id: int
+    titre: str
+    ordre: int
+
+
+class KnowledgeLinkNode(NamedTuple):
+    knowledge_item_id: int
+    ordre: int
+
+
+class ModuleNode(NamedTuple):
+    id: int
+    titre: str
+    ordre: int
+    duree_jours: int
+    steps: tuple[StepNode, ...]
+    quiz: QuizNode | None
+    knowledge_links: tuple[KnowledgeLinkNode, ...]
+
+
+class PlanStructure(NamedTuple):
+    plan_id: int
+    version: int
+    modules: tuple[ModuleNode, ...]
+
+    def module(self, module_id: int) -> ModuleNode | None:
+        for mod in self.modules:
+            if mod.id == module_id:
+                return mod
+        return None
+
+
+# Instantanés déjà désérialisés dans ce processus : plan_id -> PlanStructure
+_local: dict[int, PlanStructure] = {}
+
+# Quiz de connaissances déjà désérialisés : quiz_id -> (version, QuizNode)
+_local_quizzes: dict[int, tuple[int, QuizNode]] = {}
+
+
+def _version_key(plan_id: int) -> str:
+    return f"plan_structure:version:{plan_id}"
+
+
+def _structure_key(plan_id: int, version: int) -> str:
+    return f"plan_structure:{plan_id}:{version}"
+
+
+def plan_version(plan_id: int) -> int:
+    key = _version_key(plan_id)
+    version = cache.get(key)
+    if version is None:
+        # Valeur initiale unique : une version évincée ne réutilise jamais un ancien instantané
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_plan_structure(plan_id: int | None) -> None:
+    """Rend obsolète l'instantané d'un plan (appelé à chaque modification de sa structure)."""
+    if not plan_id:
+        return
+    key = _version_key(plan_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), None)
+
+
+def build_quiz_node(quiz: Quiz) -> QuizNode:
+    """Compile un quiz (questions et choix de préférence préchargés) en nœud immuable."""
+    questions = tuple(
+        QuestionNode(
+            id=q.id,
+            enonce=q.enonce,
+            choices=tuple(ChoiceNode(c.id, c.texte, c.is_correct) for c in q.choices.all()),
+        )
+        for q in quiz.questions.all()
+    )
+    return QuizNode(
+        id=quiz.id,
+        titre=quiz.titre,
+        seuil_reussite_pct=quiz.seuil_reussite_pct,
+        questions=questions,
+        answer_key={q.id: next((c.id for c in q.choices if c.is_correct), None) for q in questions},
+    )
+
+
+def _quiz_version_key(quiz_id: int) -> str:
+    return f"quiz_node:version:{quiz_id}"
+
+
+def invalidate_quiz_node(quiz_id: int | None) -> None:
+    """Rend obsolète le quiz compilé (questions, choix ou seuil modifiés)."""
+    if not quiz_id:
+        return
+    key = _quiz_version_key(quiz_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), None)
+
+
+def get_quiz_node(quiz: Quiz) -> QuizNode:
+    """
+    Quiz compilé d'une connaissance, mis en cache comme les plans. Les quiz de
+    module sont lus dans l'instantané du plan (``get_plan_structure``).
+    """
+    key = _quiz_version_key(quiz.id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    local = _local_quizzes.get(quiz.id)
+    if local is not None and local[0] == version:
+        return local[1]
+    node_key = f"quiz_node:{quiz.id}:{version}"
+    node = cache.get(node_key)
+    if node is None:
+        prefetch_related_objects([quiz], "questions__choices")
+        node = build_quiz_node(quiz)
+        cache.set(node_key, node, CACHE_TIMEOUT)
+    _local_quizzes[quiz.id] = (version, node)
+    return node
+
+
+def _build(plan_id: int, version: int) -> PlanStructure:
+    modules = (
+        Module.objects.filter(plan_id=plan_id)
+        .prefetch_related(
+            "steps",
+            "quiz__questions__choices",
+            Prefetch("knowledge_links", queryset=ModuleKnowledgeItem.objects.order_by("ordre")),
+        )
+        .order_by("ordre")
+    )
+    nodes = []
+    for mod in modules:
+        quiz = getattr(mod, "quiz", None)
+        nodes.append(
+            ModuleNode(
+                id=mod.id,
+                titre=mod.titre,
+                ordre=mod.ordre,
+                duree_jours=mod.duree_jours,
+                steps=tuple(StepNode(s.id, s.titre, s.ordre) for s in mod.steps.all()),
+                quiz=build_quiz_node(quiz) if quiz is not None else None,
+                knowledge_links=tuple(
+                    KnowledgeLinkNode(link.knowledge_item_id, link.ordre) for link in mod.knowledge_links.all()
+                ),
+            )
+        )
+    return PlanStructure(plan_id=plan_id, version=version, modules=tuple(nodes))
+
+
+def get_plan_structure(plan_id: int) -> PlanStructure:
+    """Instantané courant du plan : mémoire du processus, puis cache partagé, puis base."""
+    version = plan_version(plan_id)
+    structure = _local.get(plan_id)
+    if structure is not None and structure.version == version:
+        return structure
+    key = _structure_key(plan_id, version)
+    structure = cache.get(key)
+    if structure is None:
+        structure = _build(plan_id, version)
+        cache.set(key, structure, CACHE_TIMEOUT)
+    _local[plan_id] = structure
+    return structure
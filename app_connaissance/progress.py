@@ -0,0 +1,208 @@
+"""Calcul de la progression d'un utilisateur dans son plan d'intégration.
+
+``compute_plan_progress`` est en lecture seule et exécute un nombre constant de
+requêtes quel que soit le nombre de modules. La table ``Progression`` n'est mise
+à jour que par ``persist_progression``, appelée lorsqu'une sous-étape est
+cochée/décochée ou qu'un résultat de quiz change (signal ``progress_changed``).
+
+``cohort_progress`` applique les mêmes règles à tous les nouveaux arrivants
+d'un plan : un seul instantané du plan, et par paquet d'utilisateurs deux
+requêtes agrégées (sous-étapes cochées par module, quiz réussis).
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date
+from typing import Iterator, NamedTuple
+
+from django.db.models import Count
+
+from .models import (
+    KnowledgeItem,
+    PlanIntegration,
+    Progression,
+    UserModuleStepCompletion,
+    UserProfile,
+    UserQuizAttempt,
+)
+from .plan_structure import ModuleNode, PlanStructure, get_plan_structure
+
+
+def _linked_knowledge(structure: PlanStructure) -> dict[int, KnowledgeItem]:
+    # Titre et statut des connaissances évoluent hors du plan : lus à chaque fois, en une requête
+    ids = {link.knowledge_item_id for mod in structure.modules for link in mod.knowledge_links}
+    if not ids:
+        return {}
+    items = (
+        KnowledgeItem.objects.filter(id__in=ids)
+        .select_related("kind")
+        .only("id", "title", "status", "read_time_min", "kind__name")
+    )
+    return {item.id: item for item in items}
+
+
+def compute_plan_progress(user, plan: PlanIntegration) -> dict:
+    """Calcule la progression (pourcentage, modules complétés, quiz passés, sous-étapes) sans rien écrire.
+
+    La structure du plan provient de l'instantané en cache ; seuls les identifiants
+    des sous-étapes cochées et des quiz réussis sont lus pour l'utilisateur.
+    """
+    structure = get_plan_structure(plan.id)
+    modules = structure.modules
+    total = len(modules)
+    if total == 0:
+        return {"pourcentage": 0, "modules": []}
+
+    quiz_ids = [mod.quiz.id for mod in modules if mod.quiz is not None]
+    step_ids = [step.id for mod in modules for step in mod.steps]
+    quiz_passed_ids = set(
+        UserQuizAttempt.objects.filter(user=user, passed=True, quiz_id__in=quiz_ids)
+        .values_list("quiz_id", flat=True)
+    ) if quiz_ids else set()
+    completed_step_ids = set(
+        UserModuleStepCompletion.objects.filter(user=user, module_step_id__in=step_ids)
+        .values_list("module_step_id", flat=True)
+    ) if step_ids else set()
+    knowledge = _linked_knowledge(structure)
+    completed = 0
+    module_status = []
+    previous_module_passed = True  # Le premier module est toujours accessible
+
+    for mod in modules:
+        quiz = mod.quiz
+        steps = mod.steps
+        steps_completed = [s for s in steps if s.id in completed_step_ids]
+        steps_passed = len(steps) == 0 or len(steps_completed) == len(steps)
+        knowledge_items = [
+            {"item": knowledge[link.knowledge_item_id], "ordre": link.ordre}
+            for link in mod.knowledge_links
+            if link.knowledge_item_id in knowledge
+        ]
+
+        # Vérifier si le module est accessible (module précédent complété)
+        module_accessible = previous_module_passed
+        status = {
+            "module": mod,
+            "has_quiz": quiz is not None,
+            "accessible": module_accessible,
+            "steps_passed": steps_passed,
+            "quiz": quiz,
+            "steps": steps,
+            "steps_completed": steps_completed,
+            "completed_step_ids": completed_step_ids,
+            "knowledge_items": knowledge_items,
+        }
+        if quiz is not None:
+            quiz_passed = quiz.id in quiz_passed_ids
+            # Un module est validé seulement si : accessible + étapes complétées + quiz réussi
+            mod_passed = module_accessible and quiz_passed and steps_passed
+            status["quiz_passed"] = quiz_passed
+        else:
+            # Un module sans quiz est validé seulement si : accessible + étapes complétées
+            mod_passed = module_accessible and steps_passed
+        status["passed"] = mod_passed
+        if mod_passed:
+            completed += 1
+        module_status.append(status)
+
+        # Si le module actuel n'est pas passé, les suivants ne sont pas accessibles
+        previous_module_passed = mod_passed
+
+    pourcentage = round((completed / total) * 100)
+    return {"pourcentage": pourcentage, "modules": module_status}
+
+
+def persist_progression(user, plan: PlanIntegration) -> Progression:
+    """Recalcule la progression et n'écrit ``Progression`` que si le pourcentage a changé."""
+    pourcentage = compute_plan_progress(user, plan)["pourcentage"]
+    progression, created = Progression.objects.get_or_create(
+        user=user, plan=plan, defaults={"pourcentage": pourcentage}
+    )
+    if not created and progression.pourcentage != pourcentage:
+        progression.pourcentage = pourcentage
+        progression.save(update_fields=["pourcentage"])
+    return progression
+
+
+class CohortRow(NamedTuple):
+    user_id: int
+    display_name: str
+    department: str
+    poste: str
+    date_embauche: date | None
+    steps_completed: int
+    quizzes_passed: int
+    modules_completed: int
+    pourcentage: int
+    # Premier module non validé ("" si le plan est terminé)
+    current_module: str
+
+
+def _modules_completed(modules: tuple[ModuleNode, ...], steps_done: dict[int, int], passed: set[int]) -> int:
+    # Mêmes règles que compute_plan_progress : un module n'est validé que si le précédent l'est
+    completed = 0
+    for mod in modules:
+        if steps_done.get(mod.id, 0) < len(mod.steps) or (mod.quiz is not None and mod.quiz.id not in passed):
+            break
+        completed += 1
+    return completed
+
+
+def cohort_progress(plan: PlanIntegration, department_id: int | None = None, chunk_size: int = 2000) -> Iterator[CohortRow]:
+    """Progression de chaque utilisateur dont le poste suit ``plan`` (éventuellement d'un seul département)."""
+    structure = get_plan_structure(plan.id)
+    modules = structure.modules
+    quiz_ids = [mod.quiz.id for mod in modules if mod.quiz is not None]
+    step_ids = [step.id for mod in modules for step in mod.steps]
+    members = (
+        UserProfile.objects.filter(poste__plan_integration=plan, user__isnull=False)
+        .order_by("display_name", "user_id")
+        .values_list("user_id", "display_name", "department__name", "poste__intitule", "date_embauche")
+    )
+    if department_id:
+        members = members.filter(department_id=department_id)
+
+    chunk: list[tuple] = []
+    for member in members.iterator(chunk_size=chunk_size):
+        chunk.append(member)
+        if len(chunk) == chunk_size:
+            yield from _cohort_chunk(chunk, modules, step_ids, quiz_ids)
+            chunk = []
+    if chunk:
+        yield from _cohort_chunk(chunk, modules, step_ids, quiz_ids)
+
+
+def _cohort_chunk(members: list[tuple], modules, step_ids: list[int], quiz_ids: list[int]) -> Iterator[CohortRow]:
+    user_ids = [m[0] for m in members]
+    steps_done: dict[int, dict[int, int]] = defaultdict(dict)
+    if step_ids:
+        counts = (
+            UserModuleStepCompletion.objects.filter(user_id__in=user_ids, module_step_id__in=step_ids)
+            .values_list("user_id", "module_step__module_id")
+            .annotate(n=Count("id"))
+            .order_by()
+        )
+        for user_id, module_id, n in counts:
+            steps_done[user_id][module_id] = n
+    passed: dict[int, set[int]] = defaultdict(set)
+    if quiz_ids:
+        for user_id, quiz_id in UserQuizAttempt.objects.filter(
+            user_id__in=user_ids, quiz_id__in=quiz_ids, passed=True,
+        ).values_list("user_id", "quiz_id"):
+            passed[user_id].add(quiz_id)
+
+    total = len(modules)
+    for user_id, display_name, department, poste, date_embauche in members:
+        completed = _modules_completed(modules, steps_done[user_id], passed[user_id])
+        yield CohortRow(
+            user_id=user_id,
+            display_name=display_name,
+            department=department or "",
+            poste=poste or "",
+            date_embauche=date_embauche,
+            steps_completed=sum(steps_done[user_id].values()),
+            quizzes_passed=len(passed[user_id]),
+            modules_completed=completed,
+            pourcentage=round(completed * 100 / total) if total else 0,
+            current_module=modules[completed].titre if completed < total else "",
+        )
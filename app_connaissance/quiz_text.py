@@ -0,0 +1,181 @@
+"""Analyse du texte d'une connaissance pour la génération automatique de quiz.
+
+Fonctions pures (aucun accès base, aucun import de modèles) : elles peuvent
+tourner dans des processus de travail (``generate_quizzes --workers``).
+Une question est un tuple ``(énoncé, bonne réponse, distracteurs)``.
+
+Les distracteurs viennent en priorité du vocabulaire de tout le corpus publié
+(``Vocabulary``, chargé par ``vocabulary.get_vocabulary``) : mots de même classe
+grammaticale, de longueur et de fréquence proches de la bonne réponse.
+"""
+from __future__ import annotations
+
+import math
+import random
+import re
+from bisect import bisect_left
+from collections import Counter
+from typing import Iterable
+
+FALLBACK_DISTRACTORS = ["Option A", "Option B", "Option C", "Option D"]
+
+QuestionDraft = tuple[str, str, list[str]]
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_SENTENCE_RE = re.compile(r'[.!?]')
+_NON_WORD_RE = re.compile(r'[^\w]')
+
+
+_ADJECTIVE_SUFFIXES = ("ique", "able", "ible", "euse", "eux", "ive", "if", "elle")
+_VERB_SUFFIXES = ("er", "ir")
+
+
+def clean_word(word: str) -> str:
+    return _NON_WORD_RE.sub('', word)
+
+
+def word_class(word: str) -> str:
+    """Classe grammaticale approximative d'un mot (suffixes du français, sans analyseur)."""
+    if any(ch.isdigit() for ch in word):
+        return "nombre"
+    if word[:1].isupper():
+        return "propre"
+    if word.endswith(_ADJECTIVE_SUFFIXES):
+        return "adjectif"
+    if word.endswith(_VERB_SUFFIXES) and not word.endswith("ier"):
+        return "verbe"
+    return "nom"
+
+
+class Vocabulary:
+    """Vocabulaire du corpus, groupé par (classe, longueur) et trié par fréquence documentaire."""
+
+    __slots__ = ("frequencies", "buckets")
+
+    def __init__(self, entries: Iterable[tuple[str, int]]):
+        self.frequencies: dict[str, int] = {}
+        grouped: dict[tuple[str, int], list[tuple[int, str]]] = {}
+        for word, count in entries:
+            self.frequencies[word] = count
+            grouped.setdefault((word_class(word), len(word)), []).append((count, word))
+        self.buckets: dict[tuple[str, int], tuple[list[int], list[str]]] = {}
+        for key, pairs in grouped.items():
+            pairs.sort()
+            self.buckets[key] = ([c for c, _ in pairs], [w for _, w in pairs])
+
+    def __len__(self) -> int:
+        return len(self.frequencies)
+
+    def pick(self, answer: str, k: int = 3, window: int = 4) -> list[str]:
+        """``k`` mots proches de la réponse : même classe, longueur ±2, fréquence voisine."""
+        target = clean_word(answer)
+        if not target:
+            return []
+        lowered = target.lower()
+        cls = word_class(target)
+        frequency = self.frequencies.get(target, 1)
+        scored: list[tuple[float, str]] = []
+        for offset in (0, -1, 1, -2, 2):
+            bucket = self.buckets.get((cls, len(target) + offset))
+            if bucket is None:
+                continue
+            counts, words = bucket
+            # Fenêtre autour de la fréquence de la cible (recherche dichotomique)
+            pos = bisect_left(counts, frequency)
+            for i in range(max(0, pos - window), min(len(words), pos + window)):
+                if words[i].lower() != lowered:
+                    score = abs(math.log(counts[i]) - math.log(frequency)) + abs(offset) * 0.5
+                    scored.append((score, words[i]))
+            if len(scored) >= 2 * k:
+                break
+        scored.sort()
+        pool: list[str] = []
+        for _, word in scored:
+            if word.lower() not in (w.lower() for w in pool):
+                pool.append(word)
+            if len(pool) == 2 * k:
+                break
+        return random.sample(pool, min(k, len(pool)))
+
+
+class DocumentIndex:
+    """Texte d'une connaissance découpé une seule fois : phrases et vocabulaire (avec fréquences).
+
+    Le vocabulaire contient les mots nettoyés de plus de 3 lettres (issus de mots bruts
+    de plus de 4 caractères), dans leur ordre d'apparition.
+    """
+
+    __slots__ = ("sentences", "frequencies", "vocabulary")
+
+    def __init__(self, content: str):
+        # Nettoyage HTML basique
+        text = _TAG_RE.sub('', content)
+        # Découpage en phrases (très simpliste)
+        self.sentences = [s for s in (part.strip() for part in _SENTENCE_RE.split(text)) if len(s) > 20]
+        self.frequencies: Counter[str] = Counter(
+            word for word in (clean_word(raw) for raw in text.split() if len(raw) > 4) if len(word) > 3
+        )
+        self.vocabulary = list(self.frequencies)
+
+    def sample_distractors(self, answer: str, k: int = 3) -> list[str]:
+        """``k`` mots distincts du texte, différents de la réponse (tirage en O(k) en moyenne)."""
+        excluded = clean_word(answer)
+        vocabulary = self.vocabulary
+        available = len(vocabulary) - (excluded in self.frequencies)
+        if available <= k:
+            return [w for w in vocabulary if w != excluded]
+        picks: list[str] = []
+        while len(picks) < k:
+            word = vocabulary[random.randrange(len(vocabulary))]
+            if word != excluded and word not in picks:
+                picks.append(word)
+        return picks
+
+
+def draft_quiz_questions(content: str, vocabulary: Vocabulary | None = None) -> list[QuestionDraft]:
+    """Retourne les questions à trous tirées du texte (liste vide si contenu insuffisant)."""
+    index = DocumentIndex(content)
+    if len(index.sentences) < 2:
+        return []
+
+    # Sélectionner quelques phrases aléatoires
+    selected_sentences = random.sample(index.sentences, min(5, len(index.sentences)))
+
+    questions: list[QuestionDraft] = []
+    for sent in selected_sentences:
+        words = [w for w in sent.split() if len(w) > 4]
+        if not words:
+            continue
+
+        # Mot à deviner (le plus long par défaut)
+        target_word = max(words, key=len)
+        question_text = sent.replace(target_word, "______")
+
+        # Mauvaises réponses : vocabulaire du corpus, puis mots du texte, puis options génériques
+        distractors = vocabulary.pick(target_word) if vocabulary is not None else []
+        if len(distractors) < 3:
+            for word in index.sample_distractors(target_word):
+                if word not in distractors:
+                    distractors.append(word)
+            del distractors[3:]
+        while len(distractors) < 3:
+            distractors.append(FALLBACK_DISTRACTORS[len(distractors)])
+
+        questions.append((f"Complétez : {question_text}", target_word, distractors))
+    return questions
+
+
+# Vocabulaire du corpus utilisé par ``analyse_item`` (un exemplaire par processus)
+_vocabulary: Vocabulary | None = None
+
+
+def set_vocabulary(vocabulary: Vocabulary | None) -> None:
+    """Installe le vocabulaire du processus (``initializer`` du pool de processus)."""
+    global _vocabulary
+    _vocabulary = vocabulary
+
+
+def analyse_item(job: tuple[int, str]) -> tuple[int, list[QuestionDraft]]:
+    """``(id, contenu)`` -> ``(id, questions)`` ; point d'entrée des processus de travail."""
+    item_id, content = job
+    return item_id, draft_quiz_questions(content, _vocabulary)
@@ -0,0 +1,145 @@
+"""Index de recherche plein texte des connaissances.
+
+L'index est une table virtuelle FTS5 de SQLite (créée par la migration 0011) :
+les recherches sont classées par BM25 et renvoient un extrait surligné.
+Si la table n'existe pas, ``is_available()`` renvoie False et les vues
+retombent sur un filtrage ``icontains``.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+
+from django.core.exceptions import EmptyResultSet
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape, strip_tags
+
+FTS_TABLE = "app_connaissance_knowledge_fts"
+
+# Nombre de résultats classés renvoyés par défaut par ``search()``.
+MAX_RESULTS = 200
+
+# Poids BM25 par colonne : titre, description, contenu, tags.
+_BM25_WEIGHTS = "10.0, 4.0, 1.0, 6.0"
+
+# Marqueurs internes du surlignage (remplacés par <mark> après échappement HTML).
+_HL_START = "\x02"
+_HL_END = "\x03"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+_available: bool | None = None
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    item_id: int
+    snippet: str
+
+
+def is_available() -> bool:
+    """True si la table FTS5 existe dans la base courante (résultat mis en cache)."""
+    global _available
+    if _available is None:
+        if connection.vendor != "sqlite":
+            _available = False
+        else:
+            _available = FTS_TABLE in connection.introspection.table_names()
+    return _available
+
+
+def _row_for(item_id: int, title: str, description: str, content: str, tag_names) -> tuple:
+    return (
+        item_id,
+        title or "",
+        description or "",
+        strip_tags(content or ""),
+        " ".join(tag_names),
+    )
+
+
+def index_knowledge_item(item) -> None:
+    """(Ré)indexe une connaissance : à appeler après création, édition, publication, duplication."""
+    if not is_available():
+        return
+    row = _row_for(item.pk, item.title, item.description, item.content, item.tags.values_list("name", flat=True))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [item.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description, body, tags) VALUES (%s, %s, %s, %s, %s)",
+            row,
+        )
+
+
+def remove_knowledge_item(item_id: int) -> None:
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [item_id])
+
+
+def rebuild_index(items) -> int:
+    """Reconstruit entièrement l'index à partir d'un itérable de connaissances (tags préchargés)."""
+    if not is_available():
+        return 0
+    rows = [
+        _row_for(i.pk, i.title, i.description, i.content, [t.name for t in i.tags.all()])
+        for i in items
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description, body, tags) VALUES (%s, %s, %s, %s, %s)",
+            rows,
+        )
+    return len(rows)
+
+
+def build_match_query(raw: str) -> str:
+    """Transforme la saisie utilisateur en requête FTS5 sûre (préfixes, ET implicite)."""
+    tokens = _TOKEN_RE.findall(raw or "")
+    return " ".join(f'"{t}"*' for t in tokens)
+
+
+def _render_snippet(raw: str) -> str:
+    return escape(raw).replace(_HL_START, "<mark>").replace(_HL_END, "</mark>")
+
+
+def search(raw_query: str, limit: int = MAX_RESULTS, offset: int = 0, within=None) -> list[SearchHit] | None:
+    """
+    Recherche classée (meilleur score d'abord, puis identifiant). Retourne None si l'index est indisponible.
+    ``within`` (queryset de connaissances) restreint les résultats dans la requête FTS elle-même,
+    avant le classement et la limite : les contenus invisibles n'occupent aucune place.
+    """
+    if not is_available():
+        return None
+    match = build_match_query(raw_query)
+    if not match:
+        return []
+    params = [_HL_START, _HL_END, match]
+    scope = ""
+    if within is not None:
+        try:
+            scope_sql, scope_params = within.order_by().values("id").query.sql_with_params()
+        except EmptyResultSet:
+            return []
+        scope = f"AND rowid IN ({scope_sql}) "
+        params.extend(scope_params)
+    sql = (
+        f"SELECT rowid, snippet({FTS_TABLE}, -1, %s, %s, '…', 16) "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s {scope}"
+        f"ORDER BY bm25({FTS_TABLE}, {_BM25_WEIGHTS}), rowid LIMIT %s OFFSET %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, limit, offset])
+        rows = cursor.fetchall()
+    return [SearchHit(item_id=row[0], snippet=_render_snippet(row[1] or "")) for row in rows]
+
+
+def matching_ids(raw_query: str) -> RawSQL | None:
+    """Sous-requête des identifiants correspondants (filtre ``id__in``, sans classement) ; None si rien à chercher."""
+    match = build_match_query(raw_query)
+    if not match:
+        return None
+    return RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
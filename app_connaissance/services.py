@@ -1,6 +1,44 @@
-import random
-import re
+from django.db import transaction
+
+from .conditional import bump_list_version
+from .fragments import invalidate_knowledge_fragments
 from .models import KnowledgeItem, Quiz, QuizQuestion, QuizChoice
+from .quiz_text import QuestionDraft, draft_quiz_questions
+from .vocabulary import get_vocabulary
+
+
+def save_quiz_drafts(drafts: list[tuple[int, str, list[QuestionDraft]]]) -> list[Quiz]:
+    """
+    Enregistre des quiz générés : ``(id connaissance, titre connaissance, questions)``.
+    Trois ``bulk_create`` (quiz, questions, choix) quel que soit le nombre de quiz ;
+    à appeler dans une transaction.
+    """
+    drafts = [d for d in drafts if d[2]]
+    quizzes = Quiz.objects.bulk_create([
+        Quiz(knowledge_item_id=item_id, titre=f"Quiz : {title}", seuil_reussite_pct=70)
+        for item_id, title, _ in drafts
+    ])
+
+    questions = []
+    for quiz, (_, _, question_drafts) in zip(quizzes, drafts):
+        for ordre, (enonce, _, _) in enumerate(question_drafts, start=1):
+            questions.append(QuizQuestion(quiz=quiz, enonce=enonce, ordre=ordre))
+    QuizQuestion.objects.bulk_create(questions)
+
+    choices = []
+    saved_questions = iter(questions)
+    for _, _, question_drafts in drafts:
+        for _, answer, distractors in question_drafts:
+            q = next(saved_questions)
+            choices.append(QuizChoice(question=q, texte=answer, is_correct=True))
+            choices.extend(QuizChoice(question=q, texte=d, is_correct=False) for d in distractors)
+    QuizChoice.objects.bulk_create(choices)
+    if quizzes:
+        # bulk_create n'envoie pas de signaux : la liste affiche un badge « quiz »
+        bump_list_version()
+        invalidate_knowledge_fragments(*(quiz.knowledge_item_id for quiz in quizzes))
+    return quizzes
+
 
 def generate_quiz_for_knowledge(item: KnowledgeItem) -> Quiz | None:
     """
@@ -10,67 +48,9 @@ def generate_quiz_for_knowledge(item: KnowledgeItem) -> Quiz | None:
     if hasattr(item, "quiz"):
         return item.quiz
 
-    # Extraction du contenu
-    text = item.content
-    # Nettoyage HTML basique
-    text = re.sub(r'<[^>]+>', '', text)
-    # Découpage en phrases (très simpliste)
-    sentences = [s.strip() for s in re.split(r'[.!?]', text) if len(s.strip()) > 20]
-    
-    if len(sentences) < 2:
+    questions = draft_quiz_questions(item.content, get_vocabulary())
+    if not questions:
         return None
-    
-    # Sélectionner quelques phrases aléatoires
-    selected_sentences = random.sample(sentences, min(5, len(sentences)))
-    
-    quiz = Quiz.objects.create(
-        knowledge_item=item,
-        titre=f"Quiz : {item.title}",
-        seuil_reussite_pct=70
-    )
-    
-    count = 0
-    for i, sent in enumerate(selected_sentences):
-        words = [w for w in sent.split() if len(w) > 4]
-        if not words:
-            continue
-        
-        # Mot à deviner (le plus long par défaut)
-        target_word = max(words, key=len)
-        question_text = sent.replace(target_word, "______")
-        
-        q = QuizQuestion.objects.create(
-            quiz=quiz,
-            enonce=f"Complétez : {question_text}",
-            ordre=i+1
-        )
-        
-        # Bonne réponse
-        QuizChoice.objects.create(question=q, texte=target_word, is_correct=True)
-        
-        # Mauvaises réponses (mots aléatoires du texte)
-        all_words = [w for w in text.split() if len(w) > 4 and w != target_word]
-        # Nettoyage des mots (ponctuation)
-        all_words = [re.sub(r'[^\w]', '', w) for w in all_words]
-        all_words = [w for w in all_words if len(w) > 3] # Filtre court après nettoyage
-        
-        distractors = []
-        if len(all_words) >= 3:
-            distractors = random.sample(list(set(all_words)), min(3, len(set(all_words))))
-        
-        # Compléter si pas assez de distracteurs
-        while len(distractors) < 3:
-            fallback = ["Option A", "Option B", "Option C", "Option D"]
-            distractors.append(fallback[len(distractors)])
 
-        for d in distractors:
-             QuizChoice.objects.create(question=q, texte=d, is_correct=False)
-        
-        count += 1
-        
-    if count == 0:
-        # Si aucune question n'a pu être générée, on supprime le quiz vide
-        quiz.delete()
-        return None
-        
-    return quiz
+    with transaction.atomic():
+        return save_quiz_drafts([(item.id, item.title, questions)])[0]
@@ -0,0 +1,187 @@
+"""Invalidation des données mises en cache lorsque les modèles sources changent."""
+from __future__ import annotations
+
+from collections import Counter
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from .conditional import bump_list_version
+from .fragments import invalidate_all_fragments, invalidate_knowledge_fragments
+from .frontend_auth import invalidate_principal
+from .models import (
+    Competence,
+    Department,
+    KnowledgeItem,
+    KnowledgeKind,
+    KnowledgeVocabulary,
+    Module,
+    ModuleKnowledgeItem,
+    ModuleStep,
+    PlanIntegration,
+    Poste,
+    Quiz,
+    QuizChoice,
+    QuizQuestion,
+    Tag,
+    UserProfile,
+)
+from .plan_structure import invalidate_plan_structure, invalidate_quiz_node
+from .progress import persist_progression
+from .stats import invalidate_knowledge_stats
+from .vocabulary import apply_counts
+
+# Envoyé quand une sous-étape est cochée/décochée ou qu'un résultat de quiz change.
+# Arguments : user, plan (PlanIntegration).
+progress_changed = Signal()
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def _profile_changed(sender, instance: UserProfile, **kwargs) -> None:
+    if instance.user_id:
+        invalidate_principal(instance.user_id)
+        # Nom d'auteur affiché sur les cartes (et donc dans l'ETag de la liste)
+        authored = list(KnowledgeItem.objects.filter(author_user_id=instance.user_id).values_list("id", flat=True))
+        if authored:
+            invalidate_knowledge_fragments(*authored)
+            bump_list_version()
+
+
+@receiver(post_save, sender=Poste)
+@receiver(post_delete, sender=Poste)
+@receiver(post_delete, sender=Department)
+@receiver(post_delete, sender=PlanIntegration)
+def _organisation_changed(sender, **kwargs) -> None:
+    # Le plan d'un poste ou les rattachements (SET_NULL) changent pour plusieurs utilisateurs
+    invalidate_principal()
+    if sender is Department:
+        bump_list_version()
+        invalidate_all_fragments()
+
+
+def _module_plan_id(module_id: int | None) -> int | None:
+    if not module_id:
+        return None
+    return Module.objects.filter(pk=module_id).values_list("plan_id", flat=True).first()
+
+
+def _quiz_plan_id(quiz_id: int, quiz: Quiz | None = None) -> int | None:
+    # Quiz déjà chargé (cas de la génération automatique) : pas de requête pour un quiz de connaissance
+    if quiz is not None and not quiz.module_id:
+        return None
+    return Quiz.objects.filter(pk=quiz_id).values_list("module__plan_id", flat=True).first()
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def _module_changed(sender, instance: Module, **kwargs) -> None:
+    invalidate_plan_structure(instance.plan_id)
+
+
+@receiver(post_save, sender=ModuleStep)
+@receiver(post_delete, sender=ModuleStep)
+@receiver(post_save, sender=ModuleKnowledgeItem)
+@receiver(post_delete, sender=ModuleKnowledgeItem)
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+def _module_part_changed(sender, instance, **kwargs) -> None:
+    if sender is Quiz:
+        invalidate_quiz_node(instance.id)
+    if sender is Quiz and instance.knowledge_item_id:
+        # Badge « quiz » de la liste des connaissances
+        bump_list_version()
+        invalidate_knowledge_fragments(instance.knowledge_item_id)
+    invalidate_plan_structure(_module_plan_id(instance.module_id))
+
+
+@receiver(post_save, sender=QuizQuestion)
+@receiver(post_delete, sender=QuizQuestion)
+def _question_changed(sender, instance: QuizQuestion, **kwargs) -> None:
+    quiz = instance.quiz if QuizQuestion.quiz.is_cached(instance) else None
+    invalidate_quiz_node(instance.quiz_id)
+    invalidate_plan_structure(_quiz_plan_id(instance.quiz_id, quiz))
+
+
+@receiver(post_save, sender=QuizChoice)
+@receiver(post_delete, sender=QuizChoice)
+def _choice_changed(sender, instance: QuizChoice, **kwargs) -> None:
+    quiz = None
+    if QuizChoice.question.is_cached(instance) and QuizQuestion.quiz.is_cached(instance.question):
+        quiz = instance.question.quiz
+    if quiz is not None:
+        invalidate_quiz_node(quiz.id)
+        invalidate_plan_structure(_quiz_plan_id(quiz.id, quiz))
+    else:
+        quiz_id, plan_id = (
+            Quiz.objects.filter(questions__id=instance.question_id)
+            .values_list("id", "module__plan_id")
+            .first()
+        ) or (None, None)
+        invalidate_quiz_node(quiz_id)
+        invalidate_plan_structure(plan_id)
+
+
+@receiver(pre_save, sender=KnowledgeItem)
+def _knowledge_moving(sender, instance: KnowledgeItem, update_fields=None, **kwargs) -> None:
+    # Département d'origine : ses statistiques changent aussi si la fiche change de département
+    if instance._state.adding or (update_fields is not None and "department" not in update_fields):
+        instance._previous_department_id = instance.department_id
+        return
+    instance._previous_department_id = (
+        KnowledgeItem.objects.filter(pk=instance.pk).values_list("department_id", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=KnowledgeItem)
+@receiver(post_delete, sender=KnowledgeItem)
+def _knowledge_changed(sender, instance: KnowledgeItem, **kwargs) -> None:
+    previous = getattr(instance, "_previous_department_id", instance.department_id)
+    invalidate_knowledge_stats(instance.department_id, previous)
+    bump_list_version()
+    invalidate_knowledge_fragments(instance.pk)
+
+
+@receiver(m2m_changed, sender=KnowledgeItem.tags.through)
+@receiver(m2m_changed, sender=KnowledgeItem.competences.through)
+def _knowledge_labels_assigned(sender, instance, action: str, reverse: bool, pk_set, **kwargs) -> None:
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        invalidate_knowledge_fragments(instance.pk)
+    elif pk_set:
+        invalidate_knowledge_fragments(*pk_set)
+    else:
+        # clear() depuis le tag : connaissances concernées inconnues
+        invalidate_all_fragments()
+    bump_list_version()
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_save, sender=KnowledgeKind)
+@receiver(post_delete, sender=KnowledgeKind)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Competence)
+@receiver(post_delete, sender=Competence)
+def _knowledge_labels_changed(sender, instance, signal, created: bool = False, **kwargs) -> None:
+    # Noms affichés dans la liste (filtres, badges) et dans les fragments en cache
+    if sender is not Competence:
+        bump_list_version()
+    if sender in (Tag, Competence) and signal is post_save:
+        if not created:
+            invalidate_knowledge_fragments(*instance.knowledge_items.values_list("id", flat=True))
+    else:
+        # Département ou type (sur toutes les cartes), suppression (liens déjà effacés) : tout le cache
+        invalidate_all_fragments()
+
+
+@receiver(post_delete, sender=KnowledgeVocabulary)
+def _vocabulary_source_deleted(sender, instance: KnowledgeVocabulary, **kwargs) -> None:
+    # Connaissance supprimée ou dépubliée : ses mots ne comptent plus dans le corpus
+    apply_counts(Counter({word: -1 for word in instance.words}))
+
+
+@receiver(progress_changed)
+def _update_progression(sender, user, plan, **kwargs) -> None:
+    persist_progression(user, plan)
@@ -0,0 +1,151 @@
+"""Compteurs et statistiques mis en cache (avec repli sur la base si le cache est indisponible)."""
+from __future__ import annotations
+
+import logging
+
+from django.core.cache import cache
+from django.db.models import Count, OuterRef, Q, QuerySet, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Department, KnowledgeItem, UserProfile
+
+logger = logging.getLogger(__name__)
+
+PENDING_VALIDATION_KEY = "stats:pending_validation_count"
+
+# Filet de sécurité : le compteur est recalculé au moins toutes les 10 minutes
+PENDING_VALIDATION_TIMEOUT = 10 * 60
+
+
+def pending_validation_count() -> int:
+    """Nombre de connaissances en attente de validation (lu dans le cache si possible)."""
+    try:
+        value = cache.get(PENDING_VALIDATION_KEY)
+    except Exception:
+        logger.warning("Cache indisponible pour le compteur de validation", exc_info=True)
+        value = None
+    if value is not None:
+        return max(0, int(value))
+    value = KnowledgeItem.objects.filter(status=KnowledgeItem.Status.IN_REVIEW).count()
+    try:
+        cache.add(PENDING_VALIDATION_KEY, value, PENDING_VALIDATION_TIMEOUT)
+    except Exception:
+        pass
+    return value
+
+
+def track_status_change(old_status: str | None, new_status: str) -> None:
+    """Répercute une transition de statut sur le compteur (création : ``old_status=None``)."""
+    in_review = KnowledgeItem.Status.IN_REVIEW
+    delta = int(new_status == in_review) - int(old_status == in_review)
+    if not delta:
+        return
+    try:
+        cache.incr(PENDING_VALIDATION_KEY, delta)
+    except ValueError:
+        # Compteur absent du cache : il sera recalculé à la prochaine lecture
+        pass
+    except Exception:
+        invalidate_pending_validation_count()
+
+
+def invalidate_pending_validation_count() -> None:
+    try:
+        cache.delete(PENDING_VALIDATION_KEY)
+    except Exception:
+        logger.warning("Impossible d'invalider le compteur de validation", exc_info=True)
+
+
+# Agrégats du tableau de bord, par « seau » : un département, les contenus
+# globaux (sans département) ou l'ensemble (admin/manager). Un employé lit son
+# département + le global ; une modification n'invalide que ses seaux.
+KNOWLEDGE_STATS_TIMEOUT = 10 * 60
+
+
+def _stats_key(bucket: int | str | None) -> str:
+    return f"stats:knowledge:{bucket or 'global'}"
+
+
+def _aggregate(queryset: QuerySet) -> dict[str, int]:
+    Status = KnowledgeItem.Status
+    agg = queryset.aggregate(
+        total=Count("id"),
+        published=Count("id", filter=Q(status=Status.PUBLISHED)),
+        pending=Count("id", filter=Q(status=Status.IN_REVIEW)),
+        read_sum=Sum("read_time_min"),
+    )
+    return {name: int(value or 0) for name, value in agg.items()}
+
+
+def knowledge_stats(department_id: int | None, sees_all_departments: bool) -> dict[str, int]:
+    """``total``, ``published``, ``pending`` et ``avg_read`` des connaissances visibles, lus dans le cache si possible."""
+    items = KnowledgeItem.objects.order_by()
+    if sees_all_departments:
+        parts = {_stats_key("all"): items}
+    elif department_id:
+        parts = {
+            _stats_key(department_id): items.filter(department_id=department_id),
+            _stats_key(None): items.filter(department__isnull=True),
+        }
+    else:
+        parts = {}
+    try:
+        cached = cache.get_many(list(parts))
+    except Exception:
+        logger.warning("Cache indisponible pour les statistiques du tableau de bord", exc_info=True)
+        cached = {}
+    for key, queryset in parts.items():
+        if key in cached:
+            continue
+        cached[key] = _aggregate(queryset)
+        try:
+            cache.add(key, cached[key], KNOWLEDGE_STATS_TIMEOUT)
+        except Exception:
+            pass
+
+    totals = {"total": 0, "published": 0, "pending": 0, "read_sum": 0}
+    for key in parts:
+        for name in totals:
+            totals[name] += cached[key][name]
+    read_sum = totals.pop("read_sum")
+    totals["avg_read"] = round(read_sum / totals["total"]) if totals["total"] else 0
+    return totals
+
+
+def invalidate_knowledge_stats(*department_ids: int | None) -> None:
+    """Invalide les seaux des départements donnés (``None`` : contenus globaux) et l'agrégat complet."""
+    keys = {_stats_key("all")} | {_stats_key(d) for d in department_ids}
+    try:
+        cache.delete_many(list(keys))
+    except Exception:
+        logger.warning("Impossible d'invalider les statistiques du tableau de bord", exc_info=True)
+
+
+def _count_per_department(queryset: QuerySet) -> Coalesce:
+    """Sous-requête corrélée : nombre de lignes de ``queryset`` rattachées au département courant."""
+    counts = (
+        queryset.filter(department=OuterRef("pk"))
+        .order_by()
+        .values("department")
+        .annotate(n=Count("pk"))
+        .values("n")
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def departments_with_stats() -> QuerySet:
+    """
+    Départements annotés : ``members``, ``knowledge`` et sa répartition
+    (``knowledge_published``, ``knowledge_in_review``, ``knowledge_draft``).
+    Une sous-requête indépendante par compteur : contrairement à deux ``Count``
+    sur des jointures, les profils et les connaissances ne se multiplient pas.
+    """
+    items = KnowledgeItem.objects.all()
+    Status = KnowledgeItem.Status
+    return Department.objects.annotate(
+        members=_count_per_department(UserProfile.objects.all()),
+        knowledge=_count_per_department(items),
+        knowledge_published=_count_per_department(items.filter(status=Status.PUBLISHED)),
+        knowledge_in_review=_count_per_department(items.filter(status=Status.IN_REVIEW)),
+        knowledge_draft=_count_per_department(items.filter(status=Status.DRAFT)),
+    )
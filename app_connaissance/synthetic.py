@@ -0,0 +1,317 @@
+"""Jeux de données synthétiques volumineux (benchmarks, tests de charge).
+
+Toutes les lignes sont écrites par ``bulk_create`` en lots ; le contenu ne
+dépend que de la graine (``seed``). Les noms sont préfixés par ``PREFIX`` pour
+ne pas entrer en conflit avec des données existantes.
+"""
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass, fields
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import (
+    Department,
+    KnowledgeItem,
+    KnowledgeKind,
+    KnowledgeVersion,
+    Module,
+    ModuleKnowledgeItem,
+    ModuleStep,
+    PlanIntegration,
+    Poste,
+    Progression,
+    Quiz,
+    QuizChoice,
+    QuizQuestion,
+    Tag,
+    UserModuleStepCompletion,
+    UserProfile,
+    UserQuizAttempt,
+)
+
+PREFIX = "synth"
+
+PASSWORD = "synthetique"
+
+_WORDS = (
+    "procédure validation déploiement sauvegarde serveur intégration documentation responsable "
+    "environnement configuration sécurité utilisateur application référentiel incident supervision "
+    "formation processus planning livraison maintenance contrôle qualité archivage client contrat "
+    "facture réunion équipe projet budget analyse rapport audit accès réseau poste badge accueil"
+).split()
+
+_ROLES = (
+    [UserProfile.Role.EMPLOYEE] * 6
+    + [UserProfile.Role.NEW_EMPLOYEE] * 2
+    + [UserProfile.Role.MANAGER, UserProfile.Role.ADMIN]
+)
+
+# Phrases tirées d'un réservoir : générer chaque mot au hasard coûterait plus
+# que l'écriture en base pour les gros volumes.
+_POOL_SIZE = 4000
+
+
+@dataclass
+class Scale:
+    """Volumes à générer (par modèle)."""
+    departments: int = 10
+    kinds: int = 6
+    tags: int = 50
+    plans: int = 20
+    postes: int = 20
+    modules_per_plan: int = 5
+    steps_per_module: int = 3
+    questions_per_quiz: int = 4
+    links_per_module: int = 2
+    knowledge_items: int = 5000
+    versions_per_item: int = 1
+    users: int = 500
+
+    @classmethod
+    def parse(cls, values: list[str]) -> Scale:
+        """Construit une échelle depuis des paires ``nom=N`` ; lève ValueError si invalide."""
+        names = {f.name for f in fields(cls)}
+        overrides = {}
+        for value in values:
+            name, sep, number = value.partition("=")
+            name = name.strip().replace("-", "_")
+            if not sep or name not in names or not number.strip().isdigit():
+                raise ValueError(f"Échelle invalide « {value} » (attendu nom=N parmi : {', '.join(sorted(names))})")
+            overrides[name] = int(number)
+        return cls(**overrides)
+
+
+class _Text:
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.sentences = [self._sentence(rng.randint(8, 16)) for _ in range(_POOL_SIZE)]
+
+    def _sentence(self, words: int) -> str:
+        text = " ".join(self.rng.choices(_WORDS, k=words))
+        return text[0].upper() + text[1:] + "."
+
+    def title(self) -> str:
+        return self._sentence(4)[:-1]
+
+    def sentence(self) -> str:
+        return self.rng.choice(self.sentences)
+
+    def article(self) -> str:
+        rng = self.rng
+        return "".join(
+            "<p>" + " ".join(rng.choices(self.sentences, k=rng.randint(2, 5))) + "</p>"
+            for _ in range(rng.randint(2, 6))
+        )
+
+
+class _Writer:
+    """
+    Écriture par lots : ``bulk_create`` pour le graphe (quelques milliers de
+    lignes), ``executemany`` sur des tuples pour les tables volumineuses, avec
+    clés primaires explicites quand les lignes sont référencées ensuite.
+    """
+
+    def __init__(self, batch_size: int):
+        self.batch_size = batch_size
+        self.counts: dict[str, int] = {}
+        self.raw_models: list = []
+        self.now = timezone.now()
+
+    def _count(self, model, rows: int) -> None:
+        label = model._meta.db_table.removeprefix("app_connaissance_")
+        self.counts[label] = self.counts.get(label, 0) + rows
+
+    def bulk(self, model, objs: list) -> list:
+        created = model.objects.bulk_create(objs, batch_size=self.batch_size)
+        self._count(model, len(created))
+        return created
+
+    def next_pk(self, model) -> int:
+        return (model.objects.aggregate(m=Max("pk"))["m"] or 0) + 1
+
+    def insert(self, model, names: tuple[str, ...], rows: list[tuple]) -> None:
+        """``INSERT`` brut de ``rows`` (valeurs dans l'ordre de ``names``) ; les autres colonnes prennent leur défaut."""
+        given = set(names)
+        rest = [
+            f for f in model._meta.concrete_fields
+            if f.attname not in given and not (f.primary_key and f.attname == "id")
+        ]
+        tail = tuple(
+            self.now if getattr(f, "auto_now", False) or getattr(f, "auto_now_add", False) else f.get_default()
+            for f in rest
+        )
+        tail = tuple(f.get_db_prep_save(v, connection) for f, v in zip(rest, tail))
+        quote = connection.ops.quote_name
+        columns = [model._meta.get_field(n).column for n in names] + [f.column for f in rest]
+        sql = "INSERT INTO {} ({}) VALUES ({})".format(
+            quote(model._meta.db_table), ", ".join(quote(c) for c in columns), ", ".join(["%s"] * len(columns)),
+        )
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), self.batch_size):
+                cursor.executemany(sql, [row + tail for row in rows[start:start + self.batch_size]])
+        self._count(model, len(rows))
+        if "id" in given and model not in self.raw_models:
+            self.raw_models.append(model)
+
+    def reset_sequences(self) -> None:
+        """Resynchronise les séquences (PostgreSQL) après les insertions à clé explicite."""
+        statements = connection.ops.sequence_reset_sql(no_style(), self.raw_models)
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def seed_dataset(scale: Scale, seed: int = 42, batch_size: int = 2000) -> dict[str, int]:
+    """
+    Crée un graphe complet : organisation, plans (modules, sous-étapes, quiz),
+    connaissances (versions, tags), utilisateurs, et pour chaque nouvel employé
+    une progression réaliste (sous-étapes cochées, tentatives de quiz).
+    Retourne le nombre de lignes écrites par table.
+    """
+    rng = random.Random(seed)
+    text = _Text(rng)
+    out = _Writer(batch_size)
+    bulk = out.bulk
+
+    with transaction.atomic():
+        departments = bulk(Department, [
+            Department(name=f"{PREFIX} dept {i}", slug=f"{PREFIX}-dept-{i}") for i in range(scale.departments)
+        ])
+        kinds = bulk(KnowledgeKind, [
+            KnowledgeKind(name=f"{PREFIX} type {i}", slug=f"{PREFIX}-type-{i}") for i in range(scale.kinds)
+        ])
+        tags = bulk(Tag, [Tag(name=f"{PREFIX}-{i}", slug=f"{PREFIX}-{i}") for i in range(scale.tags)])
+
+        plans = bulk(PlanIntegration, [
+            PlanIntegration(titre=f"{PREFIX} plan {i}", duree_estimee_jours=rng.randint(5, 30))
+            for i in range(scale.plans)
+        ])
+        postes = bulk(Poste, [
+            Poste(
+                intitule=f"{PREFIX} poste {i}",
+                department=departments[i % len(departments)],
+                plan_integration=plans[i % len(plans)] if plans else None,
+            )
+            for i in range(scale.postes)
+        ])
+        modules = bulk(Module, [
+            Module(titre=f"Module {m + 1}", ordre=m + 1, plan=plan, duree_jours=rng.randint(1, 5))
+            for plan in plans
+            for m in range(scale.modules_per_plan)
+        ])
+        steps = bulk(ModuleStep, [
+            ModuleStep(module=module, titre=text.title(), ordre=s + 1)
+            for module in modules
+            for s in range(scale.steps_per_module)
+        ])
+        quizzes = bulk(Quiz, [Quiz(module=module, titre=f"Quiz {module.titre}") for module in modules])
+        questions = bulk(QuizQuestion, [
+            QuizQuestion(quiz=quiz, enonce=f"Complétez : {text.sentence()}", ordre=q + 1)
+            for quiz in quizzes
+            for q in range(scale.questions_per_quiz)
+        ])
+        bulk(QuizChoice, [
+            QuizChoice(question=question, texte=rng.choice(_WORDS), is_correct=c == 0)
+            for question in questions
+            for c in range(4)
+        ])
+
+        kind_ids = [k.id for k in kinds]
+        department_ids = [d.id for d in departments]
+        tag_ids = [t.id for t in tags]
+        statuses = [KnowledgeItem.Status.PUBLISHED.value] * 8 + [
+            KnowledgeItem.Status.IN_REVIEW.value, KnowledgeItem.Status.DRAFT.value,
+        ]
+        author = f"{PREFIX} auteur"
+        first_item = out.next_pk(KnowledgeItem)
+        for start in range(0, scale.knowledge_items, batch_size):
+            items = []
+            for i in range(start, min(start + batch_size, scale.knowledge_items)):
+                items.append((
+                    first_item + i,
+                    f"{text.title()} {i}",
+                    text.sentence(),
+                    rng.choice(kind_ids),
+                    rng.choice(department_ids) if department_ids and rng.random() < 0.8 else None,
+                    author,
+                    text.article(),
+                    rng.choice(statuses),
+                    rng.randint(1, 20),
+                ))
+            out.insert(KnowledgeItem, (
+                "id", "title", "description", "kind_id", "department_id", "author", "content", "status",
+                "read_time_min",
+            ), items)
+            last = scale.versions_per_item - 1
+            out.insert(KnowledgeVersion, (
+                "knowledge_item_id", "numero_version", "content", "author_name", "est_actuelle",
+            ), [
+                (item[0], f"{v + 1}.0", item[6], author, v == last)
+                for item in items
+                for v in range(scale.versions_per_item)
+            ])
+            out.insert(KnowledgeItem.tags.through, ("knowledgeitem_id", "tag_id"), [
+                (item[0], tag_id)
+                for item in items
+                for tag_id in rng.sample(tag_ids, min(len(tag_ids), rng.randint(0, 3)))
+            ])
+
+        if scale.knowledge_items:
+            bulk(ModuleKnowledgeItem, [
+                ModuleKnowledgeItem(
+                    module=module, knowledge_item_id=first_item + rng.randrange(scale.knowledge_items), ordre=k + 1,
+                )
+                for module in modules
+                for k in range(scale.links_per_module)
+            ])
+
+        password = make_password(PASSWORD)
+        first_user = out.next_pk(User)
+        out.insert(User, ("id", "username", "password", "first_name", "last_name"), [
+            (first_user + i, f"{PREFIX}{i}", password, "Synth", str(i)) for i in range(scale.users)
+        ])
+        profiles = []
+        for i in range(scale.users):
+            role = _ROLES[i % len(_ROLES)]
+            poste = rng.choice(postes) if postes and role == UserProfile.Role.NEW_EMPLOYEE else None
+            profiles.append((first_user + i, f"{PREFIX} {i}", role.value, rng.choice(department_ids), poste))
+        out.insert(UserProfile, ("user_id", "display_name", "role", "department_id", "poste_id"), [
+            (user_id, name, role, department_id, poste.id if poste else None)
+            for user_id, name, role, department_id, poste in profiles
+        ])
+
+        # Progression des nouveaux employés : modules terminés (sous-étapes
+        # cochées, quiz réussi), puis un module entamé (quelques sous-étapes,
+        # éventuellement un échec au quiz).
+        mpp, spm = scale.modules_per_plan, scale.steps_per_module
+        plan_index = {plan.id: p for p, plan in enumerate(plans)}
+        completions, attempts, progressions = [], [], []
+        for user_id, _, _, _, poste in profiles:
+            if poste is None or poste.plan_integration_id is None:
+                continue
+            p = plan_index[poste.plan_integration_id]
+            done = rng.randint(0, mpp)
+            for m in range(p * mpp, p * mpp + min(done + 1, mpp)):
+                finished = m < p * mpp + done
+                module_steps = steps[m * spm:(m + 1) * spm]
+                if not finished:
+                    module_steps = module_steps[:rng.randint(0, spm)]
+                completions.extend((user_id, s.id) for s in module_steps)
+                if finished or (len(module_steps) == spm and rng.random() < 0.5):
+                    score = rng.randint(70, 100) if finished else rng.randint(0, 69)
+                    attempts.append((user_id, quizzes[m].id, score, finished))
+            statut = Progression.StatutProgression.TERMINE if done == mpp else Progression.StatutProgression.EN_COURS
+            progressions.append((user_id, plans[p].id, round(100 * done / mpp) if mpp else 0, statut.value))
+        out.insert(UserModuleStepCompletion, ("user_id", "module_step_id"), completions)
+        out.insert(UserQuizAttempt, ("user_id", "quiz_id", "score_pct", "passed"), attempts)
+        out.insert(Progression, ("user_id", "plan_id", "pourcentage", "statut"), progressions)
+        out.reset_sequences()
+
+    return out.counts
@@ -1,8 +1,65 @@
-from django.test import TestCase
+import json
+import os
+import statistics
+import tempfile
+import threading
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Q
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth.hashers import check_password
 from django.contrib.auth.models import User
 
-from .models import Department, KnowledgeKind, KnowledgeItem, UserProfile
+from . import item_analysis, outbox, search
+from .accounts import hash_passwords, validate_rows
+from .attempts import record_attempt
+from .benchmark import compare, run_benchmark, url_names
+from .context_processors import frontend_user
+from .item_analysis import analyze_new_attempts
+from .models import (
+    Department,
+    KnowledgeItem,
+    KnowledgeKind,
+    KnowledgeVersion,
+    Module,
+    ModuleStep,
+    OutboundEmail,
+    PlanIntegration,
+    Poste,
+    Progression,
+    Quiz,
+    QuizAnalysis,
+    QuizAttempt,
+    QuizAttemptAnswer,
+    QuizChoice,
+    QuizChoiceStats,
+    QuizQuestion,
+    QuizQuestionStats,
+    Tag,
+    UserModuleStepCompletion,
+    UserProfile,
+    UserQuizAttempt,
+    VocabularyWord,
+)
+from .outbox import enqueue_email, send_pending
+from .plan_structure import build_quiz_node, get_plan_structure
+from .progress import cohort_progress, compute_plan_progress
+from .quiz_text import DocumentIndex, Vocabulary
+from .stats import departments_with_stats, knowledge_stats, pending_validation_count
+from .synthetic import Scale, seed_dataset
+from .versioning import SNAPSHOT_INTERVAL, record_version
+from .vocabulary import get_vocabulary, update_vocabulary_index
 
 
 class DepartmentKnowledgeAccessTests(TestCase):
@@ -66,3 +123,1043 @@ class DepartmentKnowledgeAccessTests(TestCase):
         self.client.login(username="usera", password="pw")
         resp = self.client.get(reverse("knowledge_detail", args=[draft.id]))
         self.assertEqual(resp.status_code, 200)
+
+
+class KnowledgeSearchTests(TestCase):
+    def setUp(self):
+        self.dept = Department.objects.create(name="Informatique")
+        self.kind = KnowledgeKind.objects.create(name="Procédure")
+        self.manager = User.objects.create_user(username="mgr", password="pw")
+        UserProfile.objects.create(user=self.manager, display_name="Manager", role="manager", department=self.dept)
+        self.client.login(username="mgr", password="pw")
+
+    def _create(self, title, content, status="in_review"):
+        self.client.post(reverse("knowledge_create"), {
+            "title": title,
+            "kind": self.kind.id,
+            "department": self.dept.id,
+            "content": content,
+            "status": status,
+        })
+        item = KnowledgeItem.objects.get(title=title)
+        self.client.post(reverse("validation_approve", args=[item.id]))
+        return item
+
+    def test_search_is_ranked_and_highlighted(self):
+        self._create("Sauvegarde serveur", "Procédure de sauvegarde quotidienne des serveurs.")
+        self._create("Accueil", "Le badge est remis le premier jour. Penser à la sauvegarde.")
+        resp = self.client.get(reverse("knowledge_list"), {"q": "sauvegarde"})
+        items = resp.context["items"]
+        self.assertEqual([i.title for i in items], ["Sauvegarde serveur", "Accueil"])
+        self.assertIn("<mark>", items[0].search_snippet)
+
+    def test_hidden_matches_do_not_crowd_out_visible_ones(self):
+        other = Department.objects.create(name="RH")
+        KnowledgeItem.objects.bulk_create(
+            KnowledgeItem(title=f"Sauvegarde {i}", kind=self.kind, department=other, content="sauvegarde",
+                          status=KnowledgeItem.Status.PUBLISHED if i % 2 else KnowledgeItem.Status.DRAFT)
+            for i in range(search.MAX_RESULTS + 10)
+        )
+        KnowledgeItem.objects.create(title="Poste de travail", kind=self.kind, department=self.dept,
+                                     content="Sauvegarde locale.", status=KnowledgeItem.Status.PUBLISHED)
+        search.rebuild_index(KnowledgeItem.objects.prefetch_related("tags"))
+        employee = User.objects.create_user(username="emp", password="pw")
+        UserProfile.objects.create(user=employee, display_name="Employé", role="employee", department=self.dept)
+        self.client.login(username="emp", password="pw")
+        resp = self.client.get(reverse("knowledge_list"), {"q": "sauvegarde"})
+        self.assertEqual([i.title for i in resp.context["items"]], ["Poste de travail"])
+
+    def test_index_follows_edits(self):
+        item = self._create("VPN", "Configurer le client réseau.")
+        self.client.post(reverse("knowledge_edit", args=[item.id]), {
+            "title": "VPN",
+            "content": "Installer le certificat WireGuard.",
+            "numero_version": "2.0",
+        })
+        titles = lambda q: [i.title for i in self.client.get(reverse("knowledge_list"), {"q": q}).context["items"]]
+        self.assertEqual(titles("wireguard"), ["VPN"])
+        self.assertEqual(titles("réseau"), [])
+
+
+class KnowledgeVersionStorageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        kind = KnowledgeKind.objects.create(name="Procédure")
+        self.item = KnowledgeItem.objects.create(title="Procédure longue", kind=kind, content="")
+
+    def _paragraphs(self, n, edited=None):
+        return "".join(
+            f"<p>Étape {i} : {'modifiée' if i == edited else 'texte initial'} de la procédure.</p>\n"
+            for i in range(n)
+        )
+
+    def test_versions_are_stored_as_deltas_and_rebuilt(self):
+        texts = [self._paragraphs(40, edited=i) for i in range(15)]
+        versions = [record_version(self.item, f"1.{i}", t) for i, t in enumerate(texts)]
+        self.assertIsNone(versions[0].base_id)
+        self.assertEqual(versions[1].base_id, versions[0].id)
+        self.assertEqual(versions[1].content, "")
+        # Instantané périodique pour borner la longueur des chaînes
+        self.assertIsNone(versions[SNAPSHOT_INTERVAL].base_id)
+        cache.clear()
+        for version, text in zip(versions, texts):
+            self.assertEqual(KnowledgeVersion.objects.get(pk=version.pk).get_content(), text)
+        self.assertEqual(KnowledgeVersion.objects.filter(est_actuelle=True).get().pk, versions[-1].pk)
+
+    def test_compact_command_converts_existing_history(self):
+        texts = [self._paragraphs(40, edited=i) for i in range(5)]
+        for i, text in enumerate(texts):
+            KnowledgeVersion.objects.create(knowledge_item=self.item, numero_version=f"1.{i}", content=text)
+        out = StringIO()
+        call_command("compact_knowledge_versions", stdout=out)
+        self.assertIn("économisés", out.getvalue())
+        self.assertEqual(KnowledgeVersion.objects.filter(base__isnull=True).count(), 1)
+        cache.clear()
+        for version, text in zip(KnowledgeVersion.objects.order_by("id"), texts):
+            self.assertEqual(version.get_content(), text)
+
+
+class KnowledgeDetailQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches["fragments"].clear()
+        kind = KnowledgeKind.objects.create(name="Procédure")
+        self.dept = Department.objects.create(name="Informatique")
+        self.user = User.objects.create_user(username="usera", password="pw")
+        UserProfile.objects.create(user=self.user, display_name="User A", role="employee", department=self.dept)
+        self.short = KnowledgeItem.objects.create(title="Court", kind=kind, department=self.dept, content="x", status=KnowledgeItem.Status.PUBLISHED)
+        self.long = KnowledgeItem.objects.create(title="Long", kind=kind, department=self.dept, content="x", status=KnowledgeItem.Status.PUBLISHED)
+        body = "".join(f"<p>Paragraphe {n} de la procédure.</p>" for n in range(30))
+        for i in range(2):
+            record_version(self.short, f"1.{i}", f"<p>Contenu {i}.</p>" + body)
+        for i in range(25):
+            record_version(self.long, f"1.{i}", f"<p>Contenu {i}.</p>" + body)
+        self.client.login(username="usera", password="pw")
+
+    def test_detail_query_count_does_not_depend_on_history_length(self):
+        # Le contenu actuel de l'historique long est un delta à reconstruire
+        self.assertIsNotNone(self.long.get_current_version().base_id)
+        for item in (self.short, self.long):
+            cache.clear()
+            with self.assertNumQueries(9):
+                resp = self.client.get(reverse("knowledge_detail", args=[item.id]))
+            self.assertEqual(resp.status_code, 200)
+
+    def test_selected_version_body_is_loaded(self):
+        first = self.long.versions.get(numero_version="1.0")
+        resp = self.client.get(reverse("knowledge_detail", args=[self.long.id]), {"version": first.id})
+        self.assertTrue(resp.context["body_html"].startswith("<p>Contenu 0.</p><p>Paragraphe 0"))
+        self.assertEqual(len(resp.context["versions"]), 25)
+        self.assertNotIn("content", resp.context["versions"][0].__dict__)
+        self.assertNotIn("delta", resp.context["versions"][0].__dict__)
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches["fragments"].clear()
+        kind = KnowledgeKind.objects.create(name="Procédure")
+        self.dept = Department.objects.create(name="Informatique")
+        self.user = User.objects.create_user(username="usera", password="pw")
+        UserProfile.objects.create(user=self.user, display_name="User A", role="employee", department=self.dept)
+        self.tag = Tag.objects.create(name="reseau")
+        self.items = []
+        for i in range(3):
+            item = KnowledgeItem.objects.create(
+                title=f"Fiche {i}", kind=kind, department=self.dept, content="x", status=KnowledgeItem.Status.PUBLISHED,
+            )
+            record_version(item, "1.0", f"<p>Corps {i}</p>")
+            item.tags.add(self.tag)
+            self.items.append(item)
+        self.client.login(username="usera", password="pw")
+
+    def _get(self, name, *args):
+        # Sans l'ETag : la page est toujours rendue, seuls les fragments viennent du cache
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse(name, args=args))
+        return resp, [q["sql"] for q in ctx.captured_queries]
+
+    def test_cached_detail_skips_body_and_labels_queries(self):
+        item = self.items[0]
+        resp, cold = self._get("knowledge_detail", item.id)
+        resp, warm = self._get("knowledge_detail", item.id)
+        self.assertContains(resp, "<p>Corps 0</p>")
+        self.assertContains(resp, "#reseau")
+        self.assertFalse([sql for sql in warm if "knowledge_tags" in sql or "knowledge_competences" in sql])
+        self.assertLess(len(warm), len(cold))
+        with patch.object(KnowledgeVersion, "get_content", side_effect=AssertionError):
+            self.client.get(reverse("knowledge_detail", args=[item.id]))
+
+    def test_edit_and_tag_rename_invalidate(self):
+        item = self.items[0]
+        self._get("knowledge_detail", item.id)
+        self._get("knowledge_list")
+        record_version(item, "1.1", "<p>Corps modifié</p>")
+        self.assertContains(self.client.get(reverse("knowledge_detail", args=[item.id])), "Corps modifié")
+
+        self.tag.name = "infra"
+        self.tag.save()
+        self.assertContains(self.client.get(reverse("knowledge_list")), "#infra", count=3)
+        self.assertContains(self.client.get(reverse("knowledge_detail", args=[item.id])), "#infra")
+
+    def test_list_cards_are_rendered_from_cache(self):
+        self._get("knowledge_list")
+        resp, warm = self._get("knowledge_list")
+        self.assertContains(resp, "#reseau", count=3)
+        self.assertFalse([sql for sql in warm if "knowledge_tags" in sql])
+
+
+class PrincipalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.dept = Department.objects.create(name="Informatique")
+        self.user = User.objects.create_user(username="usera", password="pw")
+        self.profile = UserProfile.objects.create(user=self.user, display_name="User A", role="employee", department=self.dept)
+        self.client.login(username="usera", password="pw")
+
+    def _profile_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        return [q["sql"] for q in ctx.captured_queries if 'FROM "app_connaissance_userprofile"' in q["sql"]]
+
+    def test_profile_is_loaded_once_per_request(self):
+        self.assertEqual(len(self._profile_queries(reverse("knowledge_list"))), 1)
+
+    @override_settings(FRONTEND_PRINCIPAL_SESSION_CACHE=True)
+    def test_session_cache_is_invalidated_on_profile_change(self):
+        self.assertEqual(len(self._profile_queries(reverse("knowledge_list"))), 1)
+        self.assertEqual(self._profile_queries(reverse("knowledge_list")), [])
+        self.profile.role = "manager"
+        self.profile.save()
+        self.assertEqual(len(self._profile_queries(reverse("validation_queue"))), 1)
+        resp = self.client.get(reverse("validation_queue"))
+        self.assertEqual(resp.status_code, 200)
+
+
+class PendingValidationCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.dept = Department.objects.create(name="Informatique")
+        self.kind = KnowledgeKind.objects.create(name="Procédure")
+        self.manager = User.objects.create_user(username="mgr", password="pw")
+        UserProfile.objects.create(user=self.manager, display_name="Manager", role="manager")
+        self.client.login(username="mgr", password="pw")
+
+    def _create(self, title):
+        self.client.post(reverse("knowledge_create"), {
+            "title": title, "kind": self.kind.id, "department": self.dept.id,
+            "content": "x", "status": "in_review",
+        })
+        return KnowledgeItem.objects.get(title=title)
+
+    def test_counter_follows_status_transitions(self):
+        self.assertEqual(pending_validation_count(), 0)
+        a = self._create("A")
+        b = self._create("B")
+        self._create("C")
+        self.assertEqual(pending_validation_count(), 3)
+        self.client.post(reverse("validation_approve", args=[a.id]))
+        self.client.post(reverse("validation_reject", args=[b.id]))
+        with self.assertNumQueries(0):
+            self.assertEqual(pending_validation_count(), 1)
+        resp = self.client.get(reverse("validation_queue"))
+        self.assertEqual(resp.context["frontend"]["pending_validation_count"], 1)
+
+    def test_counter_is_lazy(self):
+        request = RequestFactory().get("/")
+        request.user = self.manager
+        request.session = {}
+        context = frontend_user(request)
+        with CaptureQueriesContext(connection) as ctx:
+            context["frontend"]["role"]
+        self.assertEqual(len(ctx.captured_queries), 0)
+        with self.assertNumQueries(1):
+            self.assertEqual(context["frontend"]["pending_validation_count"], 0)
+
+
+class PlanProgressTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.dept = Department.objects.create(name="Informatique")
+        self.plan = PlanIntegration.objects.create(titre="Plan dev")
+        self.poste = Poste.objects.create(intitule="Développeur", department=self.dept, plan_integration=self.plan)
+        self.user = User.objects.create_user(username="newbie", password="pw")
+        UserProfile.objects.create(
+            user=self.user, display_name="Newbie", role="new_employee", department=self.dept, poste=self.poste
+        )
+        self.client.login(username="newbie", password="pw")
+
+    def _add_modules(self, count):
+        for i in range(count):
+            module = Module.objects.create(titre=f"Module {i}", ordre=i + 1, plan=self.plan)
+            ModuleStep.objects.create(module=module, titre="Lire", ordre=1)
+            Quiz.objects.create(module=module, titre=f"Quiz {i}")
+
+    def _page_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse("plan_integration_personnel"))
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_plan_page_is_read_only_with_constant_queries(self):
+        self._add_modules(2)
+        few = self._page_queries()
+        self._add_modules(8)
+        self.assertEqual(self._page_queries(), few)
+        self.assertFalse(Progression.objects.exists())
+
+    def test_step_toggle_updates_progression(self):
+        module = Module.objects.create(titre="Unique", ordre=1, plan=self.plan)
+        step = ModuleStep.objects.create(module=module, titre="Lire", ordre=1)
+        self.client.post(reverse("module_step_toggle", args=[step.id]))
+        self.assertEqual(Progression.objects.get(user=self.user, plan=self.plan).pourcentage, 100)
+        self.client.post(reverse("module_step_toggle", args=[step.id]))
+        self.assertEqual(Progression.objects.get(user=self.user, plan=self.plan).pourcentage, 0)
+
+    def _batch(self, steps):
+        return self.client.post(
+            reverse("module_steps_update"), json.dumps({"steps": steps}), content_type="application/json"
+        )
+
+    def test_batch_update_with_constant_queries(self):
+        module = Module.objects.create(titre="Unique", ordre=1, plan=self.plan)
+        few = [ModuleStep.objects.create(module=module, titre=f"Étape {i}", ordre=i) for i in range(2)]
+        Progression.objects.create(user=self.user, plan=self.plan, pourcentage=0)
+        get_plan_structure(self.plan.id)
+        with CaptureQueriesContext(connection) as small:
+            self._batch([{"id": s.id, "done": True} for s in few])
+        self._batch([{"id": s.id, "done": False} for s in few])
+        many = few + [ModuleStep.objects.create(module=module, titre=f"Étape {i}", ordre=i) for i in range(2, 12)]
+        get_plan_structure(self.plan.id)
+        with CaptureQueriesContext(connection) as large:
+            resp = self._batch([{"id": s.id, "done": True} for s in many])
+        self.assertEqual(len(large.captured_queries), len(small.captured_queries))
+        data = resp.json()
+        self.assertEqual(data["pourcentage"], 100)
+        self.assertEqual(data["modules"][0]["steps_completed"], [s.id for s in many])
+        self.assertEqual(Progression.objects.get(user=self.user, plan=self.plan).pourcentage, 100)
+
+        resp = self._batch([{"id": many[0].id, "done": False}])
+        self.assertEqual(resp.json()["pourcentage"], 0)
+        self.assertEqual(UserModuleStepCompletion.objects.filter(user=self.user).count(), 11)
+
+    def test_batch_update_rejects_foreign_steps(self):
+        module = Module.objects.create(titre="Unique", ordre=1, plan=self.plan)
+        mine = ModuleStep.objects.create(module=module, titre="Lire", ordre=1)
+        other_plan = PlanIntegration.objects.create(titre="Autre plan")
+        other = Module.objects.create(titre="Autre", ordre=1, plan=other_plan)
+        foreign = ModuleStep.objects.create(module=other, titre="Lire", ordre=1)
+        resp = self._batch([{"id": mine.id, "done": True}, {"id": foreign.id, "done": True}])
+        self.assertEqual(resp.status_code, 403)
+        self.assertFalse(UserModuleStepCompletion.objects.exists())
+        for bad in ({"id": "x"}, {"id": mine.id, "done": "false"}, {"id": True, "done": True}):
+            self.assertEqual(self._batch([bad]).status_code, 400)
+
+    def test_batch_update_rejects_locked_modules(self):
+        first = Module.objects.create(titre="Premier", ordre=1, plan=self.plan)
+        ModuleStep.objects.create(module=first, titre="Lire", ordre=1)
+        second = Module.objects.create(titre="Second", ordre=2, plan=self.plan)
+        locked = ModuleStep.objects.create(module=second, titre="Pratiquer", ordre=1)
+        resp = self._batch([{"id": locked.id, "done": True}])
+        self.assertEqual(resp.status_code, 403)
+        self.assertFalse(UserModuleStepCompletion.objects.exists())
+
+    def test_plan_structure_is_cached_until_admin_edit(self):
+        self._add_modules(3)
+        self._page_queries()
+        with CaptureQueriesContext(connection) as ctx:
+            get_plan_structure(self.plan.id)
+        self.assertEqual(len(ctx.captured_queries), 0)
+        module = Module.objects.get(titre="Module 0")
+        ModuleStep.objects.create(module=module, titre="Pratiquer", ordre=2)
+        structure = get_plan_structure(self.plan.id)
+        self.assertEqual([s.titre for s in structure.module(module.id).steps], ["Lire", "Pratiquer"])
+
+    def test_module_quiz_is_graded_from_snapshot(self):
+        module = Module.objects.create(titre="Unique", ordre=1, plan=self.plan)
+        quiz = Quiz.objects.create(module=module, titre="Quiz")
+        question = QuizQuestion.objects.create(quiz=quiz, enonce="2 + 2 ?")
+        QuizChoice.objects.create(question=question, texte="3")
+        right = QuizChoice.objects.create(question=question, texte="4", is_correct=True)
+        resp = self.client.post(reverse("quiz_take", args=[quiz.id]), {f"q_{question.id}": right.id})
+        self.assertTrue(resp.context["passed"])
+        self.assertEqual(Progression.objects.get(user=self.user, plan=self.plan).pourcentage, 100)
+
+
+class CohortReportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.dept = Department.objects.create(name="Informatique")
+        other = Department.objects.create(name="Finance")
+        self.plan = PlanIntegration.objects.create(titre="Plan dev")
+        poste = Poste.objects.create(intitule="Développeur", department=self.dept, plan_integration=self.plan)
+        other_poste = Poste.objects.create(intitule="Analyste", department=other, plan_integration=self.plan)
+        self.modules = []
+        for i in range(3):
+            module = Module.objects.create(titre=f"Module {i}", ordre=i + 1, plan=self.plan)
+            steps = [ModuleStep.objects.create(module=module, titre=f"Étape {j}", ordre=j) for j in range(2)]
+            quiz = Quiz.objects.create(module=module, titre=f"Quiz {i}") if i != 1 else None
+            self.modules.append((steps, quiz))
+        self.users = []
+        for n in range(8):
+            user = User.objects.create_user(username=f"new{n}")
+            UserProfile.objects.create(
+                user=user, display_name=f"Nouveau {n}", role="new_employee",
+                department=self.dept if n % 4 else other, poste=poste if n % 4 else other_poste,
+            )
+            # Avancement varié : modules entiers, étapes partielles, quiz réussi ou non
+            for m, (steps, quiz) in enumerate(self.modules):
+                done = steps if m < n // 2 else steps[: n % 2]
+                UserModuleStepCompletion.objects.bulk_create(
+                    [UserModuleStepCompletion(user=user, module_step=s) for s in done]
+                )
+                if quiz is not None and m < n // 2:
+                    UserQuizAttempt.objects.create(user=user, quiz=quiz, score_pct=90, passed=n != 5)
+            self.users.append(user)
+        manager = User.objects.create_user(username="boss", password="pw")
+        UserProfile.objects.create(user=manager, display_name="Boss", role="manager", department=self.dept)
+        self.client.login(username="boss", password="pw")
+
+    def test_matches_individual_progress(self):
+        rows = {row.user_id: row for row in cohort_progress(self.plan)}
+        self.assertEqual(len(rows), 8)
+        for user in self.users:
+            expected = compute_plan_progress(user, self.plan)
+            self.assertEqual(rows[user.id].pourcentage, expected["pourcentage"])
+            self.assertEqual(rows[user.id].modules_completed, sum(m["passed"] for m in expected["modules"]))
+
+    def test_query_count_does_not_depend_on_cohort_size(self):
+        get_plan_structure(self.plan.id)
+        with self.assertNumQueries(3):
+            list(cohort_progress(self.plan))
+        with self.assertNumQueries(3):
+            list(cohort_progress(self.plan, self.dept.id))
+
+    def test_page_defaults_to_manager_department_and_exports_csv(self):
+        resp = self.client.get(reverse("cohort_report"))
+        self.assertEqual(resp.context["total"], 6)
+        resp = self.client.get(reverse("cohort_report"), {"plan": self.plan.id, "department": "", "export": "csv"})
+        lines = b"".join(resp.streaming_content).decode("utf-8").strip().splitlines()
+        self.assertEqual(len(lines), 9)
+        self.assertTrue(lines[0].startswith("utilisateur,departement"))
+
+
+class QuizTakeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        kind = KnowledgeKind.objects.create(name="Procédure")
+        self.user = User.objects.create_user(username="usera", password="pw")
+        UserProfile.objects.create(user=self.user, display_name="User A", role="employee")
+        item = KnowledgeItem.objects.create(title="Global", kind=kind, content="x", status=KnowledgeItem.Status.PUBLISHED)
+        self.quiz = Quiz.objects.create(knowledge_item=item, titre="Quiz", seuil_reussite_pct=50)
+        self.answers = {}
+        for i in range(2):
+            question = QuizQuestion.objects.create(quiz=self.quiz, enonce=f"Question {i}")
+            wrong = QuizChoice.objects.create(question=question, texte="Non")
+            right = QuizChoice.objects.create(question=question, texte="Oui", is_correct=True)
+            self.answers[question.id] = (right, wrong)
+        self.client.login(username="usera", password="pw")
+
+    def _submit(self, pick):
+        data = {f"q_{qid}": pick(right, wrong).id for qid, (right, wrong) in self.answers.items()}
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.post(reverse("quiz_take", args=[self.quiz.id]), data)
+        quiz_queries = [q["sql"] for q in ctx.captured_queries if "quizquestion" in q["sql"] or "quizchoice" in q["sql"]]
+        return resp, quiz_queries
+
+    def test_scoring_uses_cached_answer_key(self):
+        resp, cold = self._submit(lambda right, wrong: right)
+        self.assertEqual(resp.context["score_pct"], 100)
+        self.assertTrue(cold)
+        resp, warm = self._submit(lambda right, wrong: wrong)
+        self.assertEqual(resp.context["score_pct"], 0)
+        self.assertEqual(warm, [])
+        self.assertEqual([r["is_correct"] for r in resp.context["questions_results"]], [False, False])
+
+    def test_choice_edit_invalidates_answer_key(self):
+        self._submit(lambda right, wrong: right)
+        for right, wrong in self.answers.values():
+            right.is_correct, wrong.is_correct = False, True
+            right.save()
+            wrong.save()
+        resp, queries = self._submit(lambda right, wrong: wrong)
+        self.assertEqual(resp.context["score_pct"], 100)
+        self.assertTrue(queries)
+
+    def test_history_is_kept_and_best_attempt_tracked(self):
+        self._submit(lambda right, wrong: wrong)
+        self._submit(lambda right, wrong: right)
+        resp, _ = self._submit(lambda right, wrong: wrong)
+        self.assertEqual(resp.context["score_pct"], 0)
+        self.assertEqual(QuizAttempt.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(QuizAttemptAnswer.objects.filter(attempt__user=self.user, is_correct=True).count(), 2)
+        best = UserQuizAttempt.objects.get(user=self.user, quiz=self.quiz)
+        self.assertEqual((best.score_pct, best.passed, best.attempt_count), (100, True, 3))
+        self.assertEqual(resp.context["best"], best)
+        latest = resp.context["latest"]
+        self.assertEqual([a.score_pct for a in latest], [0, 100, 0])
+        self.assertEqual(best.best_attempt_id, latest[1].id)
+
+    def test_deleted_choice_keeps_history(self):
+        self._submit(lambda right, wrong: wrong)
+        QuizChoice.objects.filter(attempt_answers__isnull=False).delete()
+        self.assertEqual(QuizAttemptAnswer.objects.filter(choice__isnull=True).count(), len(self.answers))
+
+    def test_foreign_choice_is_stored_as_unanswered(self):
+        other = QuizChoice.objects.create(question=QuizQuestion.objects.create(quiz=self.quiz, enonce="Autre"), texte="?")
+        question_id = next(iter(self.answers))
+        self.client.post(reverse("quiz_take", args=[self.quiz.id]), {f"q_{question_id}": other.id})
+        answer = QuizAttemptAnswer.objects.get(question_id=question_id)
+        self.assertIsNone(answer.choice_id)
+        self.assertFalse(answer.is_correct)
+
+
+class QuizItemAnalysisTests(TestCase):
+    # Réponses (index du choix : 0 = bon, 1 = distracteur, 2 = jamais choisi) par tentative
+    SHEETS = [(0, 0, 0), (0, 0, 1), (0, 1, 1), (1, 1, 0), (0, 1, 1), (1, 1, 1)]
+
+    def setUp(self):
+        cache.clear()
+        self.quiz = Quiz.objects.create(titre="Sécurité")
+        self.choices = []
+        for i in range(3):
+            question = QuizQuestion.objects.create(quiz=self.quiz, enonce=f"Question {i}", ordre=i)
+            self.choices.append([
+                QuizChoice.objects.create(question=question, texte=texte, is_correct=texte == "Bon")
+                for texte in ("Bon", "Faux", "Inutile")
+            ])
+        self.past = timezone.now() - timezone.timedelta(hours=1)
+
+    def _record(self, sheets):
+        node = build_quiz_node(Quiz.objects.prefetch_related("questions__choices").get(pk=self.quiz.pk))
+        for n, sheet in enumerate(sheets):
+            user = User.objects.create_user(username=f"u{User.objects.count()}-{n}")
+            selected = {choices[0].question_id: choices[pick].id for choices, pick in zip(self.choices, sheet)}
+            record_attempt(user, node, selected, now=self.past)
+
+    def test_incremental_analysis_matches_full_computation(self):
+        self._record(self.SHEETS[:3])
+        self.assertEqual(analyze_new_attempts(), 3)
+        self.assertEqual(analyze_new_attempts(), 0)
+        self._record(self.SHEETS[3:])
+        self.assertEqual(analyze_new_attempts(), 3)
+
+        self.assertEqual(QuizAnalysis.objects.get(quiz=self.quiz).attempts, 6)
+        for i, choices in enumerate(self.choices):
+            stats = QuizQuestionStats.objects.get(question=choices[0].question)
+            item = [int(sheet[i] == 0) for sheet in self.SHEETS]
+            rest = [sum(int(p == 0) for j, p in enumerate(sheet) if j != i) for sheet in self.SHEETS]
+            self.assertEqual(stats.responses, 6)
+            self.assertAlmostEqual(stats.difficulty, sum(item) / 6)
+            self.assertAlmostEqual(stats.discrimination, statistics.correlation(item, rest))
+            self.assertFalse(QuizChoiceStats.objects.filter(choice=choices[2]).exists())
+        self.assertEqual(QuizChoiceStats.objects.get(choice=self.choices[1][1]).selections, 4)
+
+    def test_recent_attempts_wait_for_next_run(self):
+        self.past = timezone.now()
+        self._record(self.SHEETS[:1])
+        self.assertEqual(analyze_new_attempts(), 0)
+        self.assertEqual(analyze_new_attempts(now=timezone.now() + timezone.timedelta(minutes=5)), 1)
+
+    def test_admin_page_reads_summary_tables(self):
+        self._record(self.SHEETS)
+        call_command("analyze_quiz_items", stdout=StringIO())
+        admin_user = User.objects.create_superuser("root", "root@example.com", "pw")
+        self.client.force_login(admin_user)
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse("admin:app_connaissance_quiz_item_analysis", args=[self.quiz.pk]))
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, "Question 2")
+        self.assertFalse([q for q in ctx.captured_queries if "quizattemptanswer" in q["sql"]])
+
+
+class QuizItemAnalysisLockTests(TransactionTestCase):
+    def test_overlapping_runs_do_not_double_count(self):
+        quiz = Quiz.objects.create(titre="Sécurité")
+        question = QuizQuestion.objects.create(quiz=quiz, enonce="Question")
+        right = QuizChoice.objects.create(question=question, texte="Bon", is_correct=True)
+        node = build_quiz_node(Quiz.objects.prefetch_related("questions__choices").get(pk=quiz.pk))
+        for n in range(3):
+            record_attempt(User.objects.create_user(username=f"u{n}"), node, {question.id: right.id},
+                           now=timezone.now() - timezone.timedelta(hours=1))
+
+        locked, release, results = threading.Event(), threading.Event(), []
+        original = item_analysis._analyze
+
+        def slow_analyze(now):
+            locked.set()
+            release.wait(5)
+            return original(now)
+
+        def first_run():
+            try:
+                results.append(analyze_new_attempts())
+            finally:
+                connection.close()
+
+        with patch.object(item_analysis, "_analyze", slow_analyze):
+            thread = threading.Thread(target=first_run)
+            thread.start()
+            self.assertTrue(locked.wait(5))
+            # Passage concurrent pendant que le premier tient le verrou
+            self.assertIsNone(analyze_new_attempts())
+            release.set()
+            thread.join()
+        self.assertEqual(results, [3])
+        self.assertEqual(analyze_new_attempts(), 0)
+        self.assertEqual(QuizAnalysis.objects.get(quiz=quiz).attempts, 3)
+        self.assertEqual(QuizQuestionStats.objects.get(question=question).responses, 3)
+
+
+class GenerateQuizzesCommandTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.kind = KnowledgeKind.objects.create(name="Procédure")
+        text = " ".join(f"Cette phrase numéro {i} explique soigneusement la procédure." for i in range(6))
+        self.items = [
+            KnowledgeItem.objects.create(title=f"Fiche {i}", kind=self.kind, content=text) for i in range(5)
+        ]
+        self.short = KnowledgeItem.objects.create(title="Courte", kind=self.kind, content="Trop court.")
+
+    def test_batched_generation_with_checkpoint(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            checkpoint = os.path.join(tmp, "quiz.ckpt")
+            call_command("generate_quizzes", batch_size=2, checkpoint=checkpoint, stdout=StringIO())
+            self.assertEqual(Quiz.objects.count(), 5)
+            quiz = Quiz.objects.get(knowledge_item=self.items[0])
+            self.assertEqual(quiz.questions.count(), 5)
+            self.assertEqual(QuizChoice.objects.filter(question__quiz=quiz, is_correct=True).count(), 5)
+            self.assertEqual(QuizChoice.objects.filter(question__quiz=quiz).count(), 20)
+            with open(checkpoint) as fh:
+                self.assertEqual(json.load(fh)["last_id"], self.short.id)
+
+            out = StringIO()
+            call_command("generate_quizzes", checkpoint=checkpoint, stdout=out)
+            self.assertIn("0 connaissances trouvées", out.getvalue())
+
+    def test_distractors_are_distinct_and_exclude_answer(self):
+        index = DocumentIndex("<p>Le serveur applicatif redémarre. Le serveur principal sauvegarde, serveur.</p>")
+        self.assertEqual(index.frequencies["serveur"], 3)
+        for _ in range(20):
+            picks = index.sample_distractors("serveur,")
+            self.assertEqual(len(picks), 3)
+            self.assertEqual(len(set(picks)), 3)
+            self.assertNotIn("serveur", picks)
+        self.assertEqual(sorted(DocumentIndex("Un grand serveur.").sample_distractors("grand")), ["serveur"])
+
+    def test_vocabulary_index_is_incremental(self):
+        published = KnowledgeItem.Status.PUBLISHED
+        a = KnowledgeItem.objects.create(title="A", kind=self.kind, status=published, content="Le serveur principal.")
+        b = KnowledgeItem.objects.create(title="B", kind=self.kind, status=published, content="Un serveur secondaire.")
+        self.assertEqual(update_vocabulary_index(), (2, 0))
+        self.assertEqual(VocabularyWord.objects.get(word="serveur").document_count, 2)
+        self.assertEqual(update_vocabulary_index(), (0, 0))
+
+        b.content = "Une sauvegarde secondaire."
+        b.save()
+        self.assertEqual(update_vocabulary_index(), (1, 0))
+        self.assertEqual(VocabularyWord.objects.get(word="serveur").document_count, 1)
+        a.delete()
+        self.assertFalse(VocabularyWord.objects.filter(word="serveur").exists())
+        self.assertEqual(set(get_vocabulary().frequencies), {"sauvegarde", "secondaire"})
+
+    def test_corpus_distractors_match_class_and_length(self):
+        vocabulary = Vocabulary([
+            ("installer", 4), ("configurer", 5), ("supprimer", 3), ("serveurs", 4), ("technique", 4),
+        ])
+        self.assertEqual(sorted(vocabulary.pick("déployer,")), ["configurer", "installer", "supprimer"])
+
+
+class KnowledgeListPaginationTests(TestCase):
+    def setUp(self):
+        self.dept = Department.objects.create(name="Informatique")
+        self.kind = KnowledgeKind.objects.create(name="Procédure")
+        self.user = User.objects.create_user(username="usera", password="pw")
+        UserProfile.objects.create(user=self.user, display_name="User A", role="employee", department=self.dept)
+        self.client.login(username="usera", password="pw")
+        for i in range(7):
+            KnowledgeItem.objects.create(
+                title=f"Fiche {i}", kind=self.kind, department=self.dept, content="x",
+                status=KnowledgeItem.Status.PUBLISHED, author_user=self.user,
+            )
+
+    def test_cursor_walks_every_item_once(self):
+        seen = []
+        params = {"per_page": 3}
+        for _ in range(3):
+            resp = self.client.get(reverse("knowledge_list"), params)
+            seen += [i.title for i in resp.context["items"]]
+            params["cursor"] = resp.context["next_cursor"]
+        self.assertIsNone(params["cursor"])
+        self.assertEqual(sorted(seen), sorted(f"Fiche {i}" for i in range(7)))
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse("knowledge_list"), {"per_page": 2})
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(reverse("knowledge_list"), {"per_page": 7})
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_csv_export_is_streamed(self):
+        resp = self.client.get(reverse("knowledge_list"), {"export": "csv"})
+        self.assertTrue(resp.streaming)
+        lines = b"".join(resp.streaming_content).decode("utf-8").splitlines()
+        self.assertEqual(len(lines), 8)
+        self.assertTrue(lines[0].startswith("id,titre"))
+
+
+@skipUnless(connection.vendor == "sqlite", "plans EXPLAIN QUERY PLAN propres à SQLite")
+class HotQueryIndexTests(TestCase):
+    """Les requêtes fréquentes ne doivent pas parcourir toute la table."""
+
+    def setUp(self):
+        self.dept = Department.objects.create(name="Informatique")
+        self.kind = KnowledgeKind.objects.create(name="Procédure")
+        self.item = KnowledgeItem.objects.create(title="Fiche", kind=self.kind, content="x")
+
+    def assertNoFullScan(self, queryset):
+        plan = queryset.explain()
+        for line in plan.splitlines():
+            self.assertNotRegex(line, r"SCAN (TABLE )?app_connaissance_knowledge\w*$", plan)
+
+    def test_hot_queries_use_indexes(self):
+        published = KnowledgeItem.objects.filter(status=KnowledgeItem.Status.PUBLISHED)
+        self.assertNoFullScan(published.order_by("-updated_at", "id")[:25])
+        self.assertNoFullScan(
+            published.filter(Q(department_id=self.dept.id) | Q(department__isnull=True)).order_by("-updated_at", "id")[:25]
+        )
+        self.assertNoFullScan(
+            KnowledgeItem.objects.filter(status=KnowledgeItem.Status.IN_REVIEW).order_by("-updated_at")[:50]
+        )
+        self.assertNoFullScan(self.item.versions.order_by("-est_actuelle", "-date_creation", "-id")[:1])
+        self.assertNoFullScan(self.item.versions.filter(est_actuelle=True))
+
+
+class BenchmarkViewsTests(TestCase):
+    """Chaque URL nommée a un scénario de benchmark et répond sur un petit jeu synthétique."""
+
+    def test_every_view_measured_without_error(self):
+        seed_dataset(Scale(departments=2, kinds=2, tags=5, plans=2, modules_per_plan=2, knowledge_items=20, users=20))
+        results = run_benchmark(repeat=1)
+        self.assertEqual(set(results), set(url_names()))
+        for name, result in results.items():
+            self.assertLess(result["status"], 500, name)
+        self.assertGreater(results["knowledge_list"]["queries"], 0)
+
+    def test_compare_flags_queries_and_status_not_latency(self):
+        baseline = {"index": {"status": 200, "queries": 3, "p50_ms": 10.0}}
+        self.assertEqual(compare({"index": {"status": 200, "queries": 3, "p50_ms": 90.0}}, baseline), [])
+        self.assertEqual(len(compare({"index": {"status": 200, "queries": 4, "p50_ms": 10.0}}, baseline)), 1)
+        self.assertEqual(len(compare({"index": {"status": 500, "queries": 3, "p50_ms": 10.0}}, baseline)), 1)
+
+
+class SyntheticDataTests(TestCase):
+    """Le générateur est déterministe et produit un graphe cohérent."""
+
+    SCALE = ["departments=2", "kinds=2", "tags=4", "plans=2", "postes=3", "knowledge_items=30", "users=40"]
+
+    def snapshot(self):
+        with transaction.atomic():
+            seed_dataset(Scale.parse(self.SCALE), batch_size=7)
+            rows = list(KnowledgeItem.objects.order_by("id").values_list("title", "status", "department__name"))
+            rows += list(UserQuizAttempt.objects.order_by("user__username", "quiz__module__ordre").values_list(
+                "user__username", "score_pct",
+            ))
+            transaction.set_rollback(True)
+        return rows
+
+    def test_same_seed_same_data(self):
+        self.assertEqual(self.snapshot(), self.snapshot())
+
+    def test_command_builds_consistent_graph(self):
+        call_command("generate_synthetic_data", *[f"--scale={s}" for s in self.SCALE], "--batch-size=7", stdout=StringIO())
+        self.assertEqual(KnowledgeItem.objects.count(), 30)
+        self.assertEqual(KnowledgeVersion.objects.filter(est_actuelle=True).count(), 30)
+        newcomers = UserProfile.objects.filter(role=UserProfile.Role.NEW_EMPLOYEE, poste__isnull=False)
+        self.assertEqual(Progression.objects.count(), newcomers.count())
+        self.assertTrue(User.objects.get(username="synth0").check_password("synthetique"))
+        # Les clés explicites n'empêchent pas les créations ordinaires ensuite
+        KnowledgeItem.objects.create(title="Après", kind=KnowledgeKind.objects.first(), content="x")
+
+    def test_invalid_scale_rejected(self):
+        with self.assertRaises(ValueError):
+            Scale.parse(["inconnu=3"])
+
+
+class FlakyEmailBackend(locmem.EmailBackend):
+    """Backend de test : compte les connexions, échoue pour les destinataires « panne@… »."""
+    opened = 0
+
+    def open(self):
+        FlakyEmailBackend.opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        if any(to.startswith("panne@") for m in messages for to in m.to):
+            raise OSError("SMTP indisponible")
+        return super().send_messages(messages)
+
+
+class OutboundEmailTests(TestCase):
+    def setUp(self):
+        self.dept = Department.objects.create(name="Informatique")
+        self.poste = Poste.objects.create(intitule="Développeur", department=self.dept)
+        admin_user = User.objects.create_user(username="admin", password="pw")
+        UserProfile.objects.create(user=admin_user, display_name="Admin", role="admin", department=self.dept)
+        self.client.login(username="admin", password="pw")
+
+    def test_user_create_only_enqueues(self):
+        resp = self.client.post(reverse("user_create"), {
+            "username": "nouveau", "first_name": "Jean", "last_name": "Dupont", "email": "jean@example.com",
+            "department": self.dept.id, "poste": self.poste.id, "role": "new_employee", "type_contrat": "cdi",
+        })
+        self.assertRedirects(resp, reverse("users_admin"), fetch_redirect_response=False)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboundEmail.objects.get().to, ["jean@example.com"])
+
+        call_command("send_outbound_emails", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("/password-reset/", mail.outbox[0].body)
+        sent = OutboundEmail.objects.get()
+        self.assertEqual(sent.status, OutboundEmail.Status.SENT)
+        self.assertEqual(sent.body, "")
+
+    @override_settings(EMAIL_BACKEND="app_connaissance.tests.FlakyEmailBackend")
+    def test_batch_shares_connection_and_failures_back_off(self):
+        for i in range(3):
+            enqueue_email("Bienvenue", "Bonjour", [f"user{i}@example.com"])
+        failing = enqueue_email("Bienvenue", "Bonjour", ["panne@example.com"])
+        FlakyEmailBackend.opened = 0
+        now = timezone.now()
+
+        self.assertEqual(send_pending(now=now), (3, 1))
+        self.assertEqual(FlakyEmailBackend.opened, 1)
+        failing.refresh_from_db()
+        self.assertEqual(failing.attempts, 1)
+        self.assertEqual(failing.next_attempt_at, now + outbox.retry_delay(1))
+        self.assertEqual(send_pending(now=now), (0, 0))
+
+        with self.assertLogs("app_connaissance.outbox", "ERROR"):
+            for _ in range(outbox.MAX_ATTEMPTS - 1):
+                failing.refresh_from_db()
+                send_pending(now=failing.next_attempt_at)
+        failing.refresh_from_db()
+        self.assertEqual(failing.status, OutboundEmail.Status.FAILED)
+        self.assertEqual(failing.body, "")
+        self.assertIn("SMTP indisponible", failing.last_error)
+
+        later = timezone.now() + outbox.RETENTION + timezone.timedelta(days=1)
+        pending = enqueue_email("Bienvenue", "Bonjour", ["nouveau@example.com"])
+        self.assertEqual(outbox.purge_old(now=later), 4)
+        self.assertEqual(list(OutboundEmail.objects.all()), [pending])
+
+
+    def test_admin_retry_skips_redacted_emails(self):
+        failed = enqueue_email("Bienvenue", "", ["abandon@example.com"])
+        waiting = enqueue_email("Bienvenue", "Lien", ["attente@example.com"])
+        OutboundEmail.objects.update(status=OutboundEmail.Status.FAILED, attempts=outbox.MAX_ATTEMPTS)
+        self.client.force_login(User.objects.create_superuser("root", "root@example.com", "pw"))
+        resp = self.client.post(
+            reverse("admin:app_connaissance_outboundemail_changelist"),
+            {"action": "retry_now", "_selected_action": [failed.pk, waiting.pk]},
+            follow=True,
+        )
+        self.assertContains(resp, "abandon@example.com")
+        failed.refresh_from_db()
+        waiting.refresh_from_db()
+        self.assertEqual(failed.status, OutboundEmail.Status.FAILED)
+        self.assertEqual((waiting.status, waiting.attempts), (OutboundEmail.Status.PENDING, 0))
+
+
+class UserImportTests(TestCase):
+    def setUp(self):
+        self.dept = Department.objects.create(name="Informatique")
+        Poste.objects.create(intitule="Développeur", department=self.dept)
+        admin_user = User.objects.create_user(username="admin", password="pw")
+        UserProfile.objects.create(user=admin_user, display_name="Jean Dupont", role="admin", department=self.dept)
+        self.client.login(username="admin", password="pw")
+
+    def upload(self, text, **extra):
+        file = SimpleUploadedFile("cohorte.csv", text.encode("utf-8"), content_type="text/csv")
+        return self.client.post(reverse("user_import"), {"file": file, **extra})
+
+    CSV = (
+        "identifiant;prénom;nom;email;département;poste;rôle;contrat\n"
+        "jdupont;Jean;Dupont;jean@example.com;Informatique;Développeur;Nouveau;CDI\n"
+        "amartin;Alice;Martin;alice@example.com;informatique;développeur;employee;\n"
+        "admin;Paul;Durand;paul@example.com;Informatique;Développeur;employee;\n"
+        "jdupont;Léa;Petit;pas-un-email;Finance;Comptable;chef;CDI\n"
+    )
+
+    def test_valid_rows_created_and_errors_reported(self):
+        resp = self.upload(self.CSV)
+        report = resp.context["report"]
+        self.assertEqual(report.created, 2)
+        self.assertEqual([e.line for e in report.errors], [4, 5])
+        self.assertIn("déjà utilisé", report.errors[0].message)
+        self.assertIn("département inconnu", report.errors[1].message)
+        self.assertIn("email invalide", report.errors[1].message)
+
+        profile = UserProfile.objects.get(user__username="jdupont")
+        self.assertEqual(profile.display_name, "Jean Dupont (jdupont)")
+        self.assertEqual((profile.role, profile.type_contrat), ("new_employee", "cdi"))
+        self.assertTrue(profile.user.has_usable_password())
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_dry_run_creates_nothing(self):
+        resp = self.upload(self.CSV, dry_run="1")
+        self.assertEqual(len(resp.context["report"].rows), 2)
+        self.assertFalse(User.objects.filter(username="amartin").exists())
+
+    def test_validation_queries_do_not_grow_with_rows(self):
+        rows = [
+            {"username": f"u{i}", "first_name": "A", "last_name": str(i), "email": f"u{i}@example.com",
+             "department": "Informatique", "poste": "Développeur", "role": "employee"}
+            for i in range(50)
+        ]
+        with CaptureQueriesContext(connection) as small:
+            validate_rows(rows[:2])
+        with CaptureQueriesContext(connection) as large:
+            validate_rows(rows)
+        self.assertEqual(len(small), len(large))
+
+    def test_taken_fallback_and_long_names_are_row_errors(self):
+        UserProfile.objects.create(display_name="Jean Dupont (jdupont)")
+        resp = self.upload(
+            "identifiant;prénom;nom;email;département;poste;rôle;nom affiché\n"
+            "jdupont;Jean;Dupont;jean@example.com;Informatique;Développeur;employee;\n"
+            f"long;Jean;Long;long@example.com;Informatique;Développeur;employee;{'x' * 121}\n"
+            "amartin;Alice;Martin;alice@example.com;Informatique;Développeur;employee;\n"
+        )
+        report = resp.context["report"]
+        self.assertEqual(report.created, 1)
+        self.assertIn("déjà utilisé", report.errors[0].message)
+        self.assertIn("trop long", report.errors[1].message)
+
+    def test_password_hashing_pool(self):
+        hashed = hash_passwords(["secret"] * 8, workers=2)
+        self.assertTrue(check_password("secret", hashed[-1]))
+
+
+class DepartmentStatsTests(TestCase):
+    def test_counts_are_not_multiplied_by_joins(self):
+        dept = Department.objects.create(name="Informatique")
+        Department.objects.create(name="Vide")
+        kind = KnowledgeKind.objects.create(name="Procédure")
+        for i in range(3):
+            UserProfile.objects.create(display_name=f"P{i}", department=dept)
+        for status in ("published", "published", "in_review", "draft", "archived"):
+            KnowledgeItem.objects.create(title=status, kind=kind, department=dept, content="x", status=status)
+
+        stats = {d.name: d for d in departments_with_stats()}
+        d = stats["Informatique"]
+        self.assertEqual((d.members, d.knowledge), (3, 5))
+        self.assertEqual((d.knowledge_published, d.knowledge_in_review, d.knowledge_draft), (2, 1, 1))
+        self.assertEqual((stats["Vide"].members, stats["Vide"].knowledge), (0, 0))
+
+
+class DashboardStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.it = Department.objects.create(name="Informatique")
+        self.rh = Department.objects.create(name="RH")
+        self.kind = KnowledgeKind.objects.create(name="Procédure")
+        self.user = User.objects.create_user(username="emp", password="pw")
+        UserProfile.objects.create(user=self.user, display_name="Emp", role="employee", department=self.it)
+        self.client.login(username="emp", password="pw")
+        self.item = KnowledgeItem.objects.create(
+            title="IT", kind=self.kind, department=self.it, content="x", status="published", read_time_min=4,
+        )
+        KnowledgeItem.objects.create(title="Global", kind=self.kind, content="x", status="in_review", read_time_min=8)
+        KnowledgeItem.objects.create(title="RH", kind=self.kind, department=self.rh, content="x", status="published")
+
+    def test_scoped_stats_cached_and_invalidated(self):
+        expected = {"total": 2, "published": 1, "pending": 1, "avg_read": 6}
+        self.assertEqual(knowledge_stats(self.it.id, False), expected)
+        with self.assertNumQueries(0):
+            self.assertEqual(knowledge_stats(self.it.id, False), expected)
+        self.assertEqual(knowledge_stats(None, True)["total"], 3)
+
+        self.item.department = self.rh
+        self.item.save()
+        self.assertEqual(knowledge_stats(self.it.id, False)["total"], 1)
+        self.assertEqual(knowledge_stats(self.rh.id, False)["total"], 3)
+        self.assertEqual(knowledge_stats(None, True)["total"], 3)
+
+        self.item.delete()
+        self.assertEqual(knowledge_stats(self.rh.id, False)["total"], 2)
+
+    def test_dashboard_uses_stats(self):
+        resp = self.client.get(reverse("dashboard"))
+        self.assertEqual(resp.context["stats"]["total"], 2)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.dept = Department.objects.create(name="Informatique")
+        self.kind = KnowledgeKind.objects.create(name="Procédure")
+        self.user = User.objects.create_user(username="emp", password="pw")
+        UserProfile.objects.create(user=self.user, display_name="Emp", role="employee", department=self.dept)
+        self.client.login(username="emp", password="pw")
+        self.item = KnowledgeItem.objects.create(
+            title="Fiche", kind=self.kind, content="<p>x</p>", status=KnowledgeItem.Status.PUBLISHED,
+        )
+
+    def revalidate(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        return first, self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+    def test_detail_not_modified_until_edit(self):
+        url = reverse("knowledge_detail", args=[self.item.id])
+        first, second = self.revalidate(url)
+        self.assertEqual(second.status_code, 304)
+        self.assertFalse(second.templates)
+        self.assertIn("public", first["Cache-Control"])
+        self.assertIn("Cookie", first["Vary"])
+
+        self.item.title = "Fiche modifiée"
+        self.item.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 200)
+
+    def test_author_rename_changes_list_etag(self):
+        author = User.objects.create_user(username="auteur")
+        profile = UserProfile.objects.create(user=author, display_name="Ancien nom", role="employee")
+        self.item.author_user = author
+        self.item.save()
+        url = reverse("knowledge_list")
+        first, second = self.revalidate(url)
+        self.assertEqual(second.status_code, 304)
+
+        profile.display_name = "Nouveau nom"
+        profile.save()
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, "Nouveau nom")
+        detail = reverse("knowledge_detail", args=[self.item.id])
+        etag = self.client.get(detail)["ETag"]
+        profile.display_name = "Autre nom"
+        profile.save()
+        self.assertEqual(self.client.get(detail, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_department_article_is_private(self):
+        self.item.department = self.dept
+        self.item.save()
+        first, _ = self.revalidate(reverse("knowledge_detail", args=[self.item.id]))
+        self.assertIn("private", first["Cache-Control"])
+
+    def test_list_etag_depends_on_changes_and_viewer(self):
+        url = reverse("knowledge_list")
+        first, second = self.revalidate(url)
+        self.assertEqual(second.status_code, 304)
+
+        KnowledgeItem.objects.create(title="Nouvelle", kind=self.kind, content="x", status=KnowledgeItem.Status.PUBLISHED)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 200)
+
+        etag = self.client.get(url)["ETag"]
+        other = User.objects.create_user(username="emp2", password="pw")
+        UserProfile.objects.create(user=other, display_name="Emp2", role="employee", department=self.dept)
+        self.client.login(username="emp2", password="pw")
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
@@ -47,6 +47,7 @@ urlpatterns = [
     path('admin-panel/departements/<int:pk>/modifier/', views.department_edit, name='department_edit'),
     path('admin-panel/utilisateurs/', views.users_admin, name='users_admin'),
     path('admin-panel/utilisateurs/nouveau/', views.user_create, name='user_create'),
+    path('admin-panel/utilisateurs/import/', views.user_import, name='user_import'),
     path('admin-panel/etapes-integration/', views.onboarding_steps_admin, name='onboarding_steps_admin'),
     path('admin-panel/etapes-integration/nouvelle/', views.onboarding_step_create, name='onboarding_step_create'),
     path('admin-panel/etapes-integration/<int:pk>/modifier/', views.onboarding_step_edit, name='onboarding_step_edit'),
@@ -55,7 +56,9 @@ urlpatterns = [
     path('integration/', views.onboarding_home, name='onboarding_home'),
     path('integration/mon-plan/', views.plan_integration_personnel, name='plan_integration_personnel'),
     path('integration/step/<int:step_id>/toggle/', views.module_step_toggle, name='module_step_toggle'),
+    path('integration/steps/', views.module_steps_update, name='module_steps_update'),
     path('integration/quiz/<int:quiz_id>/', views.quiz_take, name='quiz_take'),
+    path('integration/cohortes/', views.cohort_report, name='cohort_report'),
     path('formations/', views.trainings, name='trainings'),
 
     # Profil
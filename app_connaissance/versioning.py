@@ -0,0 +1,167 @@
+"""Stockage compressé de l'historique des connaissances (instantanés + deltas).
+
+Une version est soit un instantané complet (``base`` vide, texte dans ``content``),
+soit un delta appliqué à la version précédente de la même connaissance
+(``base`` renseigné, opérations dans ``delta``). Un instantané est forcé toutes
+les ``SNAPSHOT_INTERVAL`` versions pour borner le coût de reconstruction.
+
+Format du delta (JSON) : liste d'opérations où ``[i, j]`` recopie les segments
+``i..j-1`` du texte de base et une chaîne est insérée telle quelle.
+"""
+from __future__ import annotations
+
+import json
+import re
+from difflib import SequenceMatcher
+
+from django.core.cache import cache
+
+from .models import KnowledgeItem, KnowledgeVersion
+
+SNAPSHOT_INTERVAL = 10
+
+CACHE_TIMEOUT = 60 * 60
+
+# Champs de stockage d'une version (instantané ou delta)
+_STORAGE_FIELDS = {"content", "delta", "base_id", "delta_depth"}
+
+# Découpage en segments (lignes, fins de balises, fins de phrases) ; "".join() restitue le texte.
+_SEGMENT_RE = re.compile(r"(?<=[\n>.])")
+
+
+def _segments(text: str) -> list[str]:
+    return [s for s in _SEGMENT_RE.split(text) if s]
+
+
+def make_delta(base: str, target: str) -> str:
+    """Encode ``target`` comme une suite de copies depuis ``base`` et d'insertions."""
+    a = _segments(base)
+    b = _segments(target)
+    ops: list = []
+    matcher = SequenceMatcher(None, a, b, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append("".join(b[j1:j2]))
+    return json.dumps(ops, ensure_ascii=False, separators=(",", ":"))
+
+
+def apply_delta(base: str, delta: str) -> str:
+    a = _segments(base)
+    out: list[str] = []
+    for op in json.loads(delta):
+        if isinstance(op, str):
+            out.append(op)
+        else:
+            out.extend(a[op[0]:op[1]])
+    return "".join(out)
+
+
+def _cache_key(version_id: int) -> str:
+    return f"knowledge_version:content:{version_id}"
+
+
+def stored_size(version: KnowledgeVersion) -> int:
+    """Taille stockée (octets UTF-8) du contenu d'une version."""
+    return len((version.content or "").encode("utf-8")) + len((version.delta or "").encode("utf-8"))
+
+
+def encode_version(version: KnowledgeVersion, content: str, base: KnowledgeVersion | None, base_content: str) -> None:
+    """Renseigne ``content``/``delta``/``base`` : delta si la chaîne le permet et si c'est plus compact."""
+    version.base = None
+    version.delta = ""
+    version.delta_depth = 0
+    version.content = content
+    if base is None or base.delta_depth + 1 >= SNAPSHOT_INTERVAL:
+        return
+    delta = make_delta(base_content, content)
+    if len(delta.encode("utf-8")) >= len(content.encode("utf-8")):
+        return
+    version.base = base
+    version.delta = delta
+    version.delta_depth = base.delta_depth + 1
+    version.content = ""
+
+
+def record_version(
+    item: KnowledgeItem,
+    numero_version: str,
+    content: str,
+    author_name: str = "",
+    note_modification: str = "",
+) -> KnowledgeVersion:
+    """Crée la nouvelle version actuelle d'une connaissance (delta sur la précédente si possible)."""
+    base = (
+        item.versions.order_by("-id")
+        .only("id", "content", "delta", "base_id", "delta_depth", "knowledge_item_id")
+        .first()
+    )
+    base_content = get_version_content(base) if base else ""
+    item.versions.filter(est_actuelle=True).update(est_actuelle=False)
+    version = KnowledgeVersion(
+        knowledge_item=item,
+        numero_version=numero_version,
+        author_name=author_name,
+        est_actuelle=True,
+        note_modification=note_modification,
+    )
+    encode_version(version, content, base, base_content)
+    version.save()
+    cache.set(_cache_key(version.pk), content, CACHE_TIMEOUT)
+    return version
+
+
+def get_version_content(version: KnowledgeVersion) -> str:
+    """Texte complet d'une version, reconstruit depuis le dernier instantané (avec cache)."""
+    cached = cache.get(_cache_key(version.pk))
+    if cached is not None:
+        return cached
+
+    # Version issue de ``version_list()`` (métadonnées seules) : charger son stockage en une requête
+    node = version
+    if _STORAGE_FIELDS & version.get_deferred_fields():
+        node = KnowledgeVersion.objects.only(*_STORAGE_FIELDS, "knowledge_item_id").get(pk=version.pk)
+
+    # Remonter la chaîne jusqu'à un instantané ou une version déjà en cache
+    chain: list[KnowledgeVersion] = []
+    content: str | None = None
+    loaded: dict[int, KnowledgeVersion] = {}
+    while True:
+        if node.base_id is None:
+            content = node.content
+            break
+        chain.append(node)
+        content = cache.get(_cache_key(node.base_id))
+        if content is not None:
+            break
+        if node.base_id not in loaded:
+            # Une seule requête charge toute la fenêtre jusqu'à l'instantané précédent
+            window = KnowledgeVersion.objects.filter(
+                knowledge_item_id=node.knowledge_item_id, id__lte=node.base_id
+            ).order_by("-id").only("id", *_STORAGE_FIELDS, "knowledge_item_id")
+            loaded.update((v.id, v) for v in window[: node.delta_depth + 1])
+        node = loaded[node.base_id]
+
+    for link in reversed(chain):
+        content = apply_delta(content, link.delta)
+    cache.set(_cache_key(version.pk), content, CACHE_TIMEOUT)
+    return content
+
+
+def compact_item_history(item_id: int) -> tuple[int, int]:
+    """Réencode l'historique d'une connaissance en instantanés + deltas. Retourne (avant, après) en octets."""
+    versions = list(KnowledgeVersion.objects.filter(knowledge_item_id=item_id).order_by("id"))
+    contents = [get_version_content(v) for v in versions]
+    before = sum(stored_size(v) for v in versions)
+    for idx, version in enumerate(versions):
+        if idx:
+            encode_version(version, contents[idx], versions[idx - 1], contents[idx - 1])
+        else:
+            encode_version(version, contents[idx], None, "")
+    # Les deltas référencent leur base : on sauvegarde dans l'ordre chronologique
+    for version in versions:
+        version.save(update_fields=["content", "delta", "base", "delta_depth"])
+        cache.delete(_cache_key(version.pk))
+    after = sum(stored_size(v) for v in versions)
+    return before, after
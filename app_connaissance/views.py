@@ -2,41 +2,48 @@ from __future__ import annotations
 
 from typing import Any
 
+import csv
+import json
 import random
 import re
-import secrets
-import string
+from datetime import datetime
 
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import logout
 from django.contrib.auth.models import User
-from django.contrib.auth.tokens import default_token_generator
 from django.contrib.auth.views import PasswordResetConfirmView as DjangoPasswordResetConfirmView
-from django.core.mail import EmailMultiAlternatives
-from django.db.models import Avg, Count, Q
-from django.http import HttpRequest, HttpResponse
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q, prefetch_related_objects
+from django.http import HttpRequest, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.template.loader import render_to_string
 from django.urls import reverse
-from django.utils.encoding import force_bytes
-from django.utils.http import urlsafe_base64_encode
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 from django.utils import timezone
 
+from . import search
+from .accounts import COLUMNS, import_users, random_password, read_rows, set_password_email, validate_rows
+from .attempts import best_attempts, grade, latest_attempts, record_attempt
+from .versioning import record_version
+from .fragments import get_fragment, get_fragments
 from .forms import DepartmentForm, OnboardingStepForm, ProfileEditForm, UserCreateForm
-from .frontend_auth import frontend_login_required, frontend_roles_required
+from .frontend_auth import frontend_login_required, frontend_roles_required, get_principal
+from .conditional import list_version, not_modified, page_etag, set_cache_headers
+from .outbox import enqueue_email
+from .plan_structure import get_quiz_node
+from .progress import cohort_progress, compute_plan_progress
 from .services import generate_quiz_for_knowledge
+from .signals import progress_changed
+from .stats import departments_with_stats, knowledge_stats, track_status_change
 from .models import (
     Department,
     KnowledgeItem,
     KnowledgeKind,
-    KnowledgeVersion,
-    Module,
     ModuleStep,
     OnboardingStep,
     PlanIntegration,
     Poste,
-    Progression,
     Quiz,
     QuizChoice,
     QuizQuestion,
@@ -77,8 +84,7 @@ def _estimate_read_time_min(content: str) -> int:
 def index_redirect(request: HttpRequest) -> HttpResponse:
     """Première page : redirige vers login si non connecté, sinon dashboard ou changement mot de passe."""
     if request.user.is_authenticated:
-        profile = getattr(request.user, "profile", None)
-        if profile and getattr(profile, "must_change_password", False):
+        if get_principal(request).must_change_password:
             return redirect("password_change_required")
         return redirect("dashboard")
     return redirect("login")
@@ -132,14 +138,14 @@ def password_change_required(request: HttpRequest) -> HttpResponse:
     """Changement de mot de passe obligatoire (première connexion)."""
     if not request.user.is_authenticated:
         return redirect(settings.LOGIN_URL + "?next=" + request.path)
-    profile = getattr(request.user, "profile", None)
-    if not profile or not getattr(profile, "must_change_password", False):
+    if not get_principal(request).must_change_password:
         return redirect("dashboard")
     if request.method == "POST":
         from django.contrib.auth.forms import SetPasswordForm
         form = SetPasswordForm(request.user, request.POST)
         if form.is_valid():
             form.save()
+            profile = request.user.profile
             profile.must_change_password = False
             profile.save(update_fields=["must_change_password"])
             from django.contrib.auth import update_session_auth_hash
@@ -177,39 +183,26 @@ def _knowledge_qs_for_user(request: HttpRequest):
     - Employés voient seulement les connaissances de leur département (ou aucune si pas de département)
     """
     qs = KnowledgeItem.objects.select_related("department").prefetch_related("tags")
-    profile = getattr(request.user, "profile", None)
-    if profile and profile.role in ("admin", "manager"):
+    principal = get_principal(request)
+    if principal.sees_all_departments:
         return qs
-    if profile and profile.department_id:
+    if principal.department_id:
         # Inclure les contenus globaux (department=None) + ceux du département de l'utilisateur
-        return qs.filter(Q(department_id=profile.department_id) | Q(department__isnull=True))
+        return qs.filter(Q(department_id=principal.department_id) | Q(department__isnull=True))
     # Si l'utilisateur n'a pas de département, ne pas afficher de contenu
     return qs.none()
 
 
 def dashboard(request: HttpRequest) -> HttpResponse:
-    user = request.user
-    profile = getattr(user, "profile", None)
-    role = profile.role if profile else None
+    principal = get_principal(request)
+    role = principal.role
 
     knowledge_qs = _knowledge_qs_for_user(request)
     pending_validation = list(knowledge_qs.filter(status=KnowledgeItem.Status.IN_REVIEW)[:8])
 
-    agg = knowledge_qs.aggregate(
-        total=Count("id"),
-        published=Count("id", filter=Q(status=KnowledgeItem.Status.PUBLISHED)),
-        pending=Count("id", filter=Q(status=KnowledgeItem.Status.IN_REVIEW)),
-        avg_read=Avg("read_time_min"),
-    )
-
-    stats = {
-        "total": int(agg["total"] or 0),
-        "published": int(agg["published"] or 0),
-        "pending": int(agg["pending"] or 0),
-        "avg_read": round(float(agg["avg_read"] or 0)) or 0,
-    }
+    stats = knowledge_stats(principal.department_id, principal.sees_all_departments)
 
-    plan_has_link = bool(profile and getattr(profile, "poste_id", None) and getattr(profile.poste, "plan_integration_id", None))
+    plan_has_link = bool(principal.plan_id)
     plan_href = reverse("plan_integration_personnel") if plan_has_link else reverse("onboarding_home")
     plan_title = "Mon plan d'intégration" if plan_has_link else "Plan d'intégration"
     plan_desc = "Quiz et suivi de progression" if plan_has_link else "Parcours guidé pour les nouveaux"
@@ -242,55 +235,168 @@ def dashboard(request: HttpRequest) -> HttpResponse:
 
 @frontend_login_required
 def knowledge_list(request: HttpRequest) -> HttpResponse:
+    etag = page_etag(request, "list", list_version(), request.GET.urlencode())
+    if request.GET.get("export") != "csv":
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+
     query = (request.GET.get("q") or "").strip()
     kind = (request.GET.get("kind") or "").strip()
     department = (request.GET.get("department") or "").strip()
 
     # La liste publique ne montre que les contenus publiés
-    items_qs = (
-        KnowledgeItem.objects.select_related("department", "kind", "quiz")
-        .prefetch_related("tags", "versions")
-        .annotate(version_count=Count("versions"))
-        .filter(status=KnowledgeItem.Status.PUBLISHED)
-    )
-    if query:
-        items_qs = items_qs.filter(Q(title__icontains=query) | Q(content__icontains=query) | Q(tags__name__icontains=query)).distinct()
+    scope = KnowledgeItem.objects.filter(status=KnowledgeItem.Status.PUBLISHED)
     if kind:
-        items_qs = items_qs.filter(kind__id=kind)
+        scope = scope.filter(kind__id=kind)
     if department:
-        items_qs = items_qs.filter(department__id=department)
+        scope = scope.filter(department__id=department)
 
     # Restreindre selon le département de l'utilisateur pour les non-admins/managers
-    profile = getattr(request.user, "profile", None)
-    if not (profile and profile.role in ("admin", "manager")):
-        if profile and profile.department_id:
+    principal = get_principal(request)
+    if not principal.sees_all_departments:
+        if principal.department_id:
             # Montrer les contenus globaux + ceux du département de l'utilisateur
-            items_qs = items_qs.filter(Q(department_id=profile.department_id) | Q(department__isnull=True))
+            scope = scope.filter(Q(department_id=principal.department_id) | Q(department__isnull=True))
         else:
-            items_qs = items_qs.none()
+            scope = scope.none()
+
+    items_qs = (
+        scope.select_related("department", "kind", "quiz", "author_user", "author_user__profile")
+        .defer("content")
+        .annotate(version_count=Count("versions"))
+    )
+    # Index plein texte : droits et filtres appliqués dans la requête FTS, avant le classement
+    ranked_search = bool(query) and search.is_available()
+    if query and not ranked_search:
+        items_qs = items_qs.filter(Q(title__icontains=query) | Q(content__icontains=query) | Q(tags__name__icontains=query)).distinct()
+
+    if request.GET.get("export") == "csv":
+        if ranked_search:
+            matches = search.matching_ids(query)
+            items_qs = items_qs.filter(id__in=matches) if matches is not None else items_qs.none()
+        return _knowledge_csv_export(items_qs)
 
     kinds = KnowledgeKind.objects.all()
     # Le select dans le filtre département ne montre que les départements autorisés
-    if profile and profile.role in ("admin", "manager"):
+    if principal.sees_all_departments:
         departments = Department.objects.all()
     else:
-        if profile and profile.department_id:
-            departments = Department.objects.filter(id=profile.department_id)
+        if principal.department_id:
+            departments = Department.objects.filter(id=principal.department_id)
         else:
             departments = Department.objects.none()
 
-    return render(
+    page_size = _page_size(request)
+    cursor = request.GET.get("cursor") or ""
+    next_cursor = None
+    if ranked_search:
+        # Résultats de recherche : pagination par rang (LIMIT/OFFSET dans la requête FTS)
+        offset = int(cursor) if cursor.isdigit() else 0
+        hits = search.search(query, limit=page_size + 1, offset=offset, within=scope)
+        page_hits = hits[:page_size]
+        by_id = items_qs.filter(id__in=[h.item_id for h in page_hits]).in_bulk()
+        items = []
+        for h in page_hits:
+            item = by_id[h.item_id]
+            item.search_snippet = h.snippet
+            items.append(item)
+        # L'extrait dépend de la recherche : cartes rendues sans cache
+        prefetch_related_objects(items, "tags")
+        if len(hits) > page_size:
+            next_cursor = str(offset + page_size)
+    else:
+        # Pagination par curseur sur (-updated_at, id) : coût constant quelle que soit la page
+        items_qs = items_qs.order_by("-updated_at", "id")
+        position = _decode_cursor(cursor)
+        if position:
+            updated_at, item_id = position
+            items_qs = items_qs.filter(Q(updated_at__lt=updated_at) | Q(updated_at=updated_at, id__gt=item_id))
+        items = list(items_qs[:page_size + 1])
+        if len(items) > page_size:
+            items = items[:page_size]
+            next_cursor = _encode_cursor(items[-1])
+        _attach_card_fragments(items)
+
+    response = render(
         request,
         "knowledge/list.html",
         {
-            "items": list(items_qs),
+            "items": items,
             "q": query,
             "kind": kind,
             "department": department,
             "kinds": kinds,
             "departments": departments,
+            "next_cursor": next_cursor,
+            "is_first_page": not cursor,
         },
     )
+    return set_cache_headers(response, etag)
+
+
+def _attach_card_fragments(items: list[KnowledgeItem]) -> None:
+    """Cartes de la liste depuis le cache ; les manquantes sont rendues ensemble (une requête de tags)."""
+    by_id = {item.id: item for item in items}
+
+    def _render(ids: list[int]) -> dict[int, str]:
+        missing = [by_id[i] for i in ids]
+        prefetch_related_objects(missing, "tags")
+        return {item.id: render_to_string("_partials/knowledge_card.html", {"item": item}) for item in missing}
+
+    cards = get_fragments("card", {item.id: (item.updated_at, item.version_count) for item in items}, _render)
+    for item in items:
+        item.card_html = cards[item.id]
+
+
+def _page_size(request: HttpRequest) -> int:
+    default = getattr(settings, "KNOWLEDGE_LIST_PAGE_SIZE", 24)
+    value = request.GET.get("per_page") or ""
+    if value.isdigit():
+        return max(1, min(int(value), 100))
+    return default
+
+
+def _encode_cursor(item: KnowledgeItem) -> str:
+    raw = f"{item.updated_at.isoformat()}|{item.id}"
+    return urlsafe_base64_encode(raw.encode("utf-8"))
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int] | None:
+    """Curseur -> (updated_at, id) du dernier élément de la page précédente ; None si invalide."""
+    if not cursor:
+        return None
+    try:
+        updated_at, item_id = urlsafe_base64_decode(cursor).decode("utf-8").split("|")
+        return datetime.fromisoformat(updated_at), int(item_id)
+    except ValueError:
+        return None
+
+
+class _Echo:
+    """Pseudo-fichier pour csv.writer : renvoie la ligne au lieu de l'écrire."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def _knowledge_csv_export(items_qs) -> StreamingHttpResponse:
+    """Export CSV en flux : les lignes sont lues par paquets, sans tout charger en mémoire."""
+    rows = items_qs.order_by("-updated_at", "id").values_list(
+        "id", "title", "kind__name", "department__name", "author", "version_count", "updated_at"
+    )
+    writer = csv.writer(_Echo())
+
+    def _lines():
+        yield writer.writerow(["id", "titre", "type", "departement", "auteur", "versions", "mise_a_jour"])
+        for item_id, title, kind_name, department_name, author, version_count, updated_at in rows.iterator(chunk_size=2000):
+            yield writer.writerow([
+                item_id, title, kind_name, department_name or "", author, version_count, updated_at.isoformat(),
+            ])
+
+    response = StreamingHttpResponse(_lines(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = 'attachment; filename="connaissances.csv"'
+    return response
 
 
 def _can_view_knowledge(request: HttpRequest, item: KnowledgeItem) -> bool:
@@ -301,22 +407,22 @@ def _can_view_knowledge(request: HttpRequest, item: KnowledgeItem) -> bool:
     - Contenu publié : visible si global (department=None) ou si département de l'utilisateur == département de la connaissance
     - Brouillon / En validation / Rejeté : uniquement auteur, manager ou admin
     """
-    profile = getattr(request.user, "profile", None)
+    principal = get_principal(request)
 
     # Contenus publiés : visibilité limitée par département (sauf admin/manager)
     if item.status == KnowledgeItem.Status.PUBLISHED:
-        if profile and profile.role in ("admin", "manager"):
+        if principal.sees_all_departments:
             return True
         if item.department_id is None:
             return True
-        if profile and profile.department_id == item.department_id:
+        if principal.department_id == item.department_id:
             return True
         return False
 
     # Contenus non publiés : seuls admin/manager ou auteur
-    if not profile:
+    if not principal.profile_id:
         return False
-    if profile.role in ("admin", "manager"):
+    if principal.sees_all_departments:
         return True
     if item.author_user_id and item.author_user_id == request.user.id:
         return True
@@ -326,8 +432,8 @@ def _can_view_knowledge(request: HttpRequest, item: KnowledgeItem) -> bool:
 @frontend_login_required
 def knowledge_detail(request: HttpRequest, knowledge_id: int) -> HttpResponse:
     item = get_object_or_404(
-        KnowledgeItem.objects.select_related("department", "author_user", "quiz").prefetch_related(
-            "tags", "competences", "versions"
+        KnowledgeItem.objects.select_related(
+            "department", "kind", "author_user", "author_user__profile", "quiz"
         ),
         pk=knowledge_id,
     )
@@ -335,41 +441,57 @@ def knowledge_detail(request: HttpRequest, knowledge_id: int) -> HttpResponse:
         messages.error(request, "Vous n'avez pas accès à ce contenu.")
         return redirect("knowledge_list")
 
+    # Métadonnées seulement : le contenu de la version choisie est chargé ensuite
     version_id = request.GET.get("version")
-    versions = list(item.versions.order_by("-date_creation"))
+    versions = list(item.version_list())
     selected_version = None
     if version_id:
-        try:
-            selected_version = next(v for v in versions if str(v.id) == str(version_id))
-        except StopIteration:
-            pass
+        selected_version = next((v for v in versions if str(v.id) == str(version_id)), None)
     if not selected_version:
-        selected_version = item.get_current_version()
+        selected_version = next((v for v in versions if v.est_actuelle), None) or (versions[0] if versions else None)
+    etag = page_etag(
+        request, "detail", item.pk, item.updated_at, item.status, item.get_display_author(),
+        max((v.id for v in versions), default=None), getattr(selected_version, "id", None),
+        getattr(getattr(item, "quiz", None), "id", None),
+    )
+    shared = item.status == KnowledgeItem.Status.PUBLISHED and item.department_id is None
+    cached = not_modified(request, etag, shared)
+    if cached is not None:
+        return cached
+
     if not selected_version:
         # Aucune version en base : afficher le contenu de l'item (rétrocompat)
-        display_content = item.content
         display_date = item.updated_at
         display_numero = item.numero_version
         display_author = item.get_display_author()
     else:
-        display_content = selected_version.content
         display_date = selected_version.date_creation
         display_numero = selected_version.numero_version
         display_author = selected_version.author_name or item.get_display_author()
+    # Corps et étiquettes depuis le cache de fragments : ni décompression ni requêtes tags/compétences
+    body_html = get_fragment(
+        "body", item.id, getattr(selected_version, "id", None),
+        lambda: selected_version.get_content() if selected_version else item.content,
+    )
+    labels_html = get_fragment(
+        "labels", item.id, None, lambda: render_to_string("_partials/knowledge_labels.html", {"item": item}),
+    )
 
-    return render(
+    response = render(
         request,
         "knowledge/detail.html",
         {
             "item": item,
             "versions": versions,
             "selected_version": selected_version,
-            "display_content": display_content,
+            "body_html": body_html,
+            "labels_html": labels_html,
             "display_date": display_date,
             "display_numero": display_numero,
             "display_author": display_author,
         },
     )
+    return set_cache_headers(response, etag, shared)
 
 
 @frontend_login_required
@@ -404,13 +526,7 @@ def knowledge_create(request: HttpRequest) -> HttpResponse:
 
         if not author_name:
             # Par défaut on utilise le nom du profil ou de l'utilisateur connecté
-            user = request.user
-            profile = getattr(user, "profile", None)
-            author_name = (
-                profile.display_name
-                if profile
-                else (user.get_full_name() or user.get_username())
-            )
+            author_name = get_principal(request).display_name
 
         read_time = _estimate_read_time_min(content)
 
@@ -433,13 +549,7 @@ def knowledge_create(request: HttpRequest) -> HttpResponse:
             numero_version=numero_version,
         )
 
-        KnowledgeVersion.objects.create(
-            knowledge_item=item,
-            numero_version=numero_version,
-            content=content,
-            author_name=author_name,
-            est_actuelle=True,
-        )
+        record_version(item, numero_version, content, author_name=author_name)
 
         tag_names = _parse_tags(tags_csv)
         if tag_names:
@@ -449,6 +559,8 @@ def knowledge_create(request: HttpRequest) -> HttpResponse:
         if request.FILES.get("file"):
             item.attachment = request.FILES["file"]
             item.save(update_fields=["attachment"])
+        search.index_knowledge_item(item)
+        track_status_change(None, item.status)
 
         if item.status == KnowledgeItem.Status.IN_REVIEW:
             messages.success(request, "Contenu créé et envoyé en validation.")
@@ -468,10 +580,10 @@ def knowledge_create(request: HttpRequest) -> HttpResponse:
 
 def _can_edit_knowledge(request: HttpRequest, item: KnowledgeItem) -> bool:
     """Vérifie si l'utilisateur peut modifier cette connaissance."""
-    profile = getattr(request.user, "profile", None)
-    if not profile:
+    principal = get_principal(request)
+    if not principal.profile_id:
         return False
-    if profile.role in ("admin", "manager"):
+    if principal.sees_all_departments:
         return True
     if item.author_user_id and item.author_user_id == request.user.id:
         return True
@@ -482,7 +594,7 @@ def _can_edit_knowledge(request: HttpRequest, item: KnowledgeItem) -> bool:
 def knowledge_edit(request: HttpRequest, knowledge_id: int) -> HttpResponse:
     item = get_object_or_404(
         KnowledgeItem.objects.select_related("department", "kind").prefetch_related(
-            "tags", "competences", "versions"
+            "tags", "competences"
         ),
         pk=knowledge_id,
     )
@@ -503,13 +615,11 @@ def knowledge_edit(request: HttpRequest, knowledge_id: int) -> HttpResponse:
             current = item.get_current_version()
             numero_version = current.numero_version if current else item.numero_version
 
-        item.versions.update(est_actuelle=False)
-        KnowledgeVersion.objects.create(
-            knowledge_item=item,
-            numero_version=numero_version,
-            content=content,
+        record_version(
+            item,
+            numero_version,
+            content,
             author_name=item.get_display_author(),
-            est_actuelle=True,
             note_modification=note_modification,
         )
         item.title = title
@@ -518,6 +628,7 @@ def knowledge_edit(request: HttpRequest, knowledge_id: int) -> HttpResponse:
         item.numero_version = numero_version
         item.read_time_min = _estimate_read_time_min(content)
         item.save(update_fields=["title", "description", "content", "numero_version", "read_time_min", "updated_at"])
+        search.index_knowledge_item(item)
         messages.success(request, "Nouvelle version enregistrée.")
         return redirect("knowledge_detail", knowledge_id=item.id)
 
@@ -542,12 +653,7 @@ def knowledge_duplicate(request: HttpRequest, knowledge_id: int) -> HttpResponse
         messages.error(request, "Vous n'avez pas le droit de dupliquer ce contenu.")
         return redirect("knowledge_list")
 
-    profile = getattr(request.user, "profile", None)
-    author_name = (
-        profile.display_name
-        if profile
-        else (request.user.get_full_name() or request.user.get_username())
-    )
+    author_name = get_principal(request).display_name
     new_item = KnowledgeItem.objects.create(
         title=f"{source.title} (copie)",
         description=source.description,
@@ -561,17 +667,12 @@ def knowledge_duplicate(request: HttpRequest, knowledge_id: int) -> HttpResponse
         numero_version=source.numero_version,
         read_time_min=source.read_time_min,
     )
-    KnowledgeVersion.objects.create(
-        knowledge_item=new_item,
-        numero_version=source.numero_version,
-        content=source.content,
-        author_name=author_name,
-        est_actuelle=True,
-    )
+    record_version(new_item, source.numero_version, source.content, author_name=author_name)
     for tag in source.tags.all():
         new_item.tags.add(tag)
     for comp in source.competences.all():
         new_item.competences.add(comp)
+    search.index_knowledge_item(new_item)
     messages.success(request, "Connaissance dupliquée. Vous pouvez la modifier.")
     return redirect("knowledge_edit", knowledge_id=new_item.id)
 
@@ -579,7 +680,7 @@ def knowledge_duplicate(request: HttpRequest, knowledge_id: int) -> HttpResponse
 @frontend_roles_required("manager")
 def validation_queue(request: HttpRequest) -> HttpResponse:
     items = (
-        KnowledgeItem.objects.select_related("department")
+        KnowledgeItem.objects.select_related("department", "kind")
         .prefetch_related("tags")
         .filter(status=KnowledgeItem.Status.IN_REVIEW)
         .order_by("-updated_at")[:50]
@@ -600,16 +701,13 @@ def validation_approve(request: HttpRequest, knowledge_id: int) -> HttpResponse:
 
     # S'assurer qu'au moins une version existe (rétrocompat)
     if not item.versions.exists():
-        KnowledgeVersion.objects.create(
-            knowledge_item=item,
-            numero_version=item.numero_version,
-            content=item.content,
-            author_name=item.author,
-            est_actuelle=True,
-        )
+        record_version(item, item.numero_version, item.content, author_name=item.author)
+    previous_status = item.status
     item.status = KnowledgeItem.Status.PUBLISHED
     item.published_at = timezone.now()
     item.save(update_fields=["status", "published_at", "updated_at"])
+    track_status_change(previous_status, item.status)
+    search.index_knowledge_item(item)
     messages.success(request, "Contenu publié.")
     return redirect("validation_queue")
 
@@ -626,45 +724,93 @@ def validation_reject(request: HttpRequest, knowledge_id: int) -> HttpResponse:
         return redirect("validation_queue")
 
     comment = (request.POST.get("rejection_comment") or "").strip()
+    previous_status = item.status
     item.status = KnowledgeItem.Status.REJECTED
     item.rejection_comment = comment
     item.save(update_fields=["status", "rejection_comment", "updated_at"])
+    track_status_change(previous_status, item.status)
     messages.info(request, "Contenu rejeté." + (" Commentaire enregistré." if comment else ""))
     return redirect("validation_queue")
 
 
-def _send_set_password_email(request: HttpRequest, user: User) -> bool:
+# Au-delà, la page renvoie vers l'export CSV (toute la cohorte)
+COHORT_PAGE_ROWS = 200
+
+
+@frontend_roles_required("manager", "admin")
+def cohort_report(request: HttpRequest) -> HttpResponse:
+    """Progression des nouveaux arrivants d'un plan d'intégration, par département ; export CSV en flux."""
+    principal = get_principal(request)
+    plans = list(PlanIntegration.objects.filter(postes__isnull=False).distinct())
+    departments = Department.objects.all()
+    plan_id = (request.GET.get("plan") or "").strip()
+    department = (request.GET.get("department") or "").strip()
+    if "department" not in request.GET and principal.department_id:
+        department = str(principal.department_id)
+    plan = next((p for p in plans if str(p.id) == plan_id), plans[0] if plans else None)
+    department_id = int(department) if department.isdigit() else None
+
+    if plan is not None and request.GET.get("export") == "csv":
+        return _cohort_csv_export(plan, department_id)
+
+    rows, total, finished, sum_pct = [], 0, 0, 0
+    if plan is not None:
+        for row in cohort_progress(plan, department_id):
+            total += 1
+            sum_pct += row.pourcentage
+            finished += row.pourcentage == 100
+            if len(rows) < COHORT_PAGE_ROWS:
+                rows.append(row)
+    return render(
+        request,
+        "onboarding/cohort_report.html",
+        {
+            "plans": plans,
+            "plan": plan,
+            "departments": departments,
+            "department": department,
+            "rows": rows,
+            "total": total,
+            "finished": finished,
+            "average_pct": round(sum_pct / total) if total else 0,
+            "truncated": total > len(rows),
+        },
+    )
+
+
+def _cohort_csv_export(plan: PlanIntegration, department_id: int | None) -> StreamingHttpResponse:
+    writer = csv.writer(_Echo())
+
+    def _lines():
+        yield writer.writerow([
+            "utilisateur", "departement", "poste", "date_embauche", "sous_etapes_cochees",
+            "quiz_reussis", "modules_valides", "pourcentage", "module_en_cours",
+        ])
+        for row in cohort_progress(plan, department_id):
+            yield writer.writerow([
+                row.display_name, row.department, row.poste,
+                row.date_embauche.isoformat() if row.date_embauche else "",
+                row.steps_completed, row.quizzes_passed, row.modules_completed, row.pourcentage,
+                row.current_module,
+            ])
+
+    response = StreamingHttpResponse(_lines(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="cohorte-plan-{plan.id}.csv"'
+    return response
+
+
+def _queue_set_password_email(request: HttpRequest, user: User) -> bool:
     """
-    Envoie un email à l'utilisateur avec un lien pour définir son mot de passe
+    Met en file d'envoi un email avec un lien pour définir le mot de passe
     (réutilise le flux de réinitialisation Django : password_reset_confirm).
+    L'envoi SMTP est fait par ``send_outbound_emails``, hors de la requête.
     """
-    to = [user.email] if user.email else []
-    if not to:
+    if not user.email:
         return False
-    token = default_token_generator.make_token(user)
-    uid = urlsafe_base64_encode(force_bytes(user.pk))
     protocol = "https" if request.is_secure() else "http"
-    domain = request.get_host()
-    context = {
-        "user": user,
-        "protocol": protocol,
-        "domain": domain,
-        "uid": uid,
-        "token": token,
-    }
-    subject = render_to_string("auth/welcome_set_password_subject.txt", context).strip()
-    body = render_to_string("auth/welcome_set_password_email.html", context)
-    try:
-        msg = EmailMultiAlternatives(
-            subject,
-            body,
-            settings.DEFAULT_FROM_EMAIL,
-            to,
-        )
-        msg.send(fail_silently=False)
-        return True
-    except Exception:
-        return False
+    subject, body = set_password_email(user, protocol, request.get_host())
+    enqueue_email(subject, body, [user.email])
+    return True
 
 
 @frontend_roles_required("admin")
@@ -675,8 +821,7 @@ def user_create(request: HttpRequest) -> HttpResponse:
         form = UserCreateForm(request.POST, request.FILES)
         if form.is_valid():
             # Mot de passe aléatoire sécurisé (16 car. alphanum.) — valide pour les validateurs Django
-            chars = string.ascii_letters + string.digits
-            raw_password = "".join(secrets.choice(chars) for _ in range(16))
+            raw_password = random_password()
             user = User.objects.create_user(
                 username=form.cleaned_data["username"].strip(),
                 email=form.cleaned_data["email"].strip(),
@@ -703,10 +848,10 @@ def user_create(request: HttpRequest) -> HttpResponse:
             if form.cleaned_data.get("photo"):
                 profile.photo = form.cleaned_data["photo"]
                 profile.save(update_fields=["photo"])
-            if _send_set_password_email(request, user):
-                messages.success(request, f"Utilisateur « {display_name} » créé. Un email avec le lien pour définir le mot de passe a été envoyé à {user.email}.")
+            if _queue_set_password_email(request, user):
+                messages.success(request, f"Utilisateur « {display_name} » créé. Un email avec le lien pour définir le mot de passe va être envoyé à {user.email}.")
             else:
-                messages.warning(request, f"Utilisateur « {display_name} » créé, mais l'envoi de l'email a échoué (vérifiez l'adresse email et la configuration SMTP). L'utilisateur peut utiliser « Mot de passe oublié » depuis la page de connexion.")
+                messages.warning(request, f"Utilisateur « {display_name} » créé, mais sans adresse email : aucun lien n'a été envoyé. L'utilisateur peut utiliser « Mot de passe oublié » depuis la page de connexion.")
             return redirect("users_admin")
     else:
         form = UserCreateForm()
@@ -717,13 +862,38 @@ def user_create(request: HttpRequest) -> HttpResponse:
     )
 
 
+@frontend_roles_required("admin")
+def user_import(request: HttpRequest) -> HttpResponse:
+    """Import en masse d'utilisateurs (CSV/XLSX) : validation complète, puis création par lots."""
+    report = None
+    if request.method == "POST":
+        upload = request.FILES.get("file")
+        if upload is None:
+            messages.error(request, "Choisissez un fichier CSV ou XLSX.")
+        else:
+            try:
+                report = validate_rows(read_rows(upload.read(), upload.name))
+            except (ValueError, UnicodeDecodeError) as exc:
+                messages.error(request, f"Fichier illisible : {exc}")
+            if report is not None and report.rows and not request.POST.get("dry_run"):
+                protocol = "https" if request.is_secure() else "http"
+                try:
+                    # Hachage séquentiel : pas de pool de processus dans un worker HTTP
+                    import_users(report, protocol, request.get_host(), workers=1)
+                except IntegrityError:
+                    # Identifiant ou nom pris entre la validation et l'insertion
+                    messages.error(request, "Un compte a été créé entre-temps avec les mêmes données : relancez l'import.")
+                else:
+                    messages.success(
+                        request,
+                        f"{report.created} utilisateur(s) créé(s) ; les emails d'accueil vont être envoyés.",
+                    )
+    return render(request, "admin/user_import.html", {"report": report, "columns": COLUMNS})
+
+
 @frontend_roles_required("admin")
 def departments(request: HttpRequest) -> HttpResponse:
-    deps = (
-        Department.objects.annotate(members=Count("profiles"), knowledge=Count("knowledge_items"))
-        .order_by("name")
-        .all()
-    )
+    deps = departments_with_stats().order_by("name")
     return render(request, "admin/departments.html", {"departments": list(deps)})
 
 
@@ -796,117 +966,16 @@ def onboarding_step_edit(request: HttpRequest, pk: int) -> HttpResponse:
 
 def _get_user_plan(request: HttpRequest) -> PlanIntegration | None:
     """Retourne le plan d'intégration lié au poste de l'utilisateur (département + poste), ou None."""
-    if not getattr(request.user, "is_authenticated", False):
+    plan_id = get_principal(request).plan_id
+    if not plan_id:
         return None
-    profile = (
-        UserProfile.objects.filter(user=request.user)
-        .select_related("department", "poste", "poste__plan_integration")
-        .first()
-    )
-    if not profile or not profile.poste_id:
-        return None
-    return getattr(profile.poste, "plan_integration", None)
-
-
-def _progress_for_plan(user, plan: PlanIntegration) -> dict:
-    """Calcule la progression (pourcentage, modules complétés, quiz passés, sous-étapes)."""
-    modules = list(
-        plan.modules.prefetch_related("quiz", "quiz__questions", "quiz__questions__choices", "steps")
-        .order_by("ordre")
-    )
-    total = len(modules)
-    if total == 0:
-        return {"pourcentage": 0, "modules": [], "progression_obj": None}
-
-    quiz_passed_ids = set(
-        UserQuizAttempt.objects.filter(user=user, passed=True).values_list("quiz_id", flat=True)
-    )
-    completed_step_ids = set(
-        UserModuleStepCompletion.objects.filter(user=user)
-        .values_list("module_step_id", flat=True)
-    )
-    completed = 0
-    module_status = []
-    previous_module_passed = True  # Le premier module est toujours accessible
-    
-    for mod in modules:
-        has_quiz = hasattr(mod, "quiz") and mod.quiz_id
-        steps = list(getattr(mod, "steps", []))
-        steps_completed = [s for s in steps if s.id in completed_step_ids]
-        steps_passed = len(steps) == 0 or len(steps_completed) == len(steps)
-        
-        # Récupérer les connaissances liées à ce module
-        knowledge_items = []
-        if hasattr(mod, 'knowledge_links'):
-            for link in mod.knowledge_links.all().order_by('ordre'):
-                knowledge_items.append({
-                    'item': link.knowledge_item,
-                    'ordre': link.ordre
-                })
-        
-        # Vérifier si le module est accessible (module précédent complété)
-        module_accessible = previous_module_passed
-        
-        if has_quiz:
-            quiz_passed = mod.quiz.id and mod.quiz.id in quiz_passed_ids
-            # Un module est validé seulement si : accessible + étapes complétées + quiz réussi
-            mod_passed = module_accessible and quiz_passed and steps_passed
-            if mod_passed:
-                completed += 1
-            module_status.append({
-                "module": mod,
-                "has_quiz": True,
-                "passed": mod_passed,
-                "accessible": module_accessible,
-                "quiz_passed": quiz_passed,  # Ajout de l'état spécifique du quiz
-                "steps_passed": steps_passed,  # Ajout de l'état spécifique des étapes
-                "quiz": getattr(mod, "quiz", None),
-                "steps": steps,
-                "steps_completed": steps_completed,
-                "completed_step_ids": completed_step_ids,
-                "knowledge_items": knowledge_items,
-            })
-        else:
-            # Un module sans quiz est validé seulement si : accessible + étapes complétées
-            mod_passed = module_accessible and steps_passed
-            if mod_passed:
-                completed += 1
-            module_status.append({
-                "module": mod,
-                "has_quiz": False,
-                "passed": mod_passed,
-                "accessible": module_accessible,
-                "steps_passed": steps_passed,  # Ajout de l'état spécifique des étapes
-                "quiz": None,
-                "steps": steps,
-                "steps_completed": steps_completed,
-                "completed_step_ids": completed_step_ids,
-                "knowledge_items": knowledge_items,
-            })
-        
-        # Pour le prochain module, vérifier si celui-ci est complété
-        if mod_passed:
-            previous_module_passed = True
-        else:
-            # Si le module actuel n'est pas passé, les suivants ne sont pas accessibles
-            previous_module_passed = False
-
-    pourcentage = round((completed / total) * 100) if total else 0
-    progression_obj = Progression.objects.filter(user=user, plan=plan).first()
-    if progression_obj and progression_obj.pourcentage != pourcentage:
-        progression_obj.pourcentage = pourcentage
-        progression_obj.save(update_fields=["pourcentage"])
-    elif not progression_obj:
-        progression_obj = Progression.objects.create(user=user, plan=plan, pourcentage=pourcentage)
-
-    return {"pourcentage": pourcentage, "modules": module_status, "progression_obj": progression_obj}
+    return PlanIntegration.objects.filter(pk=plan_id).first()
 
 
 @frontend_login_required
 def onboarding_home(request: HttpRequest) -> HttpResponse:
     """Page d'accueil intégration : plan personnel si poste avec plan, sinon étapes génériques."""
-    plan = _get_user_plan(request)
-    if plan:
+    if get_principal(request).plan_id:
         return redirect("plan_integration_personnel")
     steps = OnboardingStep.objects.all()
     return render(request, "onboarding/home.html", {"steps": list(steps)})
@@ -918,19 +987,89 @@ def module_step_toggle(request: HttpRequest, step_id: int) -> HttpResponse:
     from django.http import JsonResponse
     if request.method != "POST":
         return JsonResponse({"ok": False, "error": "Méthode non autorisée"}, status=405)
-    plan = _get_user_plan(request)
-    if not plan:
+    plan_id = get_principal(request).plan_id
+    if not plan_id:
         return JsonResponse({"ok": False, "error": "Plan non trouvé"}, status=403)
-    step = get_object_or_404(ModuleStep.objects.select_related("module"), pk=step_id)
-    if step.module.plan_id != plan.id:
+    step = get_object_or_404(ModuleStep.objects.select_related("module__plan"), pk=step_id)
+    if step.module.plan_id != plan_id:
         return JsonResponse({"ok": False, "error": "Sous-étape hors plan"}, status=403)
     compl, created = UserModuleStepCompletion.objects.get_or_create(
         user=request.user, module_step=step
     )
-    if created:
-        return JsonResponse({"ok": True, "checked": True})
-    compl.delete()
-    return JsonResponse({"ok": True, "checked": False})
+    if not created:
+        compl.delete()
+    progress_changed.send(sender=UserModuleStepCompletion, user=request.user, plan=step.module.plan)
+    return JsonResponse({"ok": True, "checked": created})
+
+
+# Nombre maximal de sous-étapes par requête groupée
+STEP_BATCH_MAX = 200
+
+
+@frontend_login_required
+def module_steps_update(request: HttpRequest) -> HttpResponse:
+    """
+    Coche/décoche plusieurs sous-étapes en une requête (AJAX POST, JSON
+    ``{"steps": [{"id": 12, "done": true}, ...]}``) et renvoie la progression recalculée.
+    Comme pour le quiz, seules les sous-étapes des modules accessibles peuvent changer.
+    """
+    from django.http import JsonResponse
+    if request.method != "POST":
+        return JsonResponse({"ok": False, "error": "Méthode non autorisée"}, status=405)
+    plan = _get_user_plan(request)
+    if not plan:
+        return JsonResponse({"ok": False, "error": "Plan non trouvé"}, status=403)
+    try:
+        wanted = {}
+        for entry in json.loads(request.body or b"{}").get("steps"):
+            step_id, done = entry["id"], entry["done"]
+            # Types JSON stricts : ni "false", ni 0 pour done, ni true ou 1.5 pour id
+            if type(step_id) is not int or not isinstance(done, bool):
+                raise TypeError
+            wanted[step_id] = done
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return JsonResponse({"ok": False, "error": "Requête invalide"}, status=400)
+    if not wanted or len(wanted) > STEP_BATCH_MAX:
+        return JsonResponse({"ok": False, "error": f"Entre 1 et {STEP_BATCH_MAX} sous-étapes"}, status=400)
+
+    # Validation sur la progression actuelle (instantané du plan en cache) : aucune requête par sous-étape
+    module_of = {
+        step.id: status for status in compute_plan_progress(request.user, plan)["modules"] for step in status["steps"]
+    }
+    outside = sorted(set(wanted) - set(module_of))
+    if outside:
+        return JsonResponse({"ok": False, "error": "Sous-étape hors plan", "steps": outside}, status=403)
+    locked = sorted(step_id for step_id in wanted if not module_of[step_id]["accessible"])
+    if locked:
+        return JsonResponse({"ok": False, "error": "Module non accessible", "steps": locked}, status=403)
+
+    to_check = [step_id for step_id, done in wanted.items() if done]
+    to_uncheck = [step_id for step_id, done in wanted.items() if not done]
+    with transaction.atomic():
+        if to_uncheck:
+            UserModuleStepCompletion.objects.filter(user=request.user, module_step_id__in=to_uncheck).delete()
+        if to_check:
+            UserModuleStepCompletion.objects.bulk_create(
+                [UserModuleStepCompletion(user=request.user, module_step_id=step_id) for step_id in to_check],
+                ignore_conflicts=True,
+            )
+    progress_changed.send(sender=UserModuleStepCompletion, user=request.user, plan=plan)
+
+    progress = compute_plan_progress(request.user, plan)
+    return JsonResponse({
+        "ok": True,
+        "pourcentage": progress["pourcentage"],
+        "modules": [
+            {
+                "id": status["module"].id,
+                "accessible": status["accessible"],
+                "passed": status["passed"],
+                "steps_total": len(status["steps"]),
+                "steps_completed": [step.id for step in status["steps_completed"]],
+            }
+            for status in progress["modules"]
+        ],
+    })
 
 
 @frontend_login_required
@@ -940,7 +1079,7 @@ def plan_integration_personnel(request: HttpRequest) -> HttpResponse:
     if not plan:
         messages.info(request, "Aucun plan d'intégration n'est associé à votre poste. Consultez les étapes générales ci-dessous.")
         return redirect("onboarding_home")
-    progress = _progress_for_plan(request.user, plan)
+    progress = compute_plan_progress(request.user, plan)
     return render(
         request,
         "onboarding/plan_personnel.html",
@@ -977,16 +1116,15 @@ def knowledge_generate_quiz(request: HttpRequest, knowledge_id: int) -> HttpResp
 @frontend_login_required
 def quiz_take(request: HttpRequest, quiz_id: int) -> HttpResponse:
     """Affiche un quiz et enregistre les réponses (score, passage)."""
-    quiz = get_object_or_404(
-        Quiz.objects.select_related("module", "knowledge_item").prefetch_related("questions", "questions__choices"),
-        pk=quiz_id,
-    )
+    quiz = get_object_or_404(Quiz.objects.select_related("module", "knowledge_item"), pk=quiz_id)
     
     plan = None
+    quiz_node = None
     if quiz.knowledge_item:
          if not _can_view_knowledge(request, quiz.knowledge_item):
              messages.error(request, "Vous n'avez pas accès à ce quiz.")
              return redirect("knowledge_list")
+         quiz_node = get_quiz_node(quiz)
     else:
         # Vérifier que le quiz appartient au plan du poste/département de l'utilisateur
         plan = _get_user_plan(request)
@@ -994,31 +1132,37 @@ def quiz_take(request: HttpRequest, quiz_id: int) -> HttpResponse:
             messages.error(request, "Ce quiz ne fait pas partie de votre plan d'intégration.")
             return redirect("onboarding_home")
 
-    # Vérifier les prérequis : toutes les sous-étapes du module doivent être complétées
-    progress = _progress_for_plan(request.user, plan)
-    current_module_status = None
-    for module_status in progress["modules"]:
-        if module_status["module"].id == quiz.module.id:
-            current_module_status = module_status
-            break
-    
-    if not current_module_status:
-        messages.error(request, "Module introuvable dans votre progression.")
-        return redirect("plan_integration_personnel")
-    
-    # Vérifier que le module est accessible
-    if not current_module_status.get("accessible", False):
-        messages.error(request, "Vous devez d'abord compléter le module précédent avant d'accéder à ce quiz.")
-        return redirect("plan_integration_personnel")
-    
-    # Vérifier que toutes les sous-étapes sont complétées
-    steps = current_module_status.get("steps", [])
-    steps_completed = current_module_status.get("steps_completed", [])
-    
-    if len(steps) > 0 and len(steps_completed) < len(steps):
-        remaining_steps = len(steps) - len(steps_completed)
-        messages.error(request, f"Vous devez d'abord compléter toutes les sous-étapes ({remaining_steps} restante{'s' if remaining_steps > 1 else ''}) avant de passer le quiz.")
-        return redirect("plan_integration_personnel")
+    # Vérifier les prérequis (quiz de module) : toutes les sous-étapes du module doivent être complétées
+    if plan:
+        progress = compute_plan_progress(request.user, plan)
+        current_module_status = None
+        for module_status in progress["modules"]:
+            if module_status["module"].id == quiz.module_id:
+                current_module_status = module_status
+                break
+
+        if not current_module_status:
+            messages.error(request, "Module introuvable dans votre progression.")
+            return redirect("plan_integration_personnel")
+
+        # Vérifier que le module est accessible
+        if not current_module_status.get("accessible", False):
+            messages.error(request, "Vous devez d'abord compléter le module précédent avant d'accéder à ce quiz.")
+            return redirect("plan_integration_personnel")
+
+        # Vérifier que toutes les sous-étapes sont complétées
+        steps = current_module_status.get("steps", [])
+        steps_completed = current_module_status.get("steps_completed", [])
+
+        if len(steps) > 0 and len(steps_completed) < len(steps):
+            remaining_steps = len(steps) - len(steps_completed)
+            messages.error(request, f"Vous devez d'abord compléter toutes les sous-étapes ({remaining_steps} restante{'s' if remaining_steps > 1 else ''}) avant de passer le quiz.")
+            return redirect("plan_integration_personnel")
+
+        # Questions et choix issus de l'instantané du plan (aucune requête supplémentaire)
+        quiz_node = current_module_status["quiz"]
+
+    questions = quiz_node.questions if quiz_node is not None else ()
 
     if request.method == "POST":
         # Corriger les réponses : question_id -> choice_id (choix sélectionné)
@@ -1027,59 +1171,35 @@ def quiz_take(request: HttpRequest, quiz_id: int) -> HttpResponse:
             if key.startswith("q_") and value.isdigit():
                 selected[int(key[2:])] = int(value)
 
-        total_questions = quiz.questions.count()
+        total_questions = len(questions)
         if total_questions == 0:
             messages.warning(request, "Ce quiz n'a pas de questions.")
             if quiz.knowledge_item:
                  return redirect("knowledge_detail", knowledge_id=quiz.knowledge_item.id)
             return redirect("plan_integration_personnel")
 
-        correct = 0
-        questions_results = []
-        
-        for q in quiz.questions.all():
-            choice_id = selected.get(q.id)
-            is_correct = False
-            correct_choice = None
-            
-            # Find correct choice for this question
-            choices = list(q.choices.all()) # Use prefetch
-            for c in choices:
-                if c.is_correct:
-                    correct_choice = c
-                    break
-            
-            if choice_id:
-                # Check if selected is correct
-                # We can do this in memory since we have the list
-                for c in choices:
-                    if c.id == choice_id and c.is_correct:
-                        is_correct = True
-                        break
-            
-            if is_correct:
-                correct += 1
-                
-            questions_results.append({
+        # Corrigé précompilé : une recherche par réponse, page de résultat construite sur le même nœud
+        answer_key = quiz_node.answer_key
+        questions_results = [
+            {
                 "question": q,
-                "user_choice_id": choice_id,
-                "is_correct": is_correct,
-                "correct_choice": correct_choice,
-                "choices": choices
-            })
-
-        score_pct = round((correct / total_questions) * 100)
-        passed = score_pct >= quiz.seuil_reussite_pct
+                "user_choice_id": selected.get(q.id),
+                "is_correct": q.id in selected and answer_key[q.id] == selected[q.id],
+                "choices": q.choices,
+            }
+            for q in questions
+        ]
+        score_pct, passed = grade(quiz_node, selected)
 
+        best = None
+        latest = []
         if request.user.is_authenticated:
-            attempt, _ = UserQuizAttempt.objects.update_or_create(
-                user=request.user,
-                quiz=quiz,
-                defaults={"score_pct": score_pct, "passed": passed},
-            )
-
-            if plan:
-                 _progress_for_plan(request.user, plan)
+            # Historique en ajout seul ; la progression ne dépend que de la meilleure tentative
+            recorded = record_attempt(request.user, quiz_node, selected)
+            if plan and recorded.improved:
+                progress_changed.send(sender=UserQuizAttempt, user=request.user, plan=plan)
+            best = best_attempts(request.user, [quiz.id]).get(quiz.id)
+            latest = latest_attempts(request.user, quiz.id)
         else:
              messages.info(request, "Vous êtes en mode invité : votre résultat ne sera pas enregistré.")
 
@@ -1091,13 +1211,15 @@ def quiz_take(request: HttpRequest, quiz_id: int) -> HttpResponse:
                 "score_pct": score_pct,
                 "passed": passed,
                 "questions_results": questions_results,
+                "best": best,
+                "latest": latest,
             }
         )
 
     return render(
         request,
         "onboarding/quiz_take.html",
-        {"quiz": quiz},
+        {"quiz": quiz, "questions": questions},
     )
 
 
@@ -0,0 +1,132 @@
+"""Index du vocabulaire des connaissances publiées (distracteurs des quiz générés).
+
+``VocabularyWord`` compte, pour chaque mot, le nombre de connaissances publiées
+qui le contiennent. La mise à jour est incrémentale : ``KnowledgeVocabulary``
+garde les mots déjà comptés pour chaque connaissance, seules les connaissances
+modifiées depuis leur indexation (ou dépubliées) sont retraitées.
+Le vocabulaire est chargé une fois par processus et rechargé quand sa version
+(cache partagé) change.
+"""
+from __future__ import annotations
+
+import time
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import KnowledgeItem, KnowledgeVocabulary, VocabularyWord
+from .quiz_text import DocumentIndex, Vocabulary, word_class
+
+VERSION_KEY = "vocabulary:version"
+
+# Longueur maximale d'un mot indexé (``VocabularyWord.word``)
+MAX_WORD_LENGTH = 100
+
+_CHUNK = 500
+
+_local: tuple[int, Vocabulary] | None = None
+
+
+def _version() -> int:
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate_vocabulary() -> None:
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+
+
+def document_words(content: str) -> list[str]:
+    return [w for w in DocumentIndex(content).vocabulary if len(w) <= MAX_WORD_LENGTH]
+
+
+def apply_counts(delta: Counter) -> None:
+    """Ajoute ``delta[mot]`` au nombre de documents de chaque mot (suppression à zéro)."""
+    words = [w for w, d in delta.items() if d]
+    for start in range(0, len(words), _CHUNK):
+        chunk = words[start:start + _CHUNK]
+        existing = {v.word: v for v in VocabularyWord.objects.filter(word__in=chunk)}
+        to_create, to_update, to_delete = [], [], []
+        for word in chunk:
+            entry = existing.get(word)
+            if entry is None:
+                if delta[word] > 0:
+                    to_create.append(VocabularyWord(
+                        word=word, word_class=word_class(word), length=len(word), document_count=delta[word]
+                    ))
+                continue
+            entry.document_count += delta[word]
+            if entry.document_count > 0:
+                to_update.append(entry)
+            else:
+                to_delete.append(entry.pk)
+        VocabularyWord.objects.bulk_create(to_create)
+        VocabularyWord.objects.bulk_update(to_update, ["document_count"])
+        if to_delete:
+            VocabularyWord.objects.filter(pk__in=to_delete).delete()
+    if words:
+        invalidate_vocabulary()
+
+
+def update_vocabulary_index(batch_size: int = _CHUNK) -> tuple[int, int]:
+    """Indexe les connaissances publiées nouvelles ou modifiées, retire les dépubliées.
+
+    Retourne (connaissances indexées, connaissances retirées).
+    """
+    # Les compteurs sont décrémentés par le signal post_delete de KnowledgeVocabulary
+    removed, _ = KnowledgeVocabulary.objects.exclude(
+        knowledge_item__status=KnowledgeItem.Status.PUBLISHED
+    ).delete()
+
+    stale = KnowledgeItem.objects.filter(status=KnowledgeItem.Status.PUBLISHED).filter(
+        Q(vocabulary_entry__isnull=True) | Q(updated_at__gt=F("vocabulary_entry__indexed_at"))
+    )
+    indexed = 0
+    last_id = 0
+    while True:
+        batch = list(stale.filter(id__gt=last_id).order_by("id").values_list("id", "content")[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        ids = [item_id for item_id, _ in batch]
+        with transaction.atomic():
+            previous = dict(
+                KnowledgeVocabulary.objects.filter(knowledge_item_id__in=ids).values_list("knowledge_item_id", "words")
+            )
+            delta: Counter = Counter()
+            sources = []
+            now = timezone.now()
+            for item_id, content in batch:
+                words = document_words(content)
+                delta.update(words)
+                delta.subtract(previous.get(item_id, ()))
+                sources.append(KnowledgeVocabulary(knowledge_item_id=item_id, words=words, indexed_at=now))
+            apply_counts(delta)
+            KnowledgeVocabulary.objects.bulk_create(
+                sources,
+                update_conflicts=True,
+                unique_fields=["knowledge_item"],
+                update_fields=["words", "indexed_at"],
+            )
+        indexed += len(batch)
+    return indexed, removed
+
+
+def get_vocabulary() -> Vocabulary:
+    """Vocabulaire du corpus publié (chargé une fois par processus et par version)."""
+    global _local
+    version = _version()
+    if _local is not None and _local[0] == version:
+        return _local[1]
+    vocabulary = Vocabulary(VocabularyWord.objects.values_list("word", "document_count").iterator(chunk_size=5000))
+    _local = (version, vocabulary)
+    return vocabulary
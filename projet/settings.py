@@ -84,6 +84,21 @@ DATABASES = {
     }
 }
 
+# Cache
+# "fragments" : HTML rendu des connaissances (corps, étiquettes, cartes), éviction LRU
+# au-delà de MAX_ENTRIES. À remplacer par Redis/Memcached avec plusieurs processus.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "fragments": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "fragments",
+        "TIMEOUT": None,
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -138,6 +153,13 @@ LOGOUT_REDIRECT_URL = "/login/"
 # Redirection après changement de mot de passe (première connexion)
 PASSWORD_CHANGE_REDIRECT_URL = "/dashboard/"
 
+# Conserver l'identité (rôle, département, poste, plan) en session entre les requêtes.
+# Nécessite un cache partagé entre processus (Redis, Memcached…) pour l'invalidation.
+FRONTEND_PRINCIPAL_SESSION_CACHE = False
+
+# Nombre de connaissances par page dans la liste (modifiable par ?per_page=, max 100).
+KNOWLEDGE_LIST_PAGE_SIZE = 24
+
 # ---------------------------------------------------------------------------
 # SMTP – Envoi des emails (identifiants temporaires, reset password)
 # En production : définir les variables d'environnement ou un .env